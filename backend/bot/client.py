@@ -13,7 +13,7 @@ from encrypted_mysqldb.database import Database
 from encrypted_mysqldb.errors import DatabaseInitializationError
 from common.utils import load_json
 from common.config import constants
-from common.api.spreadsheet import spreadsheet
+from common.api.spreadsheet import spreadsheet, async_client, snapshot_store
 
 MODULES_DIR = "bot/modules"
 
@@ -114,8 +114,24 @@ class Client(commands.Bot):
             self.error_code = 2
 
     def init_spreadsheet_service(self):
-        """Initializes the connection to the Google Spreadsheet API."""
+        """
+        Initializes the connection to the Google Spreadsheet API.
+        The async client is used instead of the Google API service when SPREADSHEET_ASYNC_CLIENT is set.
+        Snapshots are shared through the Redis server of SPREADSHEET_SNAPSHOT_STORE_URL when it is set, or else
+        through the files of SPREADSHEET_SNAPSHOTS_DIRECTORY.
+        """
         spreadsheet.start_service()
+        snapshot_store_url = getattr(constants, "SPREADSHEET_SNAPSHOT_STORE_URL", "")
+        if snapshot_store_url:
+            import redis
+
+            spreadsheet.set_snapshot_store(
+                snapshot_store.KeyValueSnapshotStore(redis.Redis.from_url(snapshot_store_url))
+            )
+        elif getattr(constants, "SPREADSHEET_SNAPSHOTS_DIRECTORY", ""):
+            spreadsheet.set_snapshot_store(snapshot_store.FileSnapshotStore(constants.SPREADSHEET_SNAPSHOTS_DIRECTORY))
+        if getattr(constants, "SPREADSHEET_ASYNC_CLIENT", ""):
+            async_client.start_client(spreadsheet.get_credentials())
 
     def init_available_languages(self):
         """Initializes the list of available languages of the bot."""
@@ -173,7 +189,6 @@ class Client(commands.Bot):
 
     async def on_command_completion(self, ctx):
         try:
-            spreadsheet.Spreadsheet.pickle_from_id.cache_clear()
             await ctx.message.add_reaction("✅")
             await ctx.message.remove_reaction("⏲️", self.user)
         except Exception:
@@ -182,7 +197,6 @@ class Client(commands.Bot):
     async def on_command_error(self, ctx, error):
         """Logs the error"""
         try:
-            spreadsheet.Spreadsheet.pickle_from_id.cache_clear()
             if isinstance(error, commands.CommandNotFound):
                 command_message = ctx.message.content.lstrip(self.command_prefix)
                 if not command_message or not command_message[0].isalpha() or self.command_prefix in command_message:
@@ -202,12 +216,18 @@ class Client(commands.Bot):
 
     async def stop(self, code, ctx=None):
         """Stops the bot"""
+        for cog in self.cogs.values():
+            if hasattr(cog, "flush_spreadsheet_updates"):
+                await cog.flush_spreadsheet_updates(timeout=30)
+                break
         for task in self.tasks:
             task.cancel()
             try:
                 await task
             except Exception:
                 self.debug("Background task cancelled.")
+        if async_client.client:
+            await async_client.client.close()
         self.error_code = code
         if ctx and ctx.guild:
             try:
@@ -239,4 +259,3 @@ class Client(commands.Bot):
                     await module.on_verified_user(guild, user)
                 except Exception:
                     continue
-        spreadsheet.Spreadsheet.pickle_from_id.cache_clear()
@@ -3,6 +3,7 @@
 from discord.ext import commands
 from bot.modules import module as base
 from common.api import tosurnament as tosurnament_api
+from common.api.spreadsheet import spreadsheet, rate_limiter
 from common.databases.tosurnament.user import User
 
 
@@ -37,6 +38,14 @@ class OwnerCog(base.BaseModule, name="owner"):
         """Pings the bot."""
         await ctx.send("pong")
 
+    @commands.command(hidden=True)
+    async def spreadsheet_metrics(self, ctx):
+        """Shows the metrics of the spreadsheet cache and of the Sheets API rate limiter."""
+        output = "__cache__: `" + str(spreadsheet.spreadsheet_cache.get_stats()) + "`\n"
+        for operation, metrics in rate_limiter.scheduler.get_metrics().items():
+            output += "__" + operation + "__: `" + str(metrics) + "`\n"
+        await ctx.send(output)
+
     @commands.command(hidden=True)
     async def say(self, ctx, *args):
         """Bot says the input."""
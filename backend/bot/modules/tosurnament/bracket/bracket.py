@@ -283,7 +283,7 @@ class TosurnamentBracketCog(tosurnament.TosurnamentBaseModule, name="bracket"):
             )
             if now > registration_end_date:
                 continue
-            players_spreadsheet = await bracket.get_players_spreadsheet()
+            players_spreadsheet = await bracket.get_players_spreadsheet(background=True)
             if not players_spreadsheet:
                 continue
             team_infos, _ = await self.get_all_teams_infos_and_roles(guild, players_spreadsheet)
@@ -334,9 +334,8 @@ class TosurnamentBracketCog(tosurnament.TosurnamentBaseModule, name="bracket"):
 
     @tasks.loop(count=1)
     async def background_task_update_spreadsheet(self):
-        spreadsheet_ids = self.get_spreadsheet_ids_to_update_pickle()
-        for spreadsheet_id in spreadsheet_ids:
-            self.bot.tasks.append(self.bot.loop.create_task(self.update_spreadsheet_background_task(spreadsheet_id)))
+        for spreadsheet_id in self.get_spreadsheet_ids_to_update():
+            self.start_update_spreadsheet_background_task(spreadsheet_id)
 
 
 async def setup(bot):
@@ -1,8 +1,6 @@
 """Base of all tosurnament modules"""
 
 import datetime
-import os
-import pickle
 import asyncio
 import functools
 from babel.dates import format_date, format_time
@@ -13,21 +11,28 @@ from common.databases.tosurnament.spreadsheets.schedules_spreadsheet import (
     DuplicateMatchId,
     MatchIdNotFound,
     DateIsNotString,
-    MatchInfo,
 )
 from common.databases.tosurnament.spreadsheets.players_spreadsheet import (
-    TeamInfo,
     DuplicateTeam,
     TeamNotFound,
 )
 from common.databases.tosurnament.spreadsheets.qualifiers_spreadsheet import LobbyInfo
-from common.api.spreadsheet import Spreadsheet, InvalidWorksheet, HttpError
+from common.api.spreadsheet import Spreadsheet, InvalidWorksheet
+from common.api.spreadsheet.spreadsheet import update_journal
+from common.api.spreadsheet import async_client, rate_limiter
 from common.api import challonge
 from common.api import tosurnament as tosurnament_api
+from common.config import constants
+from common.utils.debounced_scheduler import DebouncedScheduler
 
 PRETTY_DATE_FORMAT = "%A %d %B {0} %H:%M UTC"
 DATABASE_DATE_FORMAT = "%d/%m/%y %H:%M"
 
+# Updates of a spreadsheet made within SPREADSHEET_UPDATE_DELAY seconds of each other are sent together, at most
+# SPREADSHEET_UPDATE_MAX_DELAY seconds after the first one
+SPREADSHEET_UPDATE_DELAY = float(getattr(constants, "SPREADSHEET_UPDATE_DELAY", 2))
+SPREADSHEET_UPDATE_MAX_DELAY = float(getattr(constants, "SPREADSHEET_UPDATE_MAX_DELAY", 10))
+
 
 class UserDetails:
     class Role:
@@ -135,8 +140,16 @@ class UserDetails:
 class TosurnamentBaseModule(BaseModule):
     """Contains utility functions used by Tosurnament modules."""
 
+    spreadsheet_update_scheduler = None
+    # Views of the spreadsheets written since their last update, whose snapshot is published once per update
+    spreadsheets_to_publish = {}
+
     def __init__(self, bot):
         super().__init__(bot)
+        if not TosurnamentBaseModule.spreadsheet_update_scheduler:
+            TosurnamentBaseModule.spreadsheet_update_scheduler = DebouncedScheduler(
+                self.update_spreadsheet_background_task, SPREADSHEET_UPDATE_DELAY, SPREADSHEET_UPDATE_MAX_DELAY
+            )
 
     def get_tournament(self, guild_id):
         """
@@ -175,37 +188,25 @@ class TosurnamentBaseModule(BaseModule):
         schedules_spreadsheet = await bracket.get_schedules_spreadsheet()
         if not schedules_spreadsheet:
             return []
-        match_ids_cells = schedules_spreadsheet.spreadsheet.get_cells_with_value_in_range(
-            schedules_spreadsheet.range_match_id
-        )
-        match_infos = []
-        for match_id_cell in match_ids_cells:
-            if match_id_cell.casefold() in match_ids:
-                match_infos.append(MatchInfo.from_match_id_cell(schedules_spreadsheet, match_id_cell))
-        return match_infos
+        return list(schedules_spreadsheet.get_match_infos(match_ids=match_ids))
 
-    async def get_next_matches_info_for_bracket(self, tournament, bracket):
+    async def get_next_matches_info_for_bracket(self, tournament, bracket, get_match_indexes=None):
+        """
+        Returns the matches and qualifier lobbies of the bracket that are not over, with their date.
+        get_match_indexes can be set to a function returning the matches to consider from the ScheduleIndex of the
+        schedules spreadsheet, so that the other matches are not even read.
+        """
         matches_data = []
         now = datetime.datetime.now(datetime.timezone.utc)
         schedules_spreadsheet = await bracket.get_schedules_spreadsheet()
         if schedules_spreadsheet:
-            match_ids_cells = schedules_spreadsheet.spreadsheet.get_cells_with_value_in_range(
-                schedules_spreadsheet.range_match_id
-            )
             matches_to_ignore = [match.casefold() for match in tournament.matches_to_ignore.split("\n")]
-            for match_id_cell in match_ids_cells:
-                if match_id_cell.casefold() in matches_to_ignore:
-                    continue
-                match_info = MatchInfo.from_match_id_cell(schedules_spreadsheet, match_id_cell)
-                date_format = "%d %B"
-                if schedules_spreadsheet.date_format:
-                    date_format = schedules_spreadsheet.date_format
-                match_date = tournament.parse_date(
-                    match_info.get_datetime(), date_formats=list(filter(None, [date_format + " %H:%M"]))
-                )
-                if not match_date or match_date < now:
-                    continue
-                matches_data.append((match_info, match_date))
+            match_indexes = None
+            if get_match_indexes:
+                match_indexes = get_match_indexes(schedules_spreadsheet.get_schedule_index())
+            matches_data.extend(
+                schedules_spreadsheet.get_next_match_infos(tournament, now, matches_to_ignore, match_indexes)
+            )
         qualifiers_spreadsheet = await bracket.get_qualifiers_spreadsheet()
         if qualifiers_spreadsheet:
             lobby_ids_cells = qualifiers_spreadsheet.spreadsheet.get_cells_with_value_in_range(
@@ -231,19 +232,7 @@ class TosurnamentBaseModule(BaseModule):
         teams_info = []
         teams_roles = []
         if players_spreadsheet:
-            if players_spreadsheet.range_team_name:
-                team_cells = players_spreadsheet.spreadsheet.get_cells_with_value_in_range(
-                    players_spreadsheet.range_team_name
-                )
-            else:
-                team_cells = players_spreadsheet.spreadsheet.get_cells_with_value_in_range(
-                    players_spreadsheet.range_team
-                )
-            for team_cell in team_cells:
-                try:
-                    team_info = TeamInfo.from_team_name(players_spreadsheet, str(team_cell))
-                except Exception:
-                    continue
+            for team_info in players_spreadsheet.get_team_infos():
                 if players_spreadsheet.range_team_name and (
                     team_role := get_role(guild.roles, None, team_info.team_name)
                 ):
@@ -253,67 +242,70 @@ class TosurnamentBaseModule(BaseModule):
                 teams_info.append(team_info)
         return teams_info, teams_roles
 
-    def get_spreadsheet_ids_to_update_pickle(self):
-        if not os.path.exists("pickles"):
-            os.mkdir("pickles")
-            return []
-        try:
-            with open("pickles/spreadsheet_ids_to_update", "rb") as pfile:
-                spreadsheet_ids = pickle.load(pfile)
-                return spreadsheet_ids
-        except IOError:
-            return []
-
-    def update_spreadsheet_ids_to_update_pickle(self, spreadsheet_ids):
-        if not os.path.exists("pickles"):
-            os.mkdir("pickles")
-        with open("pickles/spreadsheet_ids_to_update", "w+b") as pfile:
-            pickle.dump(spreadsheet_ids, pfile)
+    def get_spreadsheet_ids_to_update(self):
+        return update_journal.get_spreadsheet_ids()
 
     async def update_spreadsheet_background_task(self, spreadsheet_id):
-        try:
-            await asyncio.sleep(2)  # To prioritize finishing the executed command
-            while True:
-                self.bot.info("Trying to update online spreadsheet...")
-                Spreadsheet.pickle_from_id.cache_clear()
-                spreadsheet = Spreadsheet.pickle_from_id(spreadsheet_id)
-                spreadsheet_ids = self.get_spreadsheet_ids_to_update_pickle()
-                spreadsheet_ids.remove(spreadsheet.id)
-                self.update_spreadsheet_ids_to_update_pickle(spreadsheet_ids)
-                if not spreadsheet:
-                    self.bot.error("Spreadsheet pickle not found")
+        """
+        Publishes the snapshot of the spreadsheet, then sends the values pending in its journal, retrying until they
+        are sent.
+        """
+        await self.publish_spreadsheet_snapshot(spreadsheet_id)
+        n_retry = 0
+        while True:
+            self.bot.info("Trying to update online spreadsheet...")
+            try:
+                await rate_limiter.scheduler.acquire(rate_limiter.WRITE)
+                if async_client.client:
+                    updated = await Spreadsheet.update_from_journal_async(spreadsheet_id, async_client.client)
+                else:
+                    loop = asyncio.get_running_loop()
+                    updated = await loop.run_in_executor(None, Spreadsheet.update_from_journal, spreadsheet_id)
+                if not updated:
                     return
-                try:
-                    spreadsheet.update()
-                except HttpError as e:
-                    self.bot.info("Exception raised while trying to update online spreadsheet")
-                    self.bot.info_exception(e)
-                    spreadsheet_ids = self.get_spreadsheet_ids_to_update_pickle()
-                    if spreadsheet.id not in spreadsheet_ids:
-                        spreadsheet_ids.add(spreadsheet.id)
-                        self.update_spreadsheet_ids_to_update_pickle(spreadsheet_ids)
-                    await asyncio.sleep(10)
-                    continue
-                self.bot.info("Updated online spreadsheet successfully")
-                return
-        except asyncio.CancelledError as e:
-            self.bot.info_exception(e)
+            except Exception as e:
+                # The values stay in the journal, so they are sent once the API or the journal is available again
+                self.bot.info("Exception raised while trying to update online spreadsheet")
+                self.bot.info_exception(e)
+                await asyncio.sleep(rate_limiter.get_backoff_delay(n_retry))
+                n_retry += 1
+                continue
+            self.bot.info("Updated online spreadsheet successfully")
+            return
+
+    async def publish_spreadsheet_snapshot(self, spreadsheet_id):
+        """Publishes the snapshot of the last view of the spreadsheet written, if it is not published yet."""
+        spreadsheet = self.spreadsheets_to_publish.pop(spreadsheet_id, None)
+        if not spreadsheet:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, spreadsheet.publish_snapshot)
         except Exception as e:
+            # Other processes read the spreadsheet online instead, and this one keeps it in its cache
+            self.bot.info("Exception raised while trying to publish the snapshot of a spreadsheet")
             self.bot.info_exception(e)
-            self.bot.tasks.append(self.bot.loop.create_task(self.update_spreadsheet_background_task(spreadsheet_id)))
+
+    def start_update_spreadsheet_background_task(self, spreadsheet_id):
+        """Schedules the update of the spreadsheet, grouping it with the other updates made around the same time."""
+        self.spreadsheet_update_scheduler.schedule(spreadsheet_id)
+
+    async def flush_spreadsheet_updates(self, timeout=None):
+        """Sends the scheduled updates of every spreadsheet now."""
+        await self.spreadsheet_update_scheduler.flush_all(timeout)
 
     async def add_update_spreadsheet_background_task(self, spreadsheet):
-        spreadsheet.spreadsheet.update_pickle()
-        spreadsheet_id = spreadsheet.spreadsheet.id
-        spreadsheet_ids = self.get_spreadsheet_ids_to_update_pickle()
-        if spreadsheet_ids:
-            if spreadsheet_id in spreadsheet_ids:
-                return
-            spreadsheet_ids.add(spreadsheet_id)
-        else:
-            spreadsheet_ids = set([spreadsheet_id])
-        self.update_spreadsheet_ids_to_update_pickle(spreadsheet_ids)
-        self.bot.tasks.append(self.bot.loop.create_task(self.update_spreadsheet_background_task(spreadsheet_id)))
+        """
+        Journals the updates of the spreadsheet from the executor, and schedules them to be sent. The spreadsheet is
+        kept in the cache of this process right away, but its snapshot is only published when the updates are sent,
+        once for all the updates sent together.
+        """
+        spreadsheet = spreadsheet.spreadsheet
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, spreadsheet.journal_updates)
+        spreadsheet.update_cache()
+        self.spreadsheets_to_publish[spreadsheet.id] = spreadsheet.create_view()
+        self.start_update_spreadsheet_background_task(spreadsheet.id)
 
     def get_bracket_from_index(self, brackets, shown_index):
         """Gets the bracket corresponding to the shown index (shown index starts at 1)."""
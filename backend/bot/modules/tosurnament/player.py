@@ -11,7 +11,6 @@ from discord.utils import escape_markdown
 from bot.modules.tosurnament import module as tosurnament
 from common.databases.tosurnament.spreadsheets.players_spreadsheet import TeamInfo, TeamNotFound
 from common.databases.tosurnament.spreadsheets.schedules_spreadsheet import MatchInfo, MatchIdNotFound, DateIsNotString
-from common.databases.tosurnament.spreadsheets.qualifiers_spreadsheet import LobbyIdNotFound, LobbyInfo
 from common.databases.tosurnament_message.reschedule_message import RescheduleMessage
 from common.databases.tosurnament_message.staff_reschedule_message import StaffRescheduleMessage
 from common.databases.tosurnament_message.base_message import with_corresponding_message, on_raw_reaction_with_context
@@ -30,7 +29,7 @@ class TosurnamentPlayerCog(tosurnament.TosurnamentBaseModule, name="player"):
 
     def cog_unload(self):
         self.background_task_give_player_role.cancel()
-        
+
     def cog_check(self, ctx):
         """Check function called before any command of the cog."""
         if ctx.guild is None:
@@ -120,45 +119,33 @@ class TosurnamentPlayerCog(tosurnament.TosurnamentBaseModule, name="player"):
 
     def clear_team_from_other_lobbies(self, qualifiers_spreadsheet, lobby_id, team_name):
         """Removes the team name from other lobbies if present."""
-        lobby_id_cells = qualifiers_spreadsheet.spreadsheet.get_cells_with_value_in_range(
-            qualifiers_spreadsheet.range_lobby_id
-        )
-        for lobby_id_cell in lobby_id_cells:
-            lobby_info = LobbyInfo.from_lobby_id_cell(qualifiers_spreadsheet, lobby_id_cell, filled_only=False)
-            if lobby_info.lobby_id.casefold() != lobby_id.casefold():
-                for team_cell in lobby_info.teams:
-                    if team_name.casefold() == team_cell.casefold():
-                        team_cell.set("")
-                        return
+        lobby_table = qualifiers_spreadsheet.get_lobby_table()
+        for lobby_index, slot in lobby_table.get_team_slots(team_name):
+            if lobby_table.lobby_ids[lobby_index] != lobby_id.casefold():
+                qualifiers_spreadsheet.set_lobby_team(lobby_table, lobby_index, slot, "")
+                return
 
     def add_team_to_lobby(self, qualifiers_spreadsheet, lobby_id, team_name):
         """Adds the team name to the lobby if found, not already in the lobby and the lobby is not full."""
-        try:
-            lobby_info = LobbyInfo.from_id(qualifiers_spreadsheet, lobby_id, filled_only=False)
-        except LobbyIdNotFound:
+        lobby_table = qualifiers_spreadsheet.get_lobby_table()
+        lobby_index = lobby_table.find_lobby(lobby_id)
+        if lobby_index is None:
             return False
-        first_empty_cell = None
-        for team_cell in lobby_info.teams:
-            if first_empty_cell is None and not team_cell:
-                first_empty_cell = team_cell
-            if team_name.casefold() == team_cell.casefold():
-                raise tosurnament.AlreadyInLobby()
-        if first_empty_cell is None:
+        if any(index == lobby_index for index, _ in lobby_table.get_team_slots(team_name)):
+            raise tosurnament.AlreadyInLobby()
+        if not lobby_table.get_n_free_slots(lobby_index):
             raise tosurnament.LobbyIsFull()
-        first_empty_cell.set(team_name)
+        team_cells = lobby_table.get_team_cells(qualifiers_spreadsheet.spreadsheet, lobby_index)
+        slot = next(slot for slot, team_cell in enumerate(team_cells) if not team_cell)
+        qualifiers_spreadsheet.set_lobby_team(lobby_table, lobby_index, slot, team_name)
         return True
 
     async def get_team_of_author(self, ctx, players_spreadsheet):
-        team_infos, _ = await self.get_all_teams_infos_and_roles(ctx.guild, players_spreadsheet)
         user_name = None
         user = tosurnament.UserAbstraction.get_from_ctx(ctx)
         if user and user.verified:
             user_name = user.name
-        for team_info in team_infos:
-            player = team_info.find_player(user_name, ctx.author.id, str(ctx.author))
-            if player:
-                return team_info
-        return None
+        return players_spreadsheet.find_team_info_of_player(user_name, ctx.author.id, str(ctx.author))
 
     @commands.command(aliases=["rtl"])
     async def register_to_lobby(self, ctx, *, lobby_id: str):
@@ -22,7 +22,7 @@ from common.databases.tosurnament_message.staff_reschedule_message import StaffR
 from common.databases.tosurnament_message.base_message import with_corresponding_message, on_raw_reaction_with_context
 from common.databases.tosurnament.allowed_reschedule import AllowedReschedule
 from common.databases.tosurnament_message.qualifiers_results_message import QualifiersResultsMessage
-from common.api.spreadsheet import Spreadsheet, InvalidWorksheet
+from common.api.spreadsheet import InvalidWorksheet
 from common.api import osu
 from common.api import tosurnament as tosurnament_api
 
@@ -387,8 +387,10 @@ class TosurnamentStaffCog(tosurnament.TosurnamentBaseModule, name="staff"):
         tournament = self.get_tournament(ctx.guild.id)
         matches = []
         for bracket in tournament.brackets:
-            matches_data = await self.get_next_matches_info_for_bracket(tournament, bracket)
             if where_has_no_referee:
+                matches_data = await self.get_next_matches_info_for_bracket(
+                    tournament, bracket, lambda schedule_index: schedule_index.get_matches_without_referee()
+                )
                 for match_info, match_date in matches_data:
                     if isinstance(match_info, MatchInfo):
                         if list(filter(None, [cell.get() for cell in match_info.referees])):
@@ -397,6 +399,7 @@ class TosurnamentStaffCog(tosurnament.TosurnamentBaseModule, name="staff"):
                         continue
                     matches.append((match_info, match_date))
             else:
+                matches_data = await self.get_next_matches_info_for_bracket(tournament, bracket)
                 matches = [*matches, *matches_data]
         reply_string = ""
         previous_match_date = None
@@ -536,7 +539,7 @@ class TosurnamentStaffCog(tosurnament.TosurnamentBaseModule, name="staff"):
     async def player_match_notification(self, guild, tournament, bracket, channel, match_info, match_date, delta):
         if not (delta.days == 0 and delta.seconds >= 900 and delta.seconds < 1800):
             return
-        players_spreadsheet = await bracket.get_players_spreadsheet()
+        players_spreadsheet = await bracket.get_players_spreadsheet(targeted=True, background=True)
         team1 = await self.get_team_mention(guild, players_spreadsheet, match_info.team1.get())
         team2 = await self.get_team_mention(guild, players_spreadsheet, match_info.team2.get())
         referee_name = match_info.referees[0].get()
@@ -646,15 +649,9 @@ class TosurnamentStaffCog(tosurnament.TosurnamentBaseModule, name="staff"):
         matches_to_ignore = [match_id.casefold() for match_id in tournament.matches_to_ignore.split("\n")]
         for bracket in tournament.brackets:
             now = datetime.datetime.now(datetime.timezone.utc)
-            schedules_spreadsheet = await bracket.get_schedules_spreadsheet(retry=True)
+            schedules_spreadsheet = await bracket.get_schedules_spreadsheet(retry=True, targeted=True, background=True)
             if schedules_spreadsheet:
-                match_ids = schedules_spreadsheet.spreadsheet.get_cells_with_value_in_range(
-                    schedules_spreadsheet.range_match_id
-                )
-                for match_id_cell in match_ids:
-                    if match_id_cell.casefold() in matches_to_ignore:
-                        continue
-                    match_info = MatchInfo.from_match_id_cell(schedules_spreadsheet, match_id_cell)
+                for match_info in schedules_spreadsheet.get_match_infos(match_ids_to_ignore=matches_to_ignore):
                     date_format = "%d %B"
                     if schedules_spreadsheet.date_format:
                         date_format = schedules_spreadsheet.date_format
@@ -678,7 +675,9 @@ class TosurnamentStaffCog(tosurnament.TosurnamentBaseModule, name="staff"):
                             await self.referee_match_notification(
                                 guild, tournament, bracket, staff_channel, match_info, match_date, delta
                             )
-            if qualifiers_spreadsheet := await bracket.get_qualifiers_spreadsheet(retry=True):
+            if qualifiers_spreadsheet := await bracket.get_qualifiers_spreadsheet(
+                retry=True, targeted=True, background=True
+            ):
                 lobby_ids = qualifiers_spreadsheet.spreadsheet.get_cells_with_value_in_range(
                     qualifiers_spreadsheet.range_lobby_id
                 )
@@ -730,8 +729,6 @@ class TosurnamentStaffCog(tosurnament.TosurnamentBaseModule, name="staff"):
             return
         except Exception as e:
             self.bot.info_exception(e)
-        finally:
-            Spreadsheet.pickle_from_id.cache_clear()
 
     @tasks.loop(minutes=15.0)
     async def background_task_match_notification(self):
@@ -100,10 +100,11 @@ class TosurnamentUserCog(tosurnament.TosurnamentBaseModule, name="user"):
             if user.verified:
                 return user.name
             return ctx.author.display_name
-        team_infos, _ = await self.get_all_teams_infos_and_roles(ctx.guild, players_spreadsheet)
-        for team_info in team_infos:
-            if self.get_player_in_team(ctx.author, team_info):
-                return team_info.team_name.get()
+        user = tosurnament.UserAbstraction.get_from_user(self.bot, ctx.author)
+        user_name = user.name if user.verified else ""
+        team_info = players_spreadsheet.find_team_info_of_player(user_name, ctx.author.id, str(ctx.author))
+        if team_info:
+            return team_info.team_name.get()
         return None
 
     async def fill_matches_info_for_roles(self, ctx, tournament, bracket, user_details):
@@ -113,7 +114,17 @@ class TosurnamentUserCog(tosurnament.TosurnamentBaseModule, name="user"):
             bracket_role = tosurnament.get_role(ctx.guild.roles, bracket.role_id)
             if not bracket_role or tosurnament.get_role(ctx.author.roles, bracket.role_id):
                 team_name = await self.find_team_name_of_member(ctx, bracket)
-        matches_data = await self.get_next_matches_info_for_bracket(tournament, bracket)
+
+        def get_match_indexes(schedule_index):
+            match_indexes = set()
+            if team_name:
+                match_indexes.update(schedule_index.get_matches_of_team(team_name))
+            for field in ("referee", "streamer", "commentator"):
+                if getattr(user_details, field):
+                    match_indexes.update(schedule_index.get_matches_of_staff(field, user_name))
+            return match_indexes
+
+        matches_data = await self.get_next_matches_info_for_bracket(tournament, bracket, get_match_indexes)
         for match_info, match_date in matches_data:
             if isinstance(match_info, MatchInfo):
                 if team_name and (match_info.team1.has_value(team_name) or match_info.team2.has_value(team_name)):
@@ -1,4 +1,6 @@
 from .cell import Cell
+from .cell_column import CellColumn
 from .spreadsheet import Spreadsheet, InvalidWorksheet, HttpError
 from .worksheet import Worksheet
+from .range_spec import RangeSpec
 from .utils import *
@@ -0,0 +1,115 @@
+import asyncio
+import json
+
+import aiohttp
+from google.auth.transport.requests import Request
+
+from .response_parser import (
+    parse_spreadsheet_response,
+    add_value_ranges,
+    get_a1_ranges,
+    get_cell_value,
+    get_sheets_from_metadata,
+)
+from .spreadsheet import BATCH_GET_PARAMETERS, FIELDS, METADATA_FIELDS, HttpError
+
+SHEETS_API_URL = "https://sheets.googleapis.com/v4/spreadsheets/"
+MAX_CONNECTIONS = 16
+KEEPALIVE_TIMEOUT = 60
+REQUEST_TIMEOUT = 60
+client = None
+
+
+def start_client(credentials):
+    """Starts the AsyncSheetsClient used instead of the Google API service by the modules supporting it."""
+    global client
+    client = AsyncSheetsClient(credentials)
+    return client
+
+
+class AsyncSheetsClient:
+    """
+    Google Sheets API client running on the event loop. Connections are pooled and kept alive by one aiohttp
+    session, and the access token of the credentials is reused until it expires. Only the transfers run on the event
+    loop: responses are parsed in the default executor.
+    credentials is a google.auth credentials object, or None to send requests without authorization.
+    """
+
+    def __init__(self, credentials=None, base_url=SHEETS_API_URL, max_connections=MAX_CONNECTIONS):
+        self.credentials = credentials
+        self.base_url = base_url
+        self.max_connections = max_connections
+        self._session = None
+        self._token_lock = None
+
+    async def close(self):
+        if self._session:
+            await self._session.close()
+            self._session = None
+
+    async def get_spreadsheet_with_values(self, spreadsheet_id):
+        """Gets all sheets, their values and their merges. See spreadsheet._get_spreadsheet_with_values."""
+        content = await self._request("GET", spreadsheet_id, "read", params={"fields": FIELDS})
+        return await asyncio.get_running_loop().run_in_executor(None, _parse_spreadsheet_content, content)
+
+    async def get_spreadsheet_with_ranges(self, spreadsheet_id, ranges):
+        """Gets the values of the ranges and the merges of every sheet. See spreadsheet._get_spreadsheet_with_ranges."""
+        content = await self._request("GET", spreadsheet_id, "read", params={"fields": METADATA_FIELDS})
+        sheets = get_sheets_from_metadata(json.loads(content))
+        a1_ranges = get_a1_ranges(sheets, ranges)
+        if not a1_ranges:
+            return sheets
+        params = [("ranges", a1_range) for a1_range in a1_ranges] + list(BATCH_GET_PARAMETERS.items())
+        content = await self._request("GET", spreadsheet_id + "/values:batchGet", "read", params=params)
+        await asyncio.get_running_loop().run_in_executor(None, _add_value_ranges_content, sheets, content)
+        return sheets
+
+    async def write_ranges(self, spreadsheet_id, range_name_array, values_array, value_input_option="USER_ENTERED"):
+        """Writes values in multiple ranges in the real spreadsheet."""
+        data = [{"range": range_name, "values": values} for range_name, values in zip(range_name_array, values_array)]
+        body = {"valueInputOption": value_input_option, "data": data}
+        await self._request("POST", spreadsheet_id + "/values:batchUpdate", "write", json=body)
+
+    async def _request(self, method, path, operation, **kwargs):
+        """Sends a request to the API and returns the raw content of the response. Raises HttpError on failure."""
+        headers = {}
+        token = await self._get_token()
+        if token:
+            headers["Authorization"] = "Bearer " + token
+        try:
+            async with self._get_session().request(method, self.base_url + path, headers=headers, **kwargs) as response:
+                content = await response.read()
+                if response.status >= 400:
+                    raise HttpError(response.status, operation, content.decode("utf-8", "replace"))
+                return content
+        except asyncio.TimeoutError as e:
+            raise HttpError(408, operation, e)
+        except aiohttp.ClientError as e:
+            raise HttpError(499, operation, e)
+
+    def _get_session(self):
+        if not self._session or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=KEEPALIVE_TIMEOUT)
+            self._session = aiohttp.ClientSession(
+                connector=connector, timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
+            )
+        return self._session
+
+    async def _get_token(self):
+        """Returns the access token of the credentials, refreshing it only when it has expired."""
+        if not self.credentials:
+            return None
+        if not self._token_lock:
+            self._token_lock = asyncio.Lock()
+        async with self._token_lock:
+            if not self.credentials.valid:
+                await asyncio.get_running_loop().run_in_executor(None, self.credentials.refresh, Request())
+        return self.credentials.token
+
+
+def _parse_spreadsheet_content(content):
+    return parse_spreadsheet_response(content, get_cell_value)
+
+
+def _add_value_ranges_content(sheets, content):
+    add_value_ranges(sheets, json.loads(content).get("valueRanges", []))
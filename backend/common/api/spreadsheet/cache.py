@@ -0,0 +1,99 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class SpreadsheetCache:
+    """
+    In-process cache of spreadsheets, shared by every guild. Entries are evicted in least recently used order when the
+    total size goes over max_size (in bytes), and expire ttl seconds after being stored.
+    An entry is also dropped when its spreadsheet has been written since it was stored (see Spreadsheet.get_version),
+    so that values which were never saved in a snapshot are not served to other users.
+    """
+
+    def __init__(self, max_size, ttl, clock=time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, spreadsheet_id):
+        """Returns the cached spreadsheet, or None if it is not cached, expired or has been written since."""
+        with self._lock:
+            entry = self._entries.get(spreadsheet_id)
+            if entry is not None and (self.clock() >= entry.stored_at + self.ttl or entry.is_stale()):
+                self._remove(spreadsheet_id)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(spreadsheet_id)
+            return entry.spreadsheet
+
+    def put(self, spreadsheet_id, spreadsheet):
+        """Stores the spreadsheet, evicting the least recently used ones if needed."""
+        entry = _CacheEntry(spreadsheet, self.clock())
+        with self._lock:
+            if spreadsheet_id in self._entries:
+                self._remove(spreadsheet_id)
+            if entry.size > self.max_size:
+                return
+            self._entries[spreadsheet_id] = entry
+            self.size += entry.size
+            while self.size > self.max_size:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, spreadsheet_id):
+        with self._lock:
+            if spreadsheet_id in self._entries:
+                self._remove(spreadsheet_id)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def get_age(self, spreadsheet_id):
+        """Returns the number of seconds since the spreadsheet has been stored, or None if it is not cached."""
+        with self._lock:
+            entry = self._entries.get(spreadsheet_id)
+            if entry is None:
+                return None
+            return self.clock() - entry.stored_at
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "size": self.size,
+                "max_size": self.max_size,
+            }
+
+    def _remove(self, spreadsheet_id):
+        self.size -= self._entries.pop(spreadsheet_id).size
+
+
+class _CacheEntry:
+    __slots__ = ("spreadsheet", "version", "size", "stored_at")
+
+    def __init__(self, spreadsheet, stored_at):
+        self.spreadsheet = spreadsheet
+        self.version = spreadsheet.get_version()
+        self.size = spreadsheet.get_size()
+        self.stored_at = stored_at
+
+    def is_stale(self):
+        return self.spreadsheet.get_version() != self.version
@@ -4,36 +4,94 @@ import sys
 class Cell:
     """Contains coordinates and a value."""
 
+    __slots__ = (
+        "x",
+        "y",
+        "x_merge_range",
+        "y_merge_range",
+        "_raw",
+        "_value_type",
+        "_str",
+        "_casefold",
+        "_typed",
+        "_updated",
+        "_worksheet",
+        "__weakref__",
+    )
+
     def __init__(self, x, y, value):
         self.x = x
         self.y = y
-        super().__setattr__("value", str(value))
-        self.value_type = type(value)
         self.x_merge_range = [x]
         self.y_merge_range = [y]
+        self._raw = value
+        self._value_type = type(value)
+        self._str = None
+        self._casefold = None
+        self._typed = _NOT_COMPUTED
         self._updated = False
-
-    def __setattr__(self, name, value):
-        if name == "value":
-            super().__setattr__("_updated", True)
-            super().__setattr__("value_type", type(value))
-            return super().__setattr__(name, str(value))
-        return super().__setattr__(name, value)
+        self._worksheet = None
+
+    @property
+    def value(self):
+        """String form of the raw value, computed on first access."""
+        value = self._str
+        if value is None:
+            value = self._str = str(self._raw)
+        return value
+
+    @value.setter
+    def value(self, new_value):
+        self.set(new_value)
+
+    @property
+    def value_type(self):
+        return self._value_type
+
+    @value_type.setter
+    def value_type(self, value_type):
+        if value_type is not self._value_type:
+            self._value_type = value_type
+            self._typed = _NOT_COMPUTED
 
     def set(self, new_value):
-        self.value = new_value
+        self._raw = new_value
+        self._value_type = type(new_value)
+        self._str = None
+        self._casefold = None
+        self._typed = _NOT_COMPUTED
+        self._updated = True
+        if self._worksheet is not None:
+            self._worksheet._set_value(self.x, self.y, new_value)
 
     def get(self):
-        if self.value_type == bool:
-            if self.value == "True":
-                return True
-            else:
-                return False
+        typed = self._typed
+        if typed is _NOT_COMPUTED:
+            typed = self._typed = self._to_value_type()
+        return typed
+
+    def _to_value_type(self):
+        """Converts the raw value to value_type, going through its string form like the sheet does."""
+        value_type = self._value_type
+        if value_type is type(self._raw):
+            return self._raw
+        if value_type == bool:
+            return self.value == "True"
         try:
-            return self.value_type(self.value)
+            return value_type(self.value)
         except Exception:
             return self.value
 
+    def __getstate__(self):
+        return (self.x, self.y, self.x_merge_range, self.y_merge_range, self._raw, self._value_type, self._updated)
+
+    def __setstate__(self, state):
+        self.x, self.y, self.x_merge_range, self.y_merge_range, self._raw, self._value_type, self._updated = state
+        self._str = None
+        self._casefold = None
+        self._typed = _NOT_COMPUTED
+        self._worksheet = None
+
     def set_merge_range(self, x_merge_range, y_merge_range):
         """Sets the x_range and y_range of the merge containing this cell."""
         self.x_merge_range = x_merge_range
@@ -41,13 +99,16 @@ class Cell:
 
     def has_value(self, value_to_compare, case_sensitive=False):
         """Checks if the cell contains a value. To use in case of multi values like: value1/value2."""
-        cell_value = self.value
         value_to_compare = str(value_to_compare)
-        if not case_sensitive:
+        if case_sensitive:
+            cell_value = self.value
+        else:
             value_to_compare = value_to_compare.casefold()
-            cell_value = cell_value.casefold()
+            cell_value = self.casefold()
         if cell_value == value_to_compare:
             return True
+        if "/" not in cell_value:
+            return False
         values = cell_value.split("/")
         for value in values:
             if value.strip() == value_to_compare:
@@ -91,11 +152,8 @@ class Cell:
         return hash(self.value)
 
     def __nonzero__(self):
-        if self.value_type == bool:
-            if self.value == "True":
-                return True
-            else:
-                return False
+        if self._value_type == bool:
+            return self.value == "True"
         return bool(self.value)
 
     def __iter__(self):
@@ -104,13 +162,9 @@ class Cell:
     def __reversed__(self):
         return reversed(self.value)
 
-    def __getnewargs__(self):
-        return (self.value[:],)
-
     def __eq__(self, other):
-        if self.value_type == bool:
-            bool_value = True if self.value == "True" else False
-            return bool_value == other
+        if self._value_type == bool:
+            return (self.value == "True") == other
         if isinstance(other, Cell):
             return self.value == other.value
         return self.value == other
@@ -176,7 +230,10 @@ class Cell:
         return self.value.capitalize()
 
     def casefold(self):
-        return self.value.casefold()
+        value = self._casefold
+        if value is None:
+            value = self._casefold = self.value.casefold()
+        return value
 
     def center(self, width, *args):
         return self.value.center(width, *args)
@@ -327,3 +384,6 @@ class Cell:
 
     def zfill(self, width):
         return self.value.zfill(width)
+
+
+_NOT_COMPUTED = object()
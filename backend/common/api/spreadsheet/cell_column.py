@@ -0,0 +1,59 @@
+from array import array
+
+from .cell import Cell
+from .utils import find_corresponding_cell_best_effort, find_corresponding_cells_best_effort
+
+
+class CellColumn:
+    """
+    Coordinates of the cells of a range corresponding to each cell of a list of base cells (like match ids or team
+    names), as typed arrays. The cells themselves are only created by get_cells, from any view of the spreadsheet.
+    """
+
+    def __init__(self, worksheet_index):
+        self.worksheet_index = worksheet_index
+        self.offsets = array("I", [0])
+        self.xs = array("i")
+        self.ys = array("i")
+
+    @staticmethod
+    def from_range(spreadsheet, range_name, base_cells, multiple_cells, max_difference_with_base=0):
+        """
+        Finds the cells corresponding to each base cell, like find_corresponding_cell(s)_best_effort_from_range, but
+        reading the rows of the range only once. Only filled cells are kept when multiple_cells is set.
+        """
+        worksheet, range_spec = spreadsheet.get_worksheet_and_range(range_name)
+        column = CellColumn(spreadsheet.worksheets.index(worksheet))
+        ys = sorted({y for base_cell in base_cells for y in base_cell.y_merge_range})
+        rows_by_y = {row[0].y: row for row in worksheet.get_range_rows(range_spec, ys)}
+        for base_cell in base_cells:
+            range_cells = [rows_by_y[y] for y in base_cell.y_merge_range if y in rows_by_y]
+            if multiple_cells:
+                column.append(
+                    find_corresponding_cells_best_effort(
+                        range_cells, base_cell.y_merge_range, base_cell, max_difference_with_base
+                    )
+                )
+                continue
+            corresponding_cell = find_corresponding_cell_best_effort(range_cells, base_cell, max_difference_with_base)
+            if corresponding_cell.x == -1 and range_name:
+                corresponding_cell = worksheet.get_cell(range_spec.first_column, base_cell.y)
+            column.append([corresponding_cell])
+        return column
+
+    def append(self, cells):
+        for cell in cells:
+            self.xs.append(cell.x)
+            self.ys.append(cell.y)
+        self.offsets.append(len(self.xs))
+
+    def get_cells(self, spreadsheet, index):
+        """Returns the cells of the base cell at index. A cell not found is a new empty Cell, as in the lookups."""
+        worksheet = spreadsheet.worksheets[self.worksheet_index]
+        cells = []
+        for i in range(self.offsets[index], self.offsets[index + 1]):
+            if self.xs[i] < 0:
+                cells.append(Cell(-1, -1, ""))
+            else:
+                cells.append(worksheet.get_cell(self.xs[i], self.ys[i]))
+        return cells
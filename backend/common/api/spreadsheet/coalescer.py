@@ -0,0 +1,51 @@
+import json
+
+RANGE_OVERHEAD = 40
+
+
+def coalesce_rectangles(coordinates, get_value_cost=None, range_overhead=RANGE_OVERHEAD):
+    """
+    Groups updated coordinates into rectangles (x_min, x_max, y_min, y_max), with inclusive max.
+    Runs of a row separated by a gap are joined when rewriting the unchanged values of the gap costs less than
+    sending another range. Rows with the same run are then stacked into rectangles.
+    """
+    rows = {}
+    for x, y in coordinates:
+        rows.setdefault(y, []).append(x)
+    runs = []
+    for y in sorted(rows):
+        xs = sorted(rows[y])
+        x_min = x_max = xs[0]
+        for x in xs[1:]:
+            if x > x_max + 1 and not _is_gap_cheaper(get_value_cost, range(x_max + 1, x), y, range_overhead):
+                runs.append((x_min, x_max, y))
+                x_min = x
+            x_max = x
+        runs.append((x_min, x_max, y))
+    rectangles = []
+    open_rectangles = {}
+    for x_min, x_max, y in runs:
+        rectangle = open_rectangles.get((x_min, x_max))
+        if rectangle and rectangle[3] == y - 1:
+            rectangle[3] = y
+        else:
+            rectangle = [x_min, x_max, y, y]
+            open_rectangles[(x_min, x_max)] = rectangle
+            rectangles.append(rectangle)
+    return [tuple(rectangle) for rectangle in rectangles]
+
+
+def get_json_value_cost(value):
+    """Returns the size of a value once serialized in a request."""
+    return len(json.dumps(value)) + 2
+
+
+def _is_gap_cheaper(get_value_cost, gap, y, range_overhead):
+    if get_value_cost is None:
+        return False
+    cost = 0
+    for x in gap:
+        cost += get_value_cost(x, y)
+        if cost >= range_overhead:
+            return False
+    return True
@@ -0,0 +1,118 @@
+import hashlib
+import json
+import os
+import threading
+
+JOURNALS_DIRECTORY = "journals"
+
+
+class UpdateJournal:
+    """
+    Append-only journals of the values set in spreadsheets that have not been sent yet, one file per spreadsheet.
+    Each line is a JSON array [worksheet_name, x, y, value], after a first line containing the spreadsheet id.
+    A journal is compacted once its values have been sent, and removed when nothing is pending anymore.
+    """
+
+    def __init__(self, directory=JOURNALS_DIRECTORY):
+        self.directory = directory
+        self._lock = threading.Lock()
+
+    def append(self, spreadsheet_id, updates):
+        """Appends the updates, an iterable of (worksheet_name, x, y, value), to the journal of the spreadsheet."""
+        lines = [bytes(json.dumps(update) + "\n", "utf-8") for update in updates]
+        if not lines:
+            return
+        path = self._get_path(spreadsheet_id)
+        with self._lock:
+            if not os.path.exists(self.directory):
+                os.mkdir(self.directory)
+            with open(path, "a+b") as journal_file:
+                _truncate_partial_line(journal_file)
+                if journal_file.tell() == 0:
+                    journal_file.write(bytes(json.dumps({"spreadsheet_id": spreadsheet_id}) + "\n", "utf-8"))
+                journal_file.writelines(lines)
+                journal_file.flush()
+                os.fsync(journal_file.fileno())
+
+    def read(self, spreadsheet_id):
+        """
+        Returns the pending values of the spreadsheet, as a dict of (worksheet_name, x, y) to the last value set,
+        and the position up to which the journal has been read, to pass to compact once these values are sent.
+        """
+        updates = {}
+        position = 0
+        with self._lock:
+            try:
+                with open(self._get_path(spreadsheet_id), "rb") as journal_file:
+                    position = len(journal_file.readline())
+                    for line in journal_file:
+                        if not line.endswith(b"\n"):
+                            # Partially written during a crash, so it has never been acknowledged
+                            break
+                        position += len(line)
+                        try:
+                            worksheet_name, x, y, value = json.loads(line)
+                        except ValueError:
+                            # Appended after a partially written line
+                            continue
+                        updates[(worksheet_name, x, y)] = value
+            except IOError:
+                pass
+        return updates, position
+
+    def compact(self, spreadsheet_id, position):
+        """Removes the entries read before position, keeping the ones appended since."""
+        path = self._get_path(spreadsheet_id)
+        with self._lock:
+            try:
+                with open(path, "rb") as journal_file:
+                    header = journal_file.readline()
+                    journal_file.seek(max(position, len(header)))
+                    remaining_lines = [line for line in journal_file if line.endswith(b"\n")]
+            except IOError:
+                return
+            if not remaining_lines:
+                os.remove(path)
+                return
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "wb") as journal_file:
+                journal_file.write(header)
+                journal_file.writelines(remaining_lines)
+                journal_file.flush()
+                os.fsync(journal_file.fileno())
+            os.replace(tmp_path, path)
+
+    def get_spreadsheet_ids(self):
+        """Returns the ids of the spreadsheets having pending values."""
+        spreadsheet_ids = set()
+        with self._lock:
+            if not os.path.exists(self.directory):
+                return spreadsheet_ids
+            for entry in os.scandir(self.directory):
+                if not entry.is_file() or entry.name.endswith(".tmp"):
+                    continue
+                try:
+                    with open(entry.path, "rb") as journal_file:
+                        spreadsheet_ids.add(json.loads(journal_file.readline())["spreadsheet_id"])
+                except (IOError, ValueError, KeyError, TypeError):
+                    continue
+        return spreadsheet_ids
+
+    def _get_path(self, spreadsheet_id):
+        return os.path.join(self.directory, hashlib.blake2s(bytes(spreadsheet_id, "utf-8")).hexdigest())
+
+
+def _truncate_partial_line(journal_file):
+    """
+    Removes the end of the journal if it is a line partially written during a crash, so that the next entries are not
+    appended to it and then read as an invalid line. Leaves the journal file positioned at its end.
+    """
+    size = journal_file.seek(0, os.SEEK_END)
+    if size == 0:
+        return
+    journal_file.seek(size - 1)
+    if journal_file.read(1) == b"\n":
+        return
+    journal_file.seek(0)
+    journal_file.truncate(journal_file.read().rfind(b"\n") + 1)
+    journal_file.seek(0, os.SEEK_END)
@@ -0,0 +1,61 @@
+from bisect import bisect_right
+
+
+class Merge:
+    """A merged range of cells. Shared by every cell it contains."""
+
+    __slots__ = ("x_range", "y_range")
+
+    def __init__(self, x_min, x_max, y_min, y_max):
+        self.x_range = range(x_min, x_max)
+        self.y_range = range(y_min, y_max)
+
+    def __iter__(self):
+        return iter((self.x_range.start, self.x_range.stop, self.y_range.start, self.y_range.stop))
+
+    def __repr__(self):
+        return "Merge(%i, %i, %i, %i)" % tuple(self)
+
+
+class MergeIndex:
+    """
+    Index of the merges of a worksheet. For each row, the merges crossing it are kept sorted by their first column,
+    so that finding the merge containing a cell is a bisection.
+    """
+
+    def __init__(self, merges=()):
+        self._rows = {}
+        for merge in sorted(merges):
+            self.add(*merge)
+
+    def __len__(self):
+        return len({id(merge) for _, merges in self._rows.values() for merge in merges})
+
+    def __iter__(self):
+        seen = set()
+        for y in sorted(self._rows):
+            for merge in self._rows[y][1]:
+                if id(merge) not in seen:
+                    seen.add(id(merge))
+                    yield merge
+
+    def add(self, x_min, x_max, y_min, y_max):
+        """Adds a merge, with exclusive max, to the index and returns it."""
+        merge = Merge(x_min, x_max, y_min, y_max)
+        for y in merge.y_range:
+            starts, merges = self._rows.setdefault(y, ([], []))
+            i = bisect_right(starts, x_min)
+            starts.insert(i, x_min)
+            merges.insert(i, merge)
+        return merge
+
+    def find(self, x, y):
+        """Returns the merge containing the coordinates, if any."""
+        row = self._rows.get(y)
+        if not row:
+            return None
+        starts, merges = row
+        i = bisect_right(starts, x) - 1
+        if i >= 0 and x < merges[i].x_range.stop:
+            return merges[i]
+        return None
@@ -0,0 +1,148 @@
+import re
+from functools import lru_cache
+
+from .utils import from_letter_base, to_letter_base
+
+RANGE_SEPARATOR_REGEX = re.compile(r",| |, |;|; |\|")
+COLUMN_RANGE_REGEX = re.compile(r"^([A-Z]+)(?::([A-Z]+))?$")
+ROW_RANGE_REGEX = re.compile(r"^([0-9]+)(?::([0-9]+))?$")
+SQUARE_RANGE_REGEX = re.compile(r"^([A-Z]+)([0-9]+)(?::([A-Z]+)([0-9]+))?$")
+PARTIAL_COLUMN_RANGE_REGEX = re.compile(r"^([A-Z]+)([0-9]*):([A-Z]+)([0-9]*)$")
+PARTIAL_ROW_RANGE_REGEX = re.compile(r"^([A-Z]+)([0-9]+):([0-9]+)$")
+
+COLUMN_RANGE = 0
+ROW_RANGE = 1
+SQUARE_RANGE = 2
+PARTIAL_COLUMN_RANGE = 3
+PARTIAL_ROW_RANGE = 4
+
+
+class RangePart:
+    """A single range of a range expression, with 0-based inclusive bounds. None means the bound is not given."""
+
+    __slots__ = ("kind", "x_min", "x_max", "y_min", "y_max")
+
+    def __init__(self, kind, x_min=None, x_max=None, y_min=None, y_max=None):
+        self.kind = kind
+        self.x_min = x_min
+        self.x_max = x_max
+        self.y_min = y_min
+        self.y_max = y_max
+
+    def __eq__(self, other):
+        return isinstance(other, RangePart) and self._key() == other._key()
+
+    def __hash__(self):
+        return hash(self._key())
+
+    def __repr__(self):
+        return "RangePart(%r, %r, %r, %r, %r)" % self._key()
+
+    def get_a1_notation(self):
+        """
+        Returns the range in A1 notation, to fetch it. A partial row range (C2:4) has no A1 equivalent, so its whole
+        rows are returned.
+        """
+        if self.kind == COLUMN_RANGE:
+            return to_letter_base(self.x_min) + ":" + to_letter_base(self.x_max)
+        elif self.kind == SQUARE_RANGE:
+            return (
+                to_letter_base(self.x_min)
+                + str(self.y_min + 1)
+                + ":"
+                + to_letter_base(self.x_max)
+                + str(self.y_max + 1)
+            )
+        elif self.kind == PARTIAL_COLUMN_RANGE:
+            return to_letter_base(self.x_min) + str(self.y_min + 1) + ":" + to_letter_base(self.x_max)
+        return str(self.y_min + 1) + ":" + str(self.y_max + 1)
+
+    def _key(self):
+        return (self.kind, self.x_min, self.x_max, self.y_min, self.y_max)
+
+
+class RangeSpec:
+    """
+    A compiled range expression like "Sheet!A2:C,E2:E". Parsing is done once per range name, the bounds depending
+    on the worksheet size (open ends) are resolved by the worksheet when the range is used.
+    """
+
+    __slots__ = ("worksheet_name", "range_name", "parts")
+
+    def __init__(self, range_name):
+        self.worksheet_name = None
+        if "!" in range_name:
+            self.worksheet_name, range_name = range_name.rsplit("!", 1)
+        self.range_name = range_name
+        self.parts = tuple(
+            filter(None, (_compile_range_part(part) for part in RANGE_SEPARATOR_REGEX.split(range_name)))
+        )
+
+    @staticmethod
+    def compile(range_name):
+        """Returns the RangeSpec corresponding to the range name. Already compiled ranges are returned as is."""
+        if isinstance(range_name, RangeSpec):
+            return range_name
+        return _compile_range(range_name)
+
+    @property
+    def first_column(self):
+        """Returns the first column of the first range, or -1 if it does not have one."""
+        if not self.parts or self.parts[0].x_min is None:
+            return -1
+        return self.parts[0].x_min
+
+    @property
+    def first_row(self):
+        """Returns the first row of the first range, or -1 if it does not have one."""
+        if not self.parts or self.parts[0].y_min is None:
+            return -1
+        return self.parts[0].y_min
+
+    def __bool__(self):
+        return bool(self.range_name)
+
+    def __str__(self):
+        return self.range_name
+
+    def __repr__(self):
+        if self.worksheet_name is None:
+            return "RangeSpec(%r)" % self.range_name
+        return "RangeSpec(%r)" % (self.worksheet_name + "!" + self.range_name)
+
+
+@lru_cache(maxsize=1024)
+def _compile_range(range_name):
+    return RangeSpec(range_name)
+
+
+def _compile_range_part(range_name):
+    """Returns the RangePart corresponding to a single range, or None if it is invalid."""
+    range_name = range_name.strip()
+    if match := COLUMN_RANGE_REGEX.match(range_name):
+        column, column2 = match.groups()
+        x_min = from_letter_base(column)
+        x_max = from_letter_base(column2) if column2 else x_min
+        return RangePart(COLUMN_RANGE, x_min, x_max)
+    elif match := ROW_RANGE_REGEX.match(range_name):
+        row, row2 = match.groups()
+        y_min = int(row) - 1
+        y_max = int(row2) - 1 if row2 else y_min
+        return RangePart(ROW_RANGE, y_min=y_min, y_max=y_max)
+    elif match := SQUARE_RANGE_REGEX.match(range_name):
+        column, row, column2, row2 = match.groups()
+        x_min, y_min = from_letter_base(column), int(row) - 1
+        if column2:
+            x_max, y_max = from_letter_base(column2), int(row2) - 1
+        else:
+            x_max, y_max = x_min, y_min
+        return RangePart(SQUARE_RANGE, x_min, x_max, y_min, y_max)
+    elif match := PARTIAL_COLUMN_RANGE_REGEX.match(range_name):
+        column, row, column2, row2 = match.groups()
+        return RangePart(
+            PARTIAL_COLUMN_RANGE, from_letter_base(column), from_letter_base(column2), int(row or row2) - 1
+        )
+    elif match := PARTIAL_ROW_RANGE_REGEX.match(range_name):
+        column, row, row2 = match.groups()
+        return RangePart(PARTIAL_ROW_RANGE, from_letter_base(column), y_min=int(row) - 1, y_max=int(row2) - 1)
+    return None
@@ -0,0 +1,125 @@
+import asyncio
+import heapq
+import itertools
+import random
+import time
+
+READ = "read"
+WRITE = "write"
+INTERACTIVE = 0
+BACKGROUND = 1
+# The per minute quotas of the Sheets API are 300 read and 300 write requests for the whole project. The rates leave
+# room for the bursts allowed by the buckets.
+READ_REQUESTS_PER_MINUTE = 240
+WRITE_REQUESTS_PER_MINUTE = 240
+BACKOFF_BASE_DELAY = 1
+BACKOFF_MAX_DELAY = 64
+
+
+def get_backoff_delay(n_retry, base_delay=BACKOFF_BASE_DELAY, max_delay=BACKOFF_MAX_DELAY):
+    """Returns the delay before the n-th retry: exponential, with full jitter to spread retries of every guild."""
+    return random.uniform(0, min(max_delay, base_delay * 2**n_retry))
+
+
+class TokenBucket:
+    """Allows rate requests per minute, with bursts of up to capacity (a quarter of rate by default) requests."""
+
+    def __init__(self, rate, capacity=None, clock=time.monotonic):
+        self.rate = rate / 60
+        self.capacity = capacity or max(1, rate // 4)
+        self.clock = clock
+        self.tokens = self.capacity
+        self.last_update = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.last_update) * self.rate)
+        self.last_update = now
+
+    def get_delay(self, n_tokens=1):
+        """Returns the number of seconds to wait before n_tokens are available."""
+        self._refill()
+        return max(0, (min(n_tokens, self.capacity) - self.tokens) / self.rate)
+
+    def take(self, n_tokens=1):
+        self._refill()
+        self.tokens -= n_tokens
+
+
+class SheetsRequestScheduler:
+    """
+    Schedules the requests sent to the Sheets API so that they stay within the read and write quotas shared by every
+    guild. Requests wait in one queue per operation, interactive ones being served before background ones.
+    """
+
+    def __init__(self, read_rate=READ_REQUESTS_PER_MINUTE, write_rate=WRITE_REQUESTS_PER_MINUTE, clock=time.monotonic):
+        self.clock = clock
+        self._queues = {
+            READ: _RequestQueue(TokenBucket(read_rate, clock=clock)),
+            WRITE: _RequestQueue(TokenBucket(write_rate, clock=clock)),
+        }
+        self._counter = itertools.count()
+
+    async def acquire(self, operation, priority=INTERACTIVE, n_requests=1):
+        """Waits until n_requests of the operation (READ or WRITE) can be sent."""
+        queue = self._queues[operation]
+        waiter = (priority, next(self._counter), n_requests, asyncio.get_running_loop().create_future())
+        heapq.heappush(queue.waiters, waiter)
+        start = self.clock()
+        self._dispatch(queue)
+        try:
+            await waiter[3]
+        except asyncio.CancelledError:
+            if waiter in queue.waiters:
+                queue.waiters.remove(waiter)
+                heapq.heapify(queue.waiters)
+                self._dispatch(queue)
+            raise
+        wait_time = self.clock() - start
+        queue.n_requests += n_requests
+        queue.n_waits += 1
+        queue.total_wait_time += wait_time
+        queue.max_wait_time = max(queue.max_wait_time, wait_time)
+
+    def _dispatch(self, queue):
+        """Lets the first waiters of the queue go while there are enough tokens, then waits for the next ones."""
+        if queue.timer:
+            queue.timer.cancel()
+            queue.timer = None
+        while queue.waiters:
+            _, _, n_requests, future = queue.waiters[0]
+            delay = queue.bucket.get_delay(n_requests)
+            if delay > 0:
+                queue.timer = asyncio.get_running_loop().call_later(delay, self._dispatch, queue)
+                return
+            heapq.heappop(queue.waiters)
+            if not future.done():
+                queue.bucket.take(n_requests)
+                future.set_result(None)
+
+    def get_metrics(self):
+        """Returns, per operation, the number of waiting requests and statistics about the time they waited."""
+        metrics = {}
+        for operation, queue in self._queues.items():
+            metrics[operation] = {
+                "queue_depth": len(queue.waiters),
+                "requests": queue.n_requests,
+                "total_wait_time": queue.total_wait_time,
+                "max_wait_time": queue.max_wait_time,
+                "average_wait_time": queue.total_wait_time / queue.n_waits if queue.n_waits else 0,
+            }
+        return metrics
+
+
+class _RequestQueue:
+    def __init__(self, bucket):
+        self.bucket = bucket
+        self.waiters = []
+        self.timer = None
+        self.n_requests = 0
+        self.n_waits = 0
+        self.total_wait_time = 0
+        self.max_wait_time = 0
+
+
+scheduler = SheetsRequestScheduler()
@@ -0,0 +1,256 @@
+import codecs
+import json
+import re
+
+from .range_spec import RangeSpec
+from .utils import from_letter_base
+
+WHITESPACE_REGEX = re.compile(r"[ \t\n\r]*")
+JSON_DECODER = json.JSONDecoder()
+JSON_CHUNK_SIZE = 64 * 1024
+
+
+class JsonStream:
+    """
+    Walks a JSON document without decoding it as a whole. Containers are entered with iter_object and iter_array,
+    every other value is decoded (or skipped) with decode_value. Each yielded element must be consumed.
+    The document is given as UTF-8 bytes, and converted to text chunk_size bytes at a time: only the part not parsed
+    yet of the current chunks is held as text, never the whole document.
+    """
+
+    def __init__(self, content, chunk_size=None):
+        if isinstance(content, str):
+            content = content.encode("utf-8")
+        self._content = memoryview(content)
+        self._position = 0
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._chunk_size = chunk_size or JSON_CHUNK_SIZE
+        self.text = ""
+        self.index = 0
+
+    def _at_end(self):
+        return self._position >= len(self._content)
+
+    def _read(self, min_size):
+        """
+        Appends at least min_size bytes (and at least a chunk) of the document to the text, dropping the text already
+        parsed. Returns False if the whole document has already been read.
+        """
+        if self._at_end():
+            return False
+        end = self._position + max(self._chunk_size, min_size)
+        chunk = self._content[self._position : end]
+        self._position = min(end, len(self._content))
+        self.text = self.text[self.index :] + self._decoder.decode(chunk, self._at_end())
+        self.index = 0
+        return True
+
+    def _next_char(self):
+        while True:
+            self.index = WHITESPACE_REGEX.match(self.text, self.index).end()
+            if self.index < len(self.text):
+                return self.text[self.index]
+            if not self._read(0):
+                raise ValueError("Unexpected end of JSON document")
+
+    def _expect(self, char):
+        if self._next_char() != char:
+            raise ValueError("Expected %s at position %i" % (char, self.index))
+        self.index += 1
+
+    def _end_of_container(self, end_char):
+        char = self._next_char()
+        self.index += 1
+        if char == end_char:
+            return True
+        elif char != ",":
+            raise ValueError("Expected , or %s at position %i" % (end_char, self.index - 1))
+        return False
+
+    def decode_value(self):
+        """
+        Decodes the next value. A value is only complete once the text after it is read: until then, as much text as
+        the value already read is added before decoding it again, so that large values are decoded in linear time.
+        """
+        self._next_char()
+        while True:
+            try:
+                value, end = JSON_DECODER.raw_decode(self.text, self.index)
+                if end < len(self.text) or self._at_end():
+                    self.index = end
+                    return value
+            except ValueError:
+                if self._at_end():
+                    raise
+            self._read(len(self.text) - self.index)
+
+    def iter_object(self):
+        """Yields the keys of the next object. The value of each key must be consumed before the next iteration."""
+        self._expect("{")
+        if self._next_char() == "}":
+            self.index += 1
+            return
+        while True:
+            key = self.decode_value()
+            self._expect(":")
+            yield key
+            if self._end_of_container("}"):
+                return
+
+    def iter_array(self):
+        """Yields once per element of the next array. Each element must be consumed before the next iteration."""
+        self._expect("[")
+        if self._next_char() == "]":
+            self.index += 1
+            return
+        while True:
+            yield
+            if self._end_of_container("]"):
+                return
+
+
+def parse_spreadsheet_response(content, get_cell_value):
+    """
+    Parses the raw content of a spreadsheets().get response into sheets ({"name", "cells", "merges"}). Rows are
+    decoded one at a time and converted to values right away, so the response is neither held as a whole JSON tree
+    nor as a whole text, only as the bytes received.
+    """
+    stream = JsonStream(content)
+    sheets = []
+    for key in stream.iter_object():
+        if key != "sheets":
+            stream.decode_value()
+            continue
+        for _ in stream.iter_array():
+            sheets.append(_parse_sheet(stream, get_cell_value))
+    return sheets
+
+
+def _parse_sheet(stream, get_cell_value):
+    sheet = {"name": "", "cells": [], "merges": []}
+    for key in stream.iter_object():
+        if key == "properties":
+            sheet["name"] = stream.decode_value().get("title", "")
+        elif key == "merges":
+            sheet["merges"] = [
+                (
+                    merge_info["startColumnIndex"],
+                    merge_info["endColumnIndex"],
+                    merge_info["startRowIndex"],
+                    merge_info["endRowIndex"],
+                )
+                for merge_info in stream.decode_value()
+            ]
+        elif key == "data":
+            for i, _ in enumerate(stream.iter_array()):
+                if i == 0:
+                    sheet["cells"] = _parse_grid_data(stream, get_cell_value)
+                else:
+                    stream.decode_value()
+        else:
+            stream.decode_value()
+    return sheet
+
+
+def _parse_grid_data(stream, get_cell_value):
+    rows = []
+    for key in stream.iter_object():
+        if key != "rowData":
+            stream.decode_value()
+            continue
+        for _ in stream.iter_array():
+            row = stream.decode_value()
+            rows.append([get_cell_value(value) for value in row.get("values", [])])
+    return rows
+
+
+def get_cell_value(value):
+    if "userEnteredValue" in value and "formulaValue" in value["userEnteredValue"]:
+        return value["userEnteredValue"]["formulaValue"]
+    elif "userEnteredValue" in value and "stringValue" in value["userEnteredValue"]:
+        return value["userEnteredValue"]["stringValue"].strip()
+    elif "userEnteredValue" in value and "numberValue" in value["userEnteredValue"]:
+        return value["userEnteredValue"]["numberValue"]
+    elif "userEnteredValue" in value and "boolValue" in value["userEnteredValue"]:
+        return value["userEnteredValue"]["boolValue"]
+    # ? Not used for the main use case, might be needed for other use cases ?
+    # elif "effectiveValue" in value and "formattedValue" in value["effectiveValue"]:
+    #    return value["effectiveValue"]["formattedValue"]
+    # elif "effectiveValue" in value and "stringValue" in value["effectiveValue"]:
+    #    return value["effectiveValue"]["stringValue"]
+    return ""
+
+
+def get_sheets_from_metadata(metadata):
+    """Returns the sheets, with their merges and without any value, from a response fetching METADATA_FIELDS."""
+    sheets = []
+    for sheet in metadata.get("sheets", []):
+        merges = [
+            (
+                merge_info["startColumnIndex"],
+                merge_info["endColumnIndex"],
+                merge_info["startRowIndex"],
+                merge_info["endRowIndex"],
+            )
+            for merge_info in sheet.get("merges", [])
+        ]
+        sheets.append({"name": sheet["properties"]["title"], "cells": [], "merges": merges, "loaded_ranges": []})
+    return sheets
+
+
+def get_a1_ranges(sheets, ranges):
+    """Returns the ranges to fetch with values.batchGet, in A1 notation with their sheet name."""
+    a1_ranges = []
+    if not sheets:
+        return a1_ranges
+    for range_name in ranges:
+        range_spec = RangeSpec.compile(range_name)
+        sheet_name = range_spec.worksheet_name.strip("'").replace("''", "'") if range_spec.worksheet_name else None
+        sheet_name = _quote_sheet_name(sheet_name or sheets[0]["name"])
+        a1_ranges.extend(sheet_name + "!" + part.get_a1_notation() for part in range_spec.parts)
+    return a1_ranges
+
+
+def add_value_ranges(sheets, value_ranges):
+    """Adds the values returned by values.batchGet to the sheets, and marks their ranges as loaded."""
+    sheets_by_name = {sheet["name"]: sheet for sheet in sheets}
+    for value_range in value_ranges:
+        sheet_name, x_min, x_max, y_min, y_max = _parse_a1_range(value_range["range"])
+        sheet = sheets_by_name.get(sheet_name)
+        if not sheet:
+            continue
+        sheet["loaded_ranges"].append((x_min, x_max, y_min, y_max))
+        rows = sheet["cells"]
+        for y, row in enumerate(value_range.get("values", []), y_min):
+            if y >= len(rows):
+                rows.extend([] for _ in range(y + 1 - len(rows)))
+            for x, value in enumerate(row, x_min):
+                if x >= len(rows[y]):
+                    rows[y].extend("" for _ in range(x + 1 - len(rows[y])))
+                rows[y][x] = _get_fetched_value(value)
+
+
+def _get_fetched_value(value):
+    """Returns a value fetched with values.batchGet, as get_cell_value would have returned it."""
+    if isinstance(value, str) and not value.startswith("="):
+        return value.strip()
+    return value
+
+
+def _quote_sheet_name(sheet_name):
+    return "'" + sheet_name.replace("'", "''") + "'"
+
+
+def _parse_a1_range(range_name):
+    """Returns the sheet name and the rectangle, with exclusive max, of a range returned by the API (Sheet!A1:B2)."""
+    sheet_name, range_name = range_name.rsplit("!", 1)
+    if sheet_name.startswith("'") and sheet_name.endswith("'"):
+        sheet_name = sheet_name[1:-1].replace("''", "'")
+    start, _, end = range_name.partition(":")
+    start_column, start_row = re.match(r"^([A-Z]*)(\d*)$", start).groups()
+    end_column, end_row = re.match(r"^([A-Z]*)(\d*)$", end or start).groups()
+    x_min = from_letter_base(start_column) if start_column else 0
+    y_min = int(start_row) - 1 if start_row else 0
+    x_max = from_letter_base(end_column) + 1 if end_column else x_min + 1
+    y_max = int(end_row) if end_row else y_min + 1
+    return sheet_name, x_min, x_max, y_min, y_max
@@ -0,0 +1,39 @@
+import logging
+
+from googleapiclient import discovery
+
+REVISION_FIELDS = "version,modifiedTime"
+logger = logging.getLogger(__name__)
+
+
+class RevisionChecker:
+    """
+    Base class of the objects telling if a spreadsheet has been modified, without retrieving it.
+    get_revision returns a marker that changes each time the spreadsheet is modified, or None if it is unknown.
+    """
+
+    def get_revision(self, spreadsheet_id):
+        raise NotImplementedError
+
+
+class DriveRevisionChecker(RevisionChecker):
+    """
+    Gets the version of the spreadsheet file from the Drive API. The Sheets API does not expose any revision, while
+    the version of a Drive file is incremented on each change, for a request much cheaper than the spreadsheet itself.
+    """
+
+    def __init__(self, credentials):
+        self.service = discovery.build("drive", "v3", credentials=credentials)
+
+    def get_revision(self, spreadsheet_id):
+        try:
+            metadata = (
+                self.service.files()
+                .get(fileId=spreadsheet_id, fields=REVISION_FIELDS, supportsAllDrives=True)
+                .execute()
+            )
+        except Exception:
+            # The revision is then unknown, so the spreadsheet is retrieved
+            logger.warning("Could not get the revision of spreadsheet %s", spreadsheet_id, exc_info=True)
+            return None
+        return metadata.get("version") or metadata.get("modifiedTime")
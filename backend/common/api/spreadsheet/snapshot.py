@@ -0,0 +1,121 @@
+import io
+import struct
+import sys
+from array import array
+
+MAGIC = b"TSSP"
+VERSION = 2
+HEADER_STRUCT = struct.Struct("<4sHHI")
+WORKSHEET_HEADER_STRUCT = struct.Struct("<iII")
+U32_STRUCT = struct.Struct("<I")
+I32_STRUCT = struct.Struct("<i")
+
+
+class InvalidSnapshot(Exception):
+    """Special exception raised when a snapshot is corrupted or written with another version of the format."""
+
+
+def dump_snapshot(spreadsheet_id, worksheets, revision=None):
+    """
+    Returns a spreadsheet snapshot. The format is a header with the revision of the spreadsheet, then for each
+    worksheet its string table, its column arrays, its merges and its pending updates.
+    """
+    snapshot_file = io.BytesIO()
+    writer = _SnapshotWriter(snapshot_file)
+    snapshot_file.write(HEADER_STRUCT.pack(MAGIC, VERSION, 0, len(worksheets)))
+    writer.write_string(spreadsheet_id)
+    writer.write_string(revision or "")
+    for worksheet in worksheets:
+        worksheet._write_snapshot(writer)
+    return snapshot_file.getvalue()
+
+
+def load_snapshot(buffer, worksheet_class):
+    """
+    Reads a spreadsheet snapshot from a bytes-like object, which is not referenced anymore once this returns.
+    Returns the spreadsheet id, the revision (None if unknown) and the worksheets.
+    """
+    reader = _SnapshotReader(buffer)
+    try:
+        magic, version, _, n_worksheets = reader.read_struct(HEADER_STRUCT)
+        if magic != MAGIC or version != VERSION:
+            raise InvalidSnapshot(magic, version)
+        spreadsheet_id = reader.read_string()
+        revision = reader.read_string() or None
+        worksheets = [worksheet_class._read_snapshot(reader) for _ in range(n_worksheets)]
+    except (struct.error, ValueError, IndexError, UnicodeDecodeError) as e:
+        raise InvalidSnapshot() from e
+    finally:
+        reader.release()
+    return spreadsheet_id, revision, worksheets
+
+
+class _SnapshotWriter:
+    def __init__(self, snapshot_file):
+        self.file = snapshot_file
+
+    def write_struct(self, struct_format, *values):
+        self.file.write(struct_format.pack(*values))
+
+    def write_string(self, string):
+        data = string.encode("utf-8")
+        self.file.write(U32_STRUCT.pack(len(data)))
+        self.file.write(data)
+
+    def write_array(self, values):
+        """Writes the length of an array, then its items in little-endian."""
+        self.file.write(U32_STRUCT.pack(len(values)))
+        self.write_raw_array(values)
+
+    def write_raw_array(self, values):
+        if sys.byteorder == "big" and values.itemsize > 1:
+            values = array(values.typecode, values)
+            values.byteswap()
+        self.file.write(values.tobytes())
+
+    def write_string_table(self, strings):
+        """Writes the strings as one UTF-8 blob followed by their offsets in characters."""
+        offsets = array("I", [0])
+        for string in strings:
+            offsets.append(offsets[-1] + len(string))
+        self.write_string("".join(strings))
+        self.write_array(offsets)
+
+
+class _SnapshotReader:
+    def __init__(self, buffer):
+        self.view = memoryview(buffer)
+        self.offset = 0
+
+    def release(self):
+        self.view.release()
+
+    def _read_bytes(self, size):
+        if self.offset + size > len(self.view):
+            raise ValueError("Truncated snapshot")
+        data = self.view[self.offset : self.offset + size]
+        self.offset += size
+        return data
+
+    def read_struct(self, struct_format):
+        return struct_format.unpack(self._read_bytes(struct_format.size))
+
+    def read_string(self):
+        (size,) = self.read_struct(U32_STRUCT)
+        return str(self._read_bytes(size), "utf-8")
+
+    def read_array(self, typecode):
+        (size,) = self.read_struct(U32_STRUCT)
+        return self.read_raw_array(typecode, size)
+
+    def read_raw_array(self, typecode, size):
+        values = array(typecode)
+        values.frombytes(self._read_bytes(size * values.itemsize))
+        if sys.byteorder == "big" and values.itemsize > 1:
+            values.byteswap()
+        return values
+
+    def read_string_table(self):
+        text = self.read_string()
+        offsets = self.read_array("I")
+        return [text[offsets[i] : offsets[i + 1]] for i in range(len(offsets) - 1)]
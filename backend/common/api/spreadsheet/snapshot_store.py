@@ -0,0 +1,91 @@
+import hashlib
+import logging
+import mmap
+import os
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+
+class SnapshotStore:
+    """
+    Base class of the stores of spreadsheet snapshots, shared by every process using the same store.
+    read calls parse with the bytes of the snapshot of the spreadsheet and returns its result, or returns None if
+    there is no snapshot. publish replaces the snapshot of the spreadsheet: a reader gets either the previous
+    snapshot or the new one, never a partially written one.
+    """
+
+    def read(self, spreadsheet_id, parse):
+        raise NotImplementedError
+
+    def publish(self, spreadsheet_id, data):
+        raise NotImplementedError
+
+
+class FileSnapshotStore(SnapshotStore):
+    """
+    Stores the snapshots as files of a directory, which can be a volume shared between processes.
+    Snapshots are written in a temporary file then renamed, so a reader still memory-mapping the replaced file keeps
+    reading it until it closes it.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def read(self, spreadsheet_id, parse):
+        try:
+            snapshot_file = open(self._get_path(spreadsheet_id), "rb")
+        except FileNotFoundError:
+            return None
+        with snapshot_file:
+            if os.fstat(snapshot_file.fileno()).st_size == 0:
+                return None
+            with mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                return parse(buffer)
+
+    def publish(self, spreadsheet_id, data):
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as snapshot_file:
+                snapshot_file.write(data)
+            os.replace(tmp_path, self._get_path(spreadsheet_id))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def _get_path(self, spreadsheet_id):
+        return os.path.join(self.directory, _get_key(spreadsheet_id))
+
+
+class KeyValueSnapshotStore(SnapshotStore):
+    """
+    Stores the snapshots in a key-value service. client can be any object with get(key), returning the value or None,
+    and set(key, value), like a Redis client. Setting a key is atomic, so readers always get a whole snapshot.
+    The service being unavailable does not prevent using the spreadsheets: a failed read is a missing snapshot, and a
+    failed publication is only logged.
+    """
+
+    def __init__(self, client, prefix="tosurnament:snapshot:"):
+        self.client = client
+        self.prefix = prefix
+
+    def read(self, spreadsheet_id, parse):
+        try:
+            data = self.client.get(self.prefix + _get_key(spreadsheet_id))
+        except Exception:
+            logger.warning("Could not read the snapshot of spreadsheet %s", spreadsheet_id, exc_info=True)
+            return None
+        if not data:
+            return None
+        return parse(data)
+
+    def publish(self, spreadsheet_id, data):
+        try:
+            self.client.set(self.prefix + _get_key(spreadsheet_id), data)
+        except Exception:
+            logger.warning("Could not publish the snapshot of spreadsheet %s", spreadsheet_id, exc_info=True)
+
+
+def _get_key(spreadsheet_id):
+    return hashlib.blake2s(bytes(spreadsheet_id, "utf-8")).hexdigest()
@@ -1,20 +1,32 @@
 """Google Spreadsheet API wrapper"""
 
-from .cell import Cell
 from .worksheet import Worksheet
+from .range_spec import RangeSpec
+from .response_parser import (
+    parse_spreadsheet_response,
+    get_cell_value,
+    get_sheets_from_metadata,
+    get_a1_ranges,
+    add_value_ranges,
+)
+from .snapshot import InvalidSnapshot, dump_snapshot, load_snapshot
+from .snapshot_store import FileSnapshotStore
+from .cache import SpreadsheetCache
+from .journal import UpdateJournal
+from .revision import DriveRevisionChecker
 
-import hashlib
-import os
-import pickle
 import ssl
+import asyncio
 from discord.ext import commands
 import socket
 import googleapiclient
 from googleapiclient import discovery
 from google.oauth2 import service_account
-from functools import lru_cache
 
-SCOPES = ["https://www.googleapis.com/auth/spreadsheets"]
+SCOPES = [
+    "https://www.googleapis.com/auth/spreadsheets",
+    "https://www.googleapis.com/auth/drive.metadata.readonly",
+]
 FIELDS = (
     "sheets.merges,"
     "sheets.properties.title,"
@@ -22,15 +34,39 @@ FIELDS = (
     "sheets.data.rowData.values.userEnteredValue,"
     "sheets.data.rowData.values.effectiveValue"
 )
+METADATA_FIELDS = "sheets.merges,sheets.properties.title"
+BATCH_GET_PARAMETERS = {
+    "majorDimension": "ROWS",
+    "valueRenderOption": "FORMULA",
+    "dateTimeRenderOption": "SERIAL_NUMBER",
+}
 SERVICE_ACCOUNT_FILE = "service_account.json"
+SNAPSHOTS_DIRECTORY = "snapshots"
+CACHE_MAX_SIZE = 256 * 1024 * 1024
+CACHE_TTL = 600
 service = None
+revision_checker = None
+spreadsheet_cache = SpreadsheetCache(CACHE_MAX_SIZE, CACHE_TTL)
+update_journal = UpdateJournal()
+snapshot_store = FileSnapshotStore(SNAPSHOTS_DIRECTORY)
+
+
+def get_credentials():
+    return service_account.Credentials.from_service_account_file(SERVICE_ACCOUNT_FILE, scopes=SCOPES)
 
 
 def start_service():
-    """Starts Google Spreadsheet API service."""
-    global service
-    credentials = service_account.Credentials.from_service_account_file(SERVICE_ACCOUNT_FILE, scopes=SCOPES)
+    """Starts Google Spreadsheet API service, and the revision checker of the spreadsheets."""
+    global service, revision_checker
+    credentials = get_credentials()
     service = discovery.build("sheets", "v4", credentials=credentials)
+    revision_checker = DriveRevisionChecker(credentials)
+
+
+def set_snapshot_store(store):
+    """Sets the SnapshotStore where the snapshots of the spreadsheets are read and published."""
+    global snapshot_store
+    snapshot_store = store
 
 
 class Spreadsheet:
@@ -40,6 +76,10 @@ class Spreadsheet:
         self.id = spreadsheet_id
         self.main_worksheet_index = 0
         self.worksheets = []
+        self.ranges = None
+        self.revision = None
+        self._derived = {}
+        self._derived_version = None
 
     def __copy__(self):
         newobj = type(self)(self.id)
@@ -48,52 +88,158 @@ class Spreadsheet:
         newobj.__dict__.update(newdict)
         return newobj
 
+    def create_view(self):
+        """
+        Returns a copy of the spreadsheet that can be modified without affecting this one. Values are shared until
+        they are written, see Worksheet.create_view.
+        """
+        view = type(self)(self.id)
+        view.worksheets = [worksheet.create_view() for worksheet in self.worksheets]
+        view.ranges = self.ranges
+        view.revision = self.revision
+        view._derived = self._get_derived_values()
+        view._derived_version = view.get_version()
+        return view
+
+    def get_derived(self, key, build):
+        """
+        Returns build(self), built only once per version of the values: the result is shared by the spreadsheet and
+        its views as long as they have not been written. build must only depend on the values of the spreadsheet.
+        """
+        derived_values = self._get_derived_values()
+        value = derived_values.get(key)
+        if value is None:
+            value = derived_values[key] = build(self)
+        return value
+
+    def set_derived(self, key, value):
+        """
+        Replaces the derived value of key by one kept up to date by the caller after writing the spreadsheet, instead
+        of building it again. value must not be shared with another version of the spreadsheet.
+        """
+        self._get_derived_values()[key] = value
+
+    def _get_derived_values(self):
+        version = self.get_version()
+        if self._derived_version != version:
+            self._derived = {}
+            self._derived_version = version
+        return self._derived
+
     @staticmethod
-    def retrieve_spreadsheet(spreadsheet_id):
+    def retrieve_spreadsheet(spreadsheet_id, ranges=None):
+        """
+        Retrieves the whole spreadsheet, or only the given ranges (and the merges of their sheets) if ranges is set.
+        A spreadsheet retrieved from ranges is partial: it is never snapshotted, as snapshots are shared by every user
+        of the spreadsheet.
+        """
         spreadsheet = Spreadsheet(spreadsheet_id)
         try:
-            sheets = _get_spreadsheet_with_values(spreadsheet_id)
+            if ranges:
+                spreadsheet.ranges = tuple(ranges)
+                sheets = _get_spreadsheet_with_ranges(spreadsheet_id, spreadsheet.ranges)
+            else:
+                sheets = _get_spreadsheet_with_values(spreadsheet_id)
         except googleapiclient.errors.HttpError as error:
             raise HttpError(error.resp.status, "read", error)
         except (ConnectionResetError, ssl.SSLError, AttributeError) as error:
             raise HttpError(499, "read", error)
         except socket.timeout as error:
             raise HttpError(408, "read", error)
-        for index, sheet in enumerate(sheets):
-            spreadsheet.worksheets.append(Worksheet(index, sheet["name"], sheet["cells"]))
+        spreadsheet._add_worksheets(sheets)
         return spreadsheet
 
     @staticmethod
-    def retrieve_spreadsheet_and_update_pickle(spreadsheet_id):
+    async def retrieve_spreadsheet_async(spreadsheet_id, client, ranges=None):
+        """Same as retrieve_spreadsheet, but through an AsyncSheetsClient. The worksheets are built in the executor."""
+        spreadsheet = Spreadsheet(spreadsheet_id)
+        if ranges:
+            spreadsheet.ranges = tuple(ranges)
+            sheets = await client.get_spreadsheet_with_ranges(spreadsheet_id, spreadsheet.ranges)
+        else:
+            sheets = await client.get_spreadsheet_with_values(spreadsheet_id)
+        await asyncio.get_running_loop().run_in_executor(None, spreadsheet._add_worksheets, sheets)
+        return spreadsheet
+
+    def _add_worksheets(self, sheets):
+        for index, sheet in enumerate(sheets):
+            self.worksheets.append(
+                Worksheet(index, sheet["name"], sheet["cells"], sheet.get("merges"), sheet.get("loaded_ranges"))
+            )
+
+    @staticmethod
+    def retrieve_spreadsheet_and_update_snapshot(spreadsheet_id):
+        revision = Spreadsheet.get_revision(spreadsheet_id)
         spreadsheet = Spreadsheet.retrieve_spreadsheet(spreadsheet_id)
-        spreadsheet.update_pickle()
+        spreadsheet.revision = revision
+        spreadsheet.update_snapshot()
         return spreadsheet
 
     @staticmethod
-    @lru_cache(maxsize=8)
-    def pickle_from_id(spreadsheet_id):
-        if not os.path.exists("pickles"):
-            os.mkdir("pickles")
+    def get_revision(spreadsheet_id):
+        """
+        Returns the current revision of the spreadsheet given by revision_checker, or None if it is unknown.
+        The revision has to be got before retrieving the spreadsheet: a modification made during the retrieval then
+        only causes another retrieval.
+        """
+        if not revision_checker:
             return None
+        return revision_checker.get_revision(spreadsheet_id)
+
+    @staticmethod
+    def snapshot_from_id(spreadsheet_id, revision=None):
+        """
+        Returns the Spreadsheet stored in the snapshot of the spreadsheet id, or None if there is none.
+        If revision is set, only a snapshot of this revision is returned: it may have been published by another
+        process using the same snapshot_store.
+        Spreadsheets are kept in spreadsheet_cache, so only the first read of a snapshot goes to the snapshot_store.
+        Snapshots that are corrupted or written with another version of the format are ignored.
+        """
+        spreadsheet = spreadsheet_cache.get(spreadsheet_id)
+        if spreadsheet and (not revision or spreadsheet.revision == revision):
+            return spreadsheet
         try:
-            with open("pickles/" + hashlib.blake2s(bytes(spreadsheet_id, "utf-8")).hexdigest(), "rb") as pfile:
-                return pickle.load(pfile)
-        except IOError:
+            snapshot = snapshot_store.read(spreadsheet_id, lambda data: load_snapshot(data, Worksheet))
+        except (IOError, InvalidSnapshot):
+            return None
+        if not snapshot or snapshot[0] != spreadsheet_id or (revision and snapshot[1] != revision):
             return None
+        spreadsheet = Spreadsheet(spreadsheet_id)
+        _, spreadsheet.revision, spreadsheet.worksheets = snapshot
+        spreadsheet_cache.put(spreadsheet_id, spreadsheet)
+        return spreadsheet
 
     @staticmethod
     def get_from_id(spreadsheet_id):
         """Returns a Spreadsheet."""
-        spreadsheet = Spreadsheet.pickle_from_id(spreadsheet_id)
+        spreadsheet = Spreadsheet.snapshot_from_id(spreadsheet_id)
         if not spreadsheet:
-            spreadsheet = Spreadsheet.retrieve_spreadsheet_and_update_pickle(spreadsheet_id)
+            spreadsheet = Spreadsheet.retrieve_spreadsheet_and_update_snapshot(spreadsheet_id)
         return spreadsheet
 
-    def update_pickle(self):
-        if not os.path.exists("pickles"):
-            os.mkdir("pickles")
-        with open("pickles/" + hashlib.blake2s(bytes(self.id, "utf-8")).hexdigest(), "w+b") as pfile:
-            pickle.dump(self, pfile)
+    def update_snapshot(self):
+        """Publishes the snapshot of the spreadsheet, and keeps the spreadsheet in spreadsheet_cache."""
+        self.publish_snapshot()
+        self.update_cache()
+
+    def publish_snapshot(self):
+        if self.ranges:
+            return
+        snapshot_store.publish(self.id, dump_snapshot(self.id, self.worksheets, self.revision))
+
+    def update_cache(self):
+        """Keeps a view of the spreadsheet in spreadsheet_cache, so that it is not read again by this process."""
+        if self.ranges:
+            return
+        spreadsheet_cache.put(self.id, self.create_view())
+
+    def get_version(self):
+        """Returns a value that changes each time a value of the spreadsheet is set."""
+        return tuple(worksheet.version for worksheet in self.worksheets)
+
+    def get_size(self):
+        """Returns an estimation of the memory used by the values of the spreadsheet, in bytes."""
+        return sum(worksheet.get_size() for worksheet in self.worksheets)
 
     def get_worksheet(self, option=None):
         """Returns a Worksheet by index or name."""
@@ -113,39 +259,70 @@ class Spreadsheet:
 
     def update(self):
         """Sends an update request to the real spreadsheet."""
-        ranges_name, ranges_values = [], []
+        ranges_name, ranges_values = _get_updated_values_with_ranges(self.worksheets)
+        if ranges_name and ranges_values:
+            _send_updates(self.id, ranges_name, ranges_values)
         for worksheet in self.worksheets:
-            ranges, values = worksheet.get_updated_values_with_ranges()
-            ranges_name = [*ranges_name, *ranges]
-            ranges_values = [*ranges_values, *values]
-        if not ranges_name or not ranges_values:
-            return
-        try:
-            _write_ranges(self.id, ranges_name, ranges_values)
-        except googleapiclient.errors.HttpError as e:
-            try:
-                raise HttpError(e.resp["status"], "write", e)
-            except KeyError:
-                raise HttpError(500, "write", e)
-        except (ConnectionResetError, ssl.SSLError) as e:
-            raise HttpError(499, "write", e)
-        except socket.timeout as e:
-            raise HttpError(408, "write", e)
+            worksheet.reset_updated_state()
+
+    async def update_async(self, client):
+        """Same as update, but through an AsyncSheetsClient."""
+        ranges_name, ranges_values = _get_updated_values_with_ranges(self.worksheets)
+        if ranges_name and ranges_values:
+            await client.write_ranges(self.id, ranges_name, ranges_values)
         for worksheet in self.worksheets:
             worksheet.reset_updated_state()
 
+    def journal_updates(self):
+        """
+        Appends the pending updates to the journal of the spreadsheet, so that they are not lost if they cannot be
+        sent before a restart. They are then sent by update_from_journal.
+        """
+        updates = []
+        for worksheet in self.worksheets:
+            updates.extend((worksheet.name, x, y, value) for x, y, value in worksheet.get_updates())
+            worksheet.reset_updated_state()
+        update_journal.append(self.id, updates)
+
+    @staticmethod
+    def update_from_journal(spreadsheet_id):
+        """
+        Sends the values pending in the journal of the spreadsheet, then removes them from the journal.
+        Returns False if there was nothing to send.
+        """
+        ranges_name, ranges_values, position = _get_journal_values_with_ranges(spreadsheet_id)
+        if ranges_name:
+            _send_updates(spreadsheet_id, ranges_name, ranges_values)
+        update_journal.compact(spreadsheet_id, position)
+        return bool(ranges_name)
+
+    @staticmethod
+    async def update_from_journal_async(spreadsheet_id, client):
+        """Same as update_from_journal, but through an AsyncSheetsClient. The journal is used from the executor."""
+        loop = asyncio.get_running_loop()
+        ranges_name, ranges_values, position = await loop.run_in_executor(
+            None, _get_journal_values_with_ranges, spreadsheet_id
+        )
+        if ranges_name:
+            await client.write_ranges(spreadsheet_id, ranges_name, ranges_values)
+        await loop.run_in_executor(None, update_journal.compact, spreadsheet_id, position)
+        return bool(ranges_name)
+
     def get_worksheet_and_range(self, range_name):
-        """Returns the worksheet specified in the range, or the main worksheet."""
-        if "!" not in range_name:
-            return self.get_worksheet(), range_name
-        worksheet_name, range_name = range_name.rsplit("!", 1)
-        return self.get_worksheet(worksheet_name), range_name
+        """Returns the worksheet specified in the range, or the main worksheet, and the compiled range."""
+        range_spec = RangeSpec.compile(range_name)
+        return self.get_worksheet(range_spec.worksheet_name), range_spec
 
     def get_range(self, range_name):
         """Returns an array of Cell. If a Cell does not exist in the range, it creates it."""
         worksheet, range_name = self.get_worksheet_and_range(range_name)
         return worksheet.get_range(range_name)
 
+    def get_range_rows(self, range_name, ys):
+        """Returns, for each row y of ys, the Cells of the range that are in this row."""
+        worksheet, range_name = self.get_worksheet_and_range(range_name)
+        return worksheet.get_range_rows(range_name, ys)
+
     def get_cells_with_value_in_range(self, range_name):
         worksheet, range_name = self.get_worksheet_and_range(range_name)
         return worksheet.get_cells_with_value_in_range(range_name)
@@ -157,7 +334,7 @@ class Spreadsheet:
 
     def find_cells(self, range_name, value_to_find, case_sensitive=False):
         """Returns an array of Cell matching the value_to_find."""
-        if isinstance(range_name, str):
+        if isinstance(range_name, (str, RangeSpec)):
             worksheet, range_name = self.get_worksheet_and_range(range_name)
         else:
             worksheet = self.get_worksheet()
@@ -180,53 +357,79 @@ class InvalidWorksheet(commands.CommandError):
         self.worksheet = worksheet
 
 
-def _get_cell_value(value):
-    if "userEnteredValue" in value and "formulaValue" in value["userEnteredValue"]:
-        return value["userEnteredValue"]["formulaValue"]
-    elif "userEnteredValue" in value and "stringValue" in value["userEnteredValue"]:
-        return value["userEnteredValue"]["stringValue"].strip()
-    elif "userEnteredValue" in value and "numberValue" in value["userEnteredValue"]:
-        return value["userEnteredValue"]["numberValue"]
-    elif "userEnteredValue" in value and "boolValue" in value["userEnteredValue"]:
-        return value["userEnteredValue"]["boolValue"]
-    # ? Not used for the main use case, might be needed for other use cases ?
-    # elif "effectiveValue" in value and "formattedValue" in value["effectiveValue"]:
-    #    return value["effectiveValue"]["formattedValue"]
-    # elif "effectiveValue" in value and "stringValue" in value["effectiveValue"]:
-    #    return value["effectiveValue"]["stringValue"]
-    return ""
+def _get_updated_values_with_ranges(worksheets):
+    ranges_name, ranges_values = [], []
+    for worksheet in worksheets:
+        ranges, values = worksheet.get_updated_values_with_ranges()
+        ranges_name = [*ranges_name, *ranges]
+        ranges_values = [*ranges_values, *values]
+    return ranges_name, ranges_values
+
+
+def _get_journal_values_with_ranges(spreadsheet_id):
+    """Returns the ranges and values pending in the journal of the spreadsheet, and the position read."""
+    updates, position = update_journal.read(spreadsheet_id)
+    updates_by_worksheet = {}
+    for (worksheet_name, x, y), value in updates.items():
+        updates_by_worksheet.setdefault(worksheet_name, []).append((x, y, value))
+    worksheets = [Worksheet.from_updates(name, updates) for name, updates in updates_by_worksheet.items()]
+    return (*_get_updated_values_with_ranges(worksheets), position)
 
 
 def _get_spreadsheet_with_values(spreadsheet_id):
-    """Gets all sheets and their cells."""
+    """Gets all sheets, their values and their merges."""
     sheets = []
     if not service:
         return sheets
-    result = service.spreadsheets().get(spreadsheetId=spreadsheet_id, fields=FIELDS).execute()
-    for sheet in result["sheets"]:
-        if "merges" in sheet:
-            merges_info = sheet["merges"]
-        else:
-            merges_info = []
-        values = sheet["data"][0]
-        cells = []
-        if "rowData" in values:
-            for y, row in enumerate(values["rowData"]):
-                cells.append([])
-                if "values" in row:
-                    for x, value in enumerate(row["values"]):
-                        cell = Cell(x, y, _get_cell_value(value))
-                        for merge_info in merges_info:
-                            x_merge_range = range(merge_info["startColumnIndex"], merge_info["endColumnIndex"])
-                            y_merge_range = range(merge_info["startRowIndex"], merge_info["endRowIndex"])
-                            if x in x_merge_range and y in y_merge_range:
-                                cell.set_merge_range(x_merge_range, y_merge_range)
-                        cells[y].append(cell)
-        sheets.append({"name": sheet["properties"]["title"], "cells": cells})
-        # TODO: store sheet["properties"]["gridProperties"]["rowCount"/"columnCount"] too
+    request = service.spreadsheets().get(spreadsheetId=spreadsheet_id, fields=FIELDS)
+    request.postproc = _get_raw_content
+    # TODO: store sheet["properties"]["gridProperties"]["rowCount"/"columnCount"] too
+    return parse_spreadsheet_response(request.execute(), get_cell_value)
+
+
+def _get_raw_content(response, content):
+    """Replaces the JSON post-processing of a request, to parse the response incrementally."""
+    return content
+
+
+def _get_spreadsheet_with_ranges(spreadsheet_id, ranges):
+    """
+    Gets the values of the ranges with values.batchGet, and the merges of every sheet.
+    Ranges without a sheet name are taken from the first sheet. Sheets without any range are returned empty.
+    """
+    sheets = []
+    if not service:
+        return sheets
+    metadata = service.spreadsheets().get(spreadsheetId=spreadsheet_id, fields=METADATA_FIELDS).execute()
+    sheets = get_sheets_from_metadata(metadata)
+    a1_ranges = get_a1_ranges(sheets, ranges)
+    if not a1_ranges:
+        return sheets
+    result = (
+        service.spreadsheets()
+        .values()
+        .batchGet(spreadsheetId=spreadsheet_id, ranges=a1_ranges, **BATCH_GET_PARAMETERS)
+        .execute()
+    )
+    add_value_ranges(sheets, result.get("valueRanges", []))
     return sheets
 
 
+def _send_updates(spreadsheet_id, ranges_name, ranges_values):
+    """Writes the values in the ranges of the real spreadsheet, raising HttpError on failure."""
+    try:
+        _write_ranges(spreadsheet_id, ranges_name, ranges_values)
+    except googleapiclient.errors.HttpError as e:
+        try:
+            raise HttpError(e.resp["status"], "write", e)
+        except KeyError:
+            raise HttpError(500, "write", e)
+    except (ConnectionResetError, ssl.SSLError) as e:
+        raise HttpError(499, "write", e)
+    except socket.timeout as e:
+        raise HttpError(408, "write", e)
+
+
 def _write_ranges(spreadsheet_id, range_name_array, values_array, value_input_option="USER_ENTERED"):
     """Writes values in multiple ranges in the real spreadsheet."""
     if not service or len(range_name_array) != len(values_array):
@@ -11,6 +11,16 @@ def from_letter_base(letters):
     return n - 1
 
 
+def to_letter_base(n):
+    """Tranforms an integer into a letter base number."""
+    letters = ""
+    n += 1
+    while n > 0:
+        n, remainder = divmod(n - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+
 def find_corresponding_cell_best_effort(cells, base_cell, max_difference_with_base=0):
     default_cell = Cell(-1, -1, "")
     for y in base_cell.y_merge_range:
@@ -28,19 +38,12 @@ def find_corresponding_cell_best_effort(cells, base_cell, max_difference_with_ba
 
 
 def find_corresponding_cell_best_effort_from_range(spreadsheet, range_name, base_cell, max_difference_with_base=0):
-    range_cells = spreadsheet.get_range(range_name)
+    worksheet, range_spec = spreadsheet.get_worksheet_and_range(range_name)
+    range_cells = worksheet.get_range_rows(range_spec, base_cell.y_merge_range)
     corresponding_cell = find_corresponding_cell_best_effort(range_cells, base_cell, max_difference_with_base)
     if corresponding_cell.x == -1 and range_name:
-        worksheet, range_name = spreadsheet.get_worksheet_and_range(range_name)
-        cells = worksheet.cells
-        splitted_range = range_name.split(":")[0]
-        column = re.split(r"(\d+)", splitted_range)[0]  # TODO: handle all kind of ranges
-        column = from_letter_base(column)
-        while len(cells) <= base_cell.y:  # TODO: handle different y from base_cell
-            cells.append([])
-        while len(cells[base_cell.y]) <= column:
-            cells[base_cell.y].append(Cell(len(cells[base_cell.y]), base_cell.y, ""))
-        corresponding_cell = cells[base_cell.y][column]
+        column = range_spec.first_column  # TODO: handle all kind of ranges
+        corresponding_cell = worksheet.get_cell(column, base_cell.y)  # TODO: handle different y from base_cell
     return corresponding_cell
 
 
@@ -91,10 +94,7 @@ def find_corresponding_qualifier_cells_best_effort(
         all_x = sorted(all_x)
         worksheet = spreadsheet.get_worksheet()
         while y <= max(base_cell.y_merge_range):
-            new_row = []
-            for x in all_x:
-                new_row.append(Cell(x, y, ""))
-            worksheet.cells.append(new_row)
+            new_row = [worksheet.get_cell(x, y) for x in all_x]
             corresponding_cells = [*corresponding_cells, *new_row]
             y += 1
     if not corresponding_cells:
@@ -105,23 +105,16 @@ def find_corresponding_qualifier_cells_best_effort(
 def find_corresponding_cells_best_effort_from_range(
     spreadsheet, range_name, base_cell, max_difference_with_base=0, filled_only=True
 ):
-    range_cells = spreadsheet.get_range(range_name)
+    worksheet, range_spec = spreadsheet.get_worksheet_and_range(range_name)
+    range_cells = worksheet.get_range_rows(range_spec, base_cell.y_merge_range)
     corresponding_cells = find_corresponding_cells_best_effort(
         range_cells, base_cell.y_merge_range, base_cell, max_difference_with_base, filled_only
     )
     if not filled_only and not corresponding_cells and range_name:
-        worksheet, range_name = spreadsheet.get_worksheet_and_range(range_name)
-        cells = worksheet.cells
-        splitted_range = range_name.split(":")[0]
-        column, _, _ = re.split(r"(\d+)", splitted_range)  # TODO: handle all kind of ranges
-        column = from_letter_base(column)
-        max_y = base_cell.y_merge_range[-1]
-        while len(cells) <= max_y:  # TODO: handle different y from base_cell
-            cells.append([])
-        while len(cells[max_y]) <= column:
-            cells[max_y].append(Cell(len(cells[max_y]), max_y, ""))
+        column = range_spec.first_column  # TODO: handle all kind of ranges
+        worksheet.get_cell(column, base_cell.y_merge_range[-1])  # TODO: handle different y from base_cell
         return find_corresponding_cells_best_effort(
-            spreadsheet.get_range(range_name),
+            worksheet.get_range_rows(range_spec, base_cell.y_merge_range),
             base_cell.y_merge_range,
             base_cell,
             max_difference_with_base,
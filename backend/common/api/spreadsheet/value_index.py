@@ -0,0 +1,50 @@
+from bisect import insort
+
+
+class ValueIndex:
+    """
+    Index of the casefolded values of a range. Maps each value to the coordinates of the cells containing it, in the
+    order of the range. Empty cells are tracked but not indexed.
+    """
+
+    __slots__ = ("_positions", "_coordinates")
+
+    def __init__(self, coordinates_with_values):
+        self._positions = {}
+        self._coordinates = {}
+        for rank, (x, y, value) in enumerate(coordinates_with_values):
+            key = str(value).casefold()
+            position = self._positions.get((x, y))
+            if position:
+                position[1].append(rank)
+            else:
+                self._positions[(x, y)] = [key, [rank]]
+            if key:
+                self._coordinates.setdefault(key, []).append((rank, x, y))
+
+    def __contains__(self, coordinates):
+        return coordinates in self._positions
+
+    def find(self, casefolded_value):
+        """Returns the coordinates of the cells containing the casefolded value."""
+        return [(x, y) for _, x, y in self._coordinates.get(casefolded_value, ())]
+
+    def update(self, x, y, value):
+        """Moves the cell to its new value, if it is part of the index."""
+        position = self._positions.get((x, y))
+        if not position:
+            return
+        old_key, ranks = position
+        new_key = str(value).casefold()
+        if new_key == old_key:
+            return
+        if old_key:
+            coordinates = self._coordinates[old_key]
+            coordinates[:] = [entry for entry in coordinates if entry[1] != x or entry[2] != y]
+            if not coordinates:
+                del self._coordinates[old_key]
+        if new_key:
+            coordinates = self._coordinates.setdefault(new_key, [])
+            for rank in ranks:
+                insort(coordinates, (rank, x, y))
+        position[0] = new_key
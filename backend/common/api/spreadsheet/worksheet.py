@@ -1,140 +1,430 @@
-import re
+import struct
+import sys
+import weakref
+from array import array
 
 from .cell import Cell
-from . import utils
+from .coalescer import coalesce_rectangles, get_json_value_cost, RANGE_OVERHEAD
+from .merge import MergeIndex
+from .range_spec import RangeSpec
+from . import range_spec
+from .snapshot import WORKSHEET_HEADER_STRUCT, I32_STRUCT
+from .value_index import ValueIndex
 
 LETTER_BASE = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
 
+EMPTY_TAG = 0
+STRING_TAG = 1
+INT_TAG = 2
+FLOAT_TAG = 3
+BOOL_TAG = 4
+BIG_INT_TAG = 5
+
+INT64_MIN = -(2**63)
+INT64_MAX = 2**63 - 1
+DOUBLE_STRUCT = struct.Struct("<d")
+INT64_STRUCT = struct.Struct("<q")
+
 
 class Worksheet:
-    """Sheet of a spreasheet. Contains the index, name, cells and utility functions."""
+    """
+    Sheet of a spreasheet. Contains the index, name, cells and utility functions.
+    Values are stored per column in two typed arrays (a type tag and a 64 bits payload), strings are stored once in a
+    string table. Cell objects are views on this grid and are only created when accessed.
+    loaded_ranges lists the rectangles (x_min, x_max, y_min, y_max), with exclusive max, that have been fetched when
+    only part of the sheet has been retrieved. None means the whole sheet is loaded.
+    """
 
-    def __init__(self, index, sheet_name, cells):
+    def __init__(self, index, sheet_name, cells, merges=None, loaded_ranges=None):
         self.index = index
         self.name = sheet_name
-        self.cells = cells
+        self._strings = [""]
+        self._string_ids = {"": 0}
+        self._tags = []
+        self._payloads = []
+        self._row_lengths = array("I")
+        self._merges = MergeIndex()
+        self._updated_cells = set()
+        self._original_values = {}
+        self._cells = weakref.WeakValueDictionary()
+        self._value_indexes = {}
+        self._loaded_ranges = loaded_ranges
+        self._version = 0
+        self._set_owned()
+        self._load(cells, merges or [])
 
-    def get_cell(self, x, y):
-        """Returns the corresponding Cell. If it does not exist, it creates it."""
-        while y >= len(self.cells):
-            self.cells.append([])
-        while x >= (current_x := len(self.cells[y])):
-            self.cells[y].append(Cell(current_x, y, ""))
-        return self.cells[y][x]
-
-    def _from_column_range(self, range_name):
-        """Gets the range from a range name when the range is column only."""
-        x_range = []
-        range_name_splitted = range_name.split(":")
-        if len(range_name_splitted) == 1:
-            x_range.append(utils.from_letter_base(range_name_splitted[0]))
-        else:
-            x_min = utils.from_letter_base(range_name_splitted[0])
-            x_max = utils.from_letter_base(range_name_splitted[1])
-            x_range = range(x_min, x_max + 1)
-        return x_range, []
-
-    def _from_row_range(self, range_name):
-        """Gets the range from a range name when the range is row only."""
-        y_range = []
-        range_name_splitted = range_name.split(":")
-        if len(range_name_splitted) == 1:
-            y_range.append(int(range_name_splitted[0]) - 1)
-        else:
-            y_min = int(range_name_splitted[0]) - 1
-            y_max = int(range_name_splitted[1]) - 1
-            y_range = range(y_min, y_max + 1)
-        return [], y_range
-
-    def _from_square_range(self, range_name):
-        """Gets the range from a range name when the range is a square."""
-        x_range, y_range = [], []
-        range_name_splitted = range_name.split(":")
-        separate_regex = re.compile(r"(\d+)")
-        if len(range_name_splitted) == 1:
-            column, row, _ = separate_regex.split(range_name_splitted[0])
-            x_range.append(utils.from_letter_base(column))
-            y_range.append(int(row) - 1)
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        del state["_string_ids"]
+        del state["_cells"]
+        del state["_value_indexes"]
+        del state["_version"]
+        del state["_owned_columns"]
+        del state["_owns_rows"]
+        del state["_owns_strings"]
+        del state["_owned_value_indexes"]
+        del state["_shares_value_indexes"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._string_ids = None
+        self._cells = weakref.WeakValueDictionary()
+        self._value_indexes = {}
+        self._version = 0
+        self._set_owned()
+
+    def _set_owned(self, owned=True):
+        """
+        Sets if the arrays, the string table and the value indexes belong to this worksheet only. Shared ones are
+        copied before being modified (see create_view). _owned_columns is None when every column is owned, and so is
+        _owned_value_indexes.
+        """
+        self._owned_columns = None if owned else set()
+        self._owns_rows = owned
+        self._owns_strings = owned
+        self._owned_value_indexes = None if owned else set()
+        self._shares_value_indexes = not owned
+
+    def create_view(self):
+        """
+        Returns a copy of the worksheet sharing its values. The values are copied on write, per column, by whichever
+        worksheet modifies them first, so that each view is isolated from the others without copying the grid.
+        The value indexes are shared too, including the ones built later by any of them until it is written: a
+        worksheet writing into a shared index removes it from its own indexes instead of updating it.
+        """
+        self._set_owned(False)
+        view = Worksheet.__new__(Worksheet)
+        view.index = self.index
+        view.name = self.name
+        view._strings = self._strings
+        view._string_ids = self._string_ids
+        view._tags = list(self._tags)
+        view._payloads = list(self._payloads)
+        view._row_lengths = self._row_lengths
+        view._merges = self._merges
+        view._updated_cells = set(self._updated_cells)
+        view._original_values = dict(self._original_values)
+        view._cells = weakref.WeakValueDictionary()
+        view._value_indexes = self._value_indexes
+        view._loaded_ranges = self._loaded_ranges
+        view._version = 0
+        view._set_owned(False)
+        return view
+
+    def _own_column(self, x):
+        if self._owned_columns is not None and x not in self._owned_columns:
+            self._tags[x] = array("b", self._tags[x])
+            self._payloads[x] = array("q", self._payloads[x])
+            self._owned_columns.add(x)
+
+    def _own_rows(self):
+        if not self._owns_rows:
+            self._row_lengths = array("I", self._row_lengths)
+            self._owns_rows = True
+
+    def _own_strings(self):
+        if not self._owns_strings:
+            self._strings = list(self._strings)
+            if self._string_ids is not None:
+                self._string_ids = dict(self._string_ids)
+            self._owns_strings = True
+
+    def _own_value_indexes(self):
+        if self._shares_value_indexes:
+            self._value_indexes = dict(self._value_indexes)
+            self._shares_value_indexes = False
+
+    def _clear_value_indexes(self):
+        self._value_indexes = {}
+        self._owned_value_indexes = None
+        self._shares_value_indexes = False
+
+    def _update_value_indexes(self, x, y, value):
+        """
+        Moves the cell to its new value in the value indexes containing it, removing the shared ones. The indexes
+        built from now on are not shared anymore, as the values of the worksheet differ from the other ones.
+        """
+        self._own_value_indexes()
+        for key, value_index in list(self._value_indexes.items()):
+            if (x, y) not in value_index:
+                continue
+            if self._owned_value_indexes is None or key in self._owned_value_indexes:
+                value_index.update(x, y, value)
+            else:
+                del self._value_indexes[key]
+
+    def _write_snapshot(self, writer):
+        """Writes the worksheet in a snapshot. See snapshot.dump_snapshot."""
+        original_values = [(coordinates, self._encode(value)) for coordinates, value in self._original_values.items()]
+        writer.write_struct(WORKSHEET_HEADER_STRUCT, self.index, self.n_rows, len(self._tags))
+        writer.write_string(self.name)
+        writer.write_string_table(self._strings)
+        writer.write_raw_array(self._row_lengths)
+        for tags, payloads in zip(self._tags, self._payloads):
+            writer.write_raw_array(tags)
+            writer.write_raw_array(payloads)
+        writer.write_array(array("i", (bound for merge in self._merges for bound in merge)))
+        if self._loaded_ranges is None:
+            writer.write_struct(I32_STRUCT, -1)
         else:
-            column, row, _ = separate_regex.split(range_name_splitted[0])
-            x_min = utils.from_letter_base(column)
-            y_min = int(row) - 1
-            column, row, _ = separate_regex.split(range_name_splitted[1])
-            x_max = utils.from_letter_base(column)
-            y_max = int(row) - 1
-            x_range = range(x_min, x_max + 1)
-            y_range = range(y_min, y_max + 1)
-        return x_range, y_range
-
-    def _from_partial_column_range(self, range_name):
-        """Gets the range from a range name when the range is column only."""
-        range_part1, range_part2 = range_name.split(":")
-        separate_regex = re.compile(r"(\d+)")
-        if len((splitted_range_part1 := separate_regex.split(range_part1))) == 3:
-            column, row, _ = splitted_range_part1
-            column2 = range_part2
+            writer.write_struct(I32_STRUCT, len(self._loaded_ranges))
+            writer.write_raw_array(array("i", (bound for rectangle in self._loaded_ranges for bound in rectangle)))
+        writer.write_array(
+            array("I", (coordinate for coordinates in self._updated_cells for coordinate in coordinates))
+        )
+        writer.write_array(array("I", (coordinate for coordinates, _ in original_values for coordinate in coordinates)))
+        writer.write_raw_array(array("b", (tag for _, (tag, _) in original_values)))
+        writer.write_raw_array(array("q", (payload for _, (_, payload) in original_values)))
+
+    @classmethod
+    def _read_snapshot(cls, reader):
+        """Reads a worksheet from a snapshot. Cells are only created when accessed, like for a fetched worksheet."""
+        worksheet = cls.__new__(cls)
+        worksheet.index, n_rows, n_columns = reader.read_struct(WORKSHEET_HEADER_STRUCT)
+        worksheet.name = reader.read_string()
+        worksheet._strings = reader.read_string_table()
+        worksheet._row_lengths = reader.read_raw_array("I", n_rows)
+        worksheet._tags, worksheet._payloads = [], []
+        for _ in range(n_columns):
+            worksheet._tags.append(reader.read_raw_array("b", n_rows))
+            worksheet._payloads.append(reader.read_raw_array("q", n_rows))
+        merges = reader.read_array("i")
+        worksheet._merges = MergeIndex(tuple(merges[i : i + 4]) for i in range(0, len(merges), 4))
+        (n_loaded_ranges,) = reader.read_struct(I32_STRUCT)
+        if n_loaded_ranges < 0:
+            worksheet._loaded_ranges = None
         else:
-            column = range_part1
-            column2, row, _ = separate_regex.split(range_part2)
-        x_min = utils.from_letter_base(column)
-        x_max = utils.from_letter_base(column2)
-        y_min = int(row) - 1
-        y_max = len(self.cells)
-        return range(x_min, x_max + 1), range(y_min, y_max)
-
-    def _from_partial_row_range(self, range_name):
-        """Gets the range from a range name when the range is row only."""
-        range_part1, row2 = range_name.split(":")
-        separate_regex = re.compile(r"(\d+)")
-        column, row, _ = separate_regex.split(range_part1)
-        x_min = utils.from_letter_base(column)
-        y_min = int(row) - 1
-        y_max = int(row2) - 1
-        x_max = 0
-        while y_max >= len(self.cells):
-            self.cells.append([])
-        for y in range(y_min, y_max + 1):
-            if x_max < (row_length := len(self.cells[y])):
-                x_max = row_length
-        return range(x_min, x_max), range(y_min, y_max + 1)
+            loaded_ranges = reader.read_raw_array("i", 4 * n_loaded_ranges)
+            worksheet._loaded_ranges = [tuple(loaded_ranges[i : i + 4]) for i in range(0, len(loaded_ranges), 4)]
+        updated_cells = reader.read_array("I")
+        worksheet._updated_cells = set(zip(updated_cells[::2], updated_cells[1::2]))
+        original_coordinates = reader.read_array("I")
+        original_tags = reader.read_raw_array("b", len(original_coordinates) // 2)
+        original_payloads = reader.read_raw_array("q", len(original_coordinates) // 2)
+        worksheet._original_values = {
+            coordinates: worksheet._decode(tag, payload)
+            for coordinates, tag, payload in zip(
+                zip(original_coordinates[::2], original_coordinates[1::2]), original_tags, original_payloads
+            )
+        }
+        worksheet.__setstate__({})
+        return worksheet
+
+    def _load(self, cells, merges):
+        """Fills the grid with rows of Cell or raw values."""
+        n_rows = len(cells)
+        width = max((len(row) for row in cells), default=0)
+        self._row_lengths = array("I", (len(row) for row in cells))
+        self._tags = [array("b", bytes(n_rows)) for _ in range(width)]
+        self._payloads = [array("q", bytes(8 * n_rows)) for _ in range(width)]
+        merges = set(merges)
+        for y, row in enumerate(cells):
+            for x, value in enumerate(row):
+                if isinstance(value, Cell):
+                    if len(value.x_merge_range) > 1 or len(value.y_merge_range) > 1:
+                        merges.add(_merge_from_ranges(value.x_merge_range, value.y_merge_range))
+                    if value._updated:
+                        self._updated_cells.add((x, y))
+                    value = value.get()
+                if value != "" or not isinstance(value, str):
+                    self._tags[x][y], self._payloads[x][y] = self._encode(value)
+        self._merges = MergeIndex(merges)
+
+    def _encode(self, value):
+        """Returns the type tag and the payload corresponding to the value."""
+        if isinstance(value, bool):
+            return BOOL_TAG, int(value)
+        elif isinstance(value, int):
+            if INT64_MIN <= value <= INT64_MAX:
+                return INT_TAG, value
+            return BIG_INT_TAG, self._get_string_id(str(value))
+        elif isinstance(value, float):
+            return FLOAT_TAG, INT64_STRUCT.unpack(DOUBLE_STRUCT.pack(value))[0]
+        value = str(value)
+        if not value:
+            return EMPTY_TAG, 0
+        return STRING_TAG, self._get_string_id(value)
+
+    def _decode(self, tag, payload):
+        """Returns the value corresponding to the type tag and the payload."""
+        if tag == STRING_TAG:
+            return self._strings[payload]
+        elif tag == EMPTY_TAG:
+            return ""
+        elif tag == INT_TAG:
+            return payload
+        elif tag == FLOAT_TAG:
+            return DOUBLE_STRUCT.unpack(INT64_STRUCT.pack(payload))[0]
+        elif tag == BOOL_TAG:
+            return bool(payload)
+        return int(self._strings[payload])
+
+    def _get_string_id(self, string):
+        """Returns the index of the string in the string table, adding it if needed."""
+        if self._string_ids is None:
+            self._string_ids = {string: i for i, string in enumerate(self._strings)}
+        string_id = self._string_ids.get(string)
+        if string_id is None:
+            self._own_strings()
+            string_id = len(self._strings)
+            self._strings.append(string)
+            self._string_ids[string] = string_id
+        return string_id
+
+    def _get_value(self, x, y):
+        """Returns the raw value stored at the coordinates."""
+        if y >= len(self._row_lengths) or x >= self._row_lengths[y]:
+            return ""
+        return self._decode(self._tags[x][y], self._payloads[x][y])
+
+    def _set_value(self, x, y, value):
+        """Stores a raw value at the coordinates and marks it as updated."""
+        if (x, y) not in self._original_values:
+            self._original_values[(x, y)] = self._get_value(x, y)
+        self._extend(x, y)
+        self._own_column(x)
+        self._tags[x][y], self._payloads[x][y] = self._encode(value)
+        self._updated_cells.add((x, y))
+        self._version += 1
+        self._update_value_indexes(x, y, value)
+
+    def _extend_rows(self, n_rows):
+        """Adds empty rows until the grid contains n_rows rows."""
+        n_new_rows = n_rows - len(self._row_lengths)
+        if n_new_rows <= 0:
+            return
+        self._clear_value_indexes()
+        self._own_rows()
+        self._row_lengths.frombytes(bytes(self._row_lengths.itemsize * n_new_rows))
+        for x in range(len(self._tags)):
+            self._own_column(x)
+            self._tags[x].frombytes(bytes(n_new_rows))
+            self._payloads[x].frombytes(bytes(8 * n_new_rows))
+
+    def _extend(self, x, y):
+        """Extends the grid so that the coordinates exist."""
+        self._extend_rows(y + 1)
+        n_rows = len(self._row_lengths)
+        while x >= len(self._tags):
+            if self._owned_columns is not None:
+                self._owned_columns.add(len(self._tags))
+            self._tags.append(array("b", bytes(n_rows)))
+            self._payloads.append(array("q", bytes(8 * n_rows)))
+        if x >= self._row_lengths[y]:
+            self._clear_value_indexes()
+            self._own_rows()
+            self._row_lengths[y] = x + 1
+
+    def _get_max_row_length(self, rows=None):
+        """Returns the length of the longest row."""
+        if rows is None:
+            return max(self._row_lengths, default=0)
+        return max((self._row_lengths[y] for y in rows), default=0)
+
+    @property
+    def n_rows(self):
+        return len(self._row_lengths)
+
+    @property
+    def version(self):
+        """Number of values set since the worksheet has been fetched or loaded."""
+        return self._version
+
+    def get_size(self):
+        """Returns an estimation of the memory used by the values of the worksheet, in bytes."""
+        size = sys.getsizeof(self._row_lengths) + sum(map(sys.getsizeof, self._strings))
+        for tags, payloads in zip(self._tags, self._payloads):
+            size += sys.getsizeof(tags) + sys.getsizeof(payloads)
+        return size
+
+    def get_cell(self, x, y):
+        """Returns the corresponding Cell. If it does not exist, it creates it."""
+        if y >= len(self._row_lengths) or x >= self._row_lengths[y]:
+            self._extend(x, y)
+        cell = self._cells.get((x, y))
+        if cell is None:
+            cell = Cell(x, y, self._decode(self._tags[x][y], self._payloads[x][y]))
+            merge = self._merges.find(x, y)
+            if merge:
+                cell.set_merge_range(merge.x_range, merge.y_range)
+            cell._worksheet = self
+            self._cells[(x, y)] = cell
+        return cell
+
+    def _resolve_range_part(self, part):
+        """Returns the x range and y range of a RangePart. An empty range means the whole row or column."""
+        if part.kind == range_spec.COLUMN_RANGE:
+            return range(part.x_min, part.x_max + 1), []
+        elif part.kind == range_spec.ROW_RANGE:
+            return [], range(part.y_min, part.y_max + 1)
+        elif part.kind == range_spec.SQUARE_RANGE:
+            return range(part.x_min, part.x_max + 1), range(part.y_min, part.y_max + 1)
+        elif part.kind == range_spec.PARTIAL_COLUMN_RANGE:
+            return range(part.x_min, part.x_max + 1), range(part.y_min, self.n_rows)
+        self._extend_rows(part.y_max + 1)
+        y_range = range(part.y_min, part.y_max + 1)
+        return range(part.x_min, self._get_max_row_length(y_range)), y_range
 
     def get_range(self, range_names):
-        """Returns an array of Cell. If a Cell does not exist in the range, it creates it."""
+        """
+        Returns an array of Cell. If a Cell does not exist in the range, it creates it.
+        range_names can be a range name or a compiled RangeSpec.
+        """
         if not range_names:
             return []
-        x_ranges, y_ranges = [], []
-        for range_name in re.split(r",| |, |;|; |\|", range_names):
-            range_name = range_name.strip()
-            if re.match(r"^[A-Z]+(:[A-Z]+)?$", range_name):
-                x_range, y_range = self._from_column_range(range_name)
-            elif re.match(r"^[0-9]+(:[0-9]+)?$", range_name):
-                x_range, y_range = self._from_row_range(range_name)
-            elif re.match(r"^[A-Z]+[0-9]+(:[A-Z]+[0-9]+)?$", range_name):
-                x_range, y_range = self._from_square_range(range_name)
-            elif re.match(r"^[A-Z]+[0-9]*:[A-Z]+[0-9]*$", range_name):
-                x_range, y_range = self._from_partial_column_range(range_name)
-            elif re.match(r"^[A-Z]+[0-9]+:[0-9]+$", range_name):
-                x_range, y_range = self._from_partial_row_range(range_name)
-            else:
-                continue
-            x_ranges.append(x_range)
-            y_ranges.append(y_range)
-        range_cells = []
-        for x_range, y_range in zip(x_ranges, y_ranges):
+        return [[self.get_cell(x, y) for x, y in row] for row in self._get_range_coordinates(range_names)]
+
+    def _get_range_coordinates(self, range_names):
+        """Returns the coordinates of the cells of a range, as rows of (x, y)."""
+        ranges = [self._resolve_range_part(part) for part in RangeSpec.compile(range_names).parts]
+        range_coordinates = []
+        for x_range, y_range in ranges:
             if not y_range:
-                y_range = range(0, len(self.cells))
+                y_range = range(0, self.n_rows)
             if not x_range:
-                max_x = 0
-                for row in self.cells:
-                    if max_x < (row_length := len(row)):
-                        max_x = row_length
-                x_range = range(0, max_x)
+                x_range = range(0, self._get_max_row_length())
             for new_y, y in enumerate(y_range):
-                if new_y >= len(range_cells):
-                    range_cells.append([])
-                for x in x_range:
-                    range_cells[new_y].append(self.get_cell(x, y))
-        return range_cells
+                if new_y >= len(range_coordinates):
+                    range_coordinates.append([])
+                range_coordinates[new_y].extend((x, y) for x in x_range)
+        return range_coordinates
+
+    def get_range_rows(self, range_names, ys):
+        """
+        Returns, for each row y of ys, the Cells of the range that are in this row, in the order of the range.
+        Only the requested rows are accessed, the rest of the range is not materialized.
+        """
+        if not range_names:
+            return []
+        ranges = [self._resolve_range_part(part) for part in RangeSpec.compile(range_names).parts]
+        rows = []
+        for y in ys:
+            row_parts = []
+            for x_range, y_range in ranges:
+                if not y_range:
+                    y_range = range(0, self.n_rows)
+                if y not in y_range:
+                    continue
+                if not x_range:
+                    x_range = range(0, self._get_max_row_length())
+                row_parts.append((y_range.index(y), x_range))
+            row_parts.sort(key=lambda row_part: row_part[0])
+            row = [self.get_cell(x, y) for _, x_range in row_parts for x in x_range]
+            if row:
+                rows.append(row)
+        return rows
+
+    def _get_value_index(self, range_spec):
+        """Returns the value index of a range, building it on first use."""
+        value_index = self._value_indexes.get(range_spec.parts)
+        if value_index is None:
+            coordinates = self._get_range_coordinates(range_spec)
+            value_index = ValueIndex((x, y, self._get_value(x, y)) for row in coordinates for x, y in row)
+            self._value_indexes[range_spec.parts] = value_index
+            if not self._shares_value_indexes and self._owned_value_indexes is not None:
+                self._owned_value_indexes.add(range_spec.parts)
+        return value_index
 
     def get_cells_with_value_in_range(self, range_name):
         range_cells = self.get_range(range_name)
@@ -159,8 +449,13 @@ class Worksheet:
         value_to_find = str(value_to_find)
         if not case_sensitive:
             value_to_find = value_to_find.casefold()
-        if isinstance(range_name, str):
-            range_cells = self.get_range(range_name)
+        if isinstance(range_name, (str, RangeSpec)):
+            range_spec = RangeSpec.compile(range_name)
+            if not range_spec:
+                return []
+            if value_to_find:
+                return self._find_cells_with_index(range_spec, value_to_find, case_sensitive)
+            range_cells = self.get_range(range_spec)
         elif isinstance(range_name, list):
             range_cells = range_name
         else:
@@ -173,48 +468,122 @@ class Worksheet:
                     matching_cells.append(cell)
         return matching_cells
 
+    def _find_cells_with_index(self, range_spec, value_to_find, case_sensitive):
+        """Returns an array of Cell matching the non empty value_to_find, using the value index of the range."""
+        coordinates = self._get_value_index(range_spec).find(value_to_find.casefold())
+        matching_cells = [self.get_cell(x, y) for x, y in coordinates]
+        if case_sensitive:
+            matching_cells = [cell for cell in matching_cells if cell == value_to_find]
+        return matching_cells
+
     def get_range_name(self):
         """Gets the entire range of the cells array."""
         range_name = ""
         if self.name:
             range_name += self.name + "!"
-        range_name += _get_range_name_from_cells(self.cells)
+        max_row_length = self._get_max_row_length()
+        if self.n_rows and max_row_length:
+            range_name += "A1:" + _to_base(max_row_length - 1, LETTER_BASE) + str(self.n_rows)
         return range_name
 
     def get_values(self):
         """Returns an array of all values. (Not Cells)"""
-        return _get_values_from_cells(self.cells)
+        values = []
+        for y, row_length in enumerate(self._row_lengths):
+            values.append([self._decode(self._tags[x][y], self._payloads[x][y]) for x in range(row_length)])
+        return values
 
     def get_updated_values_with_ranges(self):
-        """Returns an array of array of updated values (Not Cells) and an array of corresponding ranges."""
+        """
+        Returns an array of array of updated values (Not Cells) and an array of corresponding ranges.
+        Updated cells are coalesced into rectangles, small gaps being filled with their unchanged values.
+        """
         ranges, values = [], []
-        tmp_cells = []
-        for row in self.cells:
-            for cell in row:
-                if cell._updated:
-                    tmp_cells.append(cell)
-                elif tmp_cells:
-                    values.append(_get_values_from_cells([tmp_cells]))
-                    range_name = ""
-                    if self.name:
-                        range_name += self.name + "!"
-                    range_name += _get_range_name_from_cells([tmp_cells])
-                    ranges.append(range_name)
-                    tmp_cells = []
-            if tmp_cells:
-                values.append(_get_values_from_cells([tmp_cells]))
-                range_name = ""
-                if self.name:
-                    range_name += self.name + "!"
-                range_name += _get_range_name_from_cells([tmp_cells])
-                ranges.append(range_name)
-                tmp_cells = []
+        rectangles = coalesce_rectangles(self._get_changed_cells(), self._get_value_cost, self._get_range_overhead())
+        for x_min, x_max, y_min, y_max in rectangles:
+            ranges.append(self._get_rectangle_range_name(x_min, x_max, y_min, y_max))
+            values.append([[self._get_value(x, y) for x in range(x_min, x_max + 1)] for y in range(y_min, y_max + 1)])
         return ranges, values
 
+    def get_updates(self):
+        """Returns the updated values that differ from the values fetched from the spreadsheet, as (x, y, value)."""
+        return [(x, y, self._get_value(x, y)) for x, y in self._get_changed_cells()]
+
+    @classmethod
+    def from_updates(cls, sheet_name, updates):
+        """
+        Returns a worksheet containing only the updates, as (x, y, value), to send them with
+        get_updated_values_with_ranges. Every other cell is considered not fetched, so it is never rewritten.
+        """
+        worksheet = cls(0, sheet_name, [], loaded_ranges=[])
+        for x, y, value in updates:
+            worksheet._set_value(x, y, value)
+        worksheet._original_values = {}
+        return worksheet
+
+    def _get_changed_cells(self):
+        """Returns the updated coordinates whose value differs from the value fetched from the spreadsheet."""
+        changed_cells = []
+        for coordinates in self._updated_cells:
+            if coordinates in self._original_values and _is_same_value(
+                self._original_values[coordinates], self._get_value(*coordinates)
+            ):
+                continue
+            changed_cells.append(coordinates)
+        return changed_cells
+
+    def _get_value_cost(self, x, y):
+        """Returns the cost of rewriting an unchanged value. Values that have not been fetched cannot be rewritten."""
+        if not self._is_loaded(x, y):
+            return float("inf")
+        return get_json_value_cost(self._get_value(x, y))
+
+    def _is_loaded(self, x, y):
+        """Checks if the value at the coordinates has been fetched from the spreadsheet."""
+        if self._loaded_ranges is None:
+            return True
+        for x_min, x_max, y_min, y_max in self._loaded_ranges:
+            if x_min <= x < x_max and y_min <= y < y_max:
+                return True
+        return False
+
+    @property
+    def is_partial(self):
+        return self._loaded_ranges is not None
+
+    def _get_range_overhead(self):
+        """Returns the cost of sending one more range in an update request."""
+        return RANGE_OVERHEAD + len(self.name)
+
+    def _get_rectangle_range_name(self, x_min, x_max, y_min, y_max):
+        """Returns the range name of a rectangle of coordinates."""
+        range_name = ""
+        if self.name:
+            range_name += self.name + "!"
+        return (
+            range_name
+            + _to_base(x_min, LETTER_BASE)
+            + str(y_min + 1)
+            + ":"
+            + _to_base(x_max, LETTER_BASE)
+            + str(y_max + 1)
+        )
+
     def reset_updated_state(self):
-        for row in self.cells:
-            for cell in row:
-                cell._updated = False
+        self._updated_cells = set()
+        self._original_values = {}
+
+
+def _is_same_value(value, other_value):
+    """Checks if two raw values are the same once in the spreadsheet. Numbers are compared by value (1 == 1.0)."""
+    if isinstance(value, (bool, str)) or isinstance(other_value, (bool, str)):
+        return type(value) is type(other_value) and value == other_value
+    return value == other_value
+
+
+def _merge_from_ranges(x_merge_range, y_merge_range):
+    """Returns a merge tuple (x_min, x_max, y_min, y_max), with exclusive max, from merge ranges."""
+    return (min(x_merge_range), max(x_merge_range) + 1, min(y_merge_range), max(y_merge_range) + 1)
 
 
 def _get_values_from_cells(cells):
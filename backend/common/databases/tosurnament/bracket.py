@@ -49,24 +49,24 @@ class Bracket(Table):
             "qualifiers_results": QualifiersResultsSpreadsheet,
         }
 
-    async def get_players_spreadsheet(self, retry=False, force_sync=False):
+    async def get_players_spreadsheet(self, retry=False, force_sync=False, targeted=False, background=False):
         if self._players_spreadsheet:
-            await self._players_spreadsheet.get_spreadsheet(retry, force_sync)
+            await self._players_spreadsheet.get_spreadsheet(retry, force_sync, targeted, background)
         return self._players_spreadsheet
 
-    async def get_schedules_spreadsheet(self, retry=False, force_sync=False):
+    async def get_schedules_spreadsheet(self, retry=False, force_sync=False, targeted=False, background=False):
         if self._schedules_spreadsheet:
-            await self._schedules_spreadsheet.get_spreadsheet(retry, force_sync)
+            await self._schedules_spreadsheet.get_spreadsheet(retry, force_sync, targeted, background)
         return self._schedules_spreadsheet
 
-    async def get_qualifiers_spreadsheet(self, retry=False, force_sync=False):
+    async def get_qualifiers_spreadsheet(self, retry=False, force_sync=False, targeted=False, background=False):
         if self._qualifiers_spreadsheet:
-            await self._qualifiers_spreadsheet.get_spreadsheet(retry, force_sync)
+            await self._qualifiers_spreadsheet.get_spreadsheet(retry, force_sync, targeted, background)
         return self._qualifiers_spreadsheet
 
-    async def qualifiers_results_spreadsheet(self, retry=False, force_sync=False):
+    async def qualifiers_results_spreadsheet(self, retry=False, force_sync=False, targeted=False, background=False):
         if self._qualifiers_results_spreadsheet:
-            await self._qualifiers_results_spreadsheet.get_spreadsheet(retry, force_sync)
+            await self._qualifiers_results_spreadsheet.get_spreadsheet(retry, force_sync, targeted, background)
         return self._qualifiers_results_spreadsheet
 
     # TODO: getter + async too
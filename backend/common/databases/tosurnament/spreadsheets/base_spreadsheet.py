@@ -1,13 +1,16 @@
 """Base spreadsheet table"""
 
 import asyncio
-import copy
 
 from encrypted_mysqldb.table import Table
 from encrypted_mysqldb.fields import StrField
 
 from common.api.spreadsheet import Spreadsheet, HttpError
+from common.api.spreadsheet import async_client, rate_limiter
 from common.exceptions import SpreadsheetHttpError
+from common.utils.single_flight import SingleFlight
+
+spreadsheet_loads = SingleFlight()
 
 
 class BaseSpreadsheet(Table):
@@ -27,40 +30,89 @@ class BaseSpreadsheet(Table):
             if not key.startswith("_") and key not in keys_to_ignore:
                 setattr(new_obj, key, value)
 
-    async def get_spreadsheet(self, retry=False, force_sync=False):
-        if self._spreadsheet is None or force_sync:
-            loop = asyncio.get_running_loop()
-            if not loop:
-                return None
+    def get_ranges(self):
+        """Returns the configured ranges, prefixed by the sheet name when there is one."""
+        ranges = []
+        for key, value in vars(self).items():
+            if not key.startswith("range_") or not value:
+                continue
+            if "!" not in value and self.sheet_name:
+                value = "'" + self.sheet_name.replace("'", "''") + "'!" + value
+            ranges.append(value)
+        return ranges
+
+    async def get_spreadsheet(self, retry=False, force_sync=False, targeted=False, background=False):
+        """
+        Gets the spreadsheet. When targeted is set and the spreadsheet is not already snapshotted, only the configured
+        ranges are fetched. The result is then partial and must only be used to read these ranges.
+        Requests of background tasks wait for the ones of commands when the Sheets API quota is reached.
+        """
+        if self._spreadsheet is None or force_sync or (not targeted and self._spreadsheet.ranges):
+            priority = rate_limiter.BACKGROUND if background else rate_limiter.INTERACTIVE
             n_retry = 0
             while True:
                 try:
-                    await loop.run_in_executor(None, _get_spreadsheet_worksheet, self, force_sync)
+                    await self._load_spreadsheet(force_sync, targeted, priority)
                 except SpreadsheetHttpError as e:
                     if e.code != 403 and retry and n_retry < 5:
+                        await asyncio.sleep(rate_limiter.get_backoff_delay(n_retry))
                         n_retry += 1
-                        await asyncio.sleep(10)
                         continue
                     else:
                         raise e
                 break
         return self._spreadsheet
 
+    async def _load_spreadsheet(self, force_sync, targeted, priority=rate_limiter.INTERACTIVE):
+        """
+        Loads the spreadsheet and its main worksheet. Concurrent loads of the same spreadsheet share the same
+        retrieval, each one then gets its own view of the result.
+        """
+        ranges = tuple(self.get_ranges()) if targeted else None
+        key = (self.spreadsheet_id, force_sync, ranges)
+        try:
+            spreadsheet = await spreadsheet_loads.run(
+                key, _get_spreadsheet, self.spreadsheet_id, force_sync, ranges, priority
+            )
+        except HttpError as e:
+            raise SpreadsheetHttpError(e.code, e.operation, self._type, e.error)
+        self._spreadsheet = spreadsheet.create_view()
+        if self.sheet_name:
+            for i, worksheet in enumerate(self._spreadsheet.worksheets):
+                if worksheet.name == self.sheet_name:
+                    self._spreadsheet.main_worksheet_index = i
+
     @property
     def spreadsheet(self):
         return self._spreadsheet
 
 
-def _get_spreadsheet_worksheet(self, force_sync):
-    """Retrieves the spreadsheet and its main worksheet."""
-    try:
-        if force_sync:
-            self._spreadsheet = copy.copy(Spreadsheet.retrieve_spreadsheet_and_update_pickle(self.spreadsheet_id))
-        else:
-            self._spreadsheet = copy.copy(Spreadsheet.get_from_id(self.spreadsheet_id))
-        if self.sheet_name:
-            for i, worksheet in enumerate(self._spreadsheet.worksheets):
-                if worksheet.name == self.sheet_name:
-                    self._spreadsheet.main_worksheet_index = i
-    except HttpError as e:
-        raise SpreadsheetHttpError(e.code, e.operation, self._type, e.error)
+async def _get_spreadsheet(spreadsheet_id, force_sync, ranges=None, priority=rate_limiter.INTERACTIVE):
+    """
+    Returns the snapshot of the spreadsheet, or retrieves it if there is none. When force_sync is set, the snapshot
+    is only used if it is of the current revision of the spreadsheet, which it can be as another process may have
+    published it. If ranges is set, only these ranges are retrieved.
+    Retrievals wait for the rate limiter of the Sheets API.
+    """
+    loop = asyncio.get_running_loop()
+    spreadsheet = await loop.run_in_executor(None, Spreadsheet.snapshot_from_id, spreadsheet_id)
+    if spreadsheet and not force_sync:
+        return spreadsheet
+    revision = await loop.run_in_executor(None, Spreadsheet.get_revision, spreadsheet_id)
+    if spreadsheet and revision:
+        if spreadsheet.revision == revision:
+            return spreadsheet
+        # Another process may have published the snapshot of this revision in the snapshot store
+        spreadsheet = await loop.run_in_executor(None, Spreadsheet.snapshot_from_id, spreadsheet_id, revision)
+        if spreadsheet:
+            return spreadsheet
+    # Retrieving ranges needs a request for the metadata, then one for the values
+    await rate_limiter.scheduler.acquire(rate_limiter.READ, priority, 2 if ranges else 1)
+    if async_client.client:
+        spreadsheet = await Spreadsheet.retrieve_spreadsheet_async(spreadsheet_id, async_client.client, ranges)
+    else:
+        spreadsheet = await loop.run_in_executor(None, Spreadsheet.retrieve_spreadsheet, spreadsheet_id, ranges)
+    if not ranges:
+        spreadsheet.revision = revision
+    await loop.run_in_executor(None, spreadsheet.update_snapshot)
+    return spreadsheet
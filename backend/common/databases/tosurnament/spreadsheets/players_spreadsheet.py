@@ -1,7 +1,5 @@
 """Players spreadsheet table"""
 
-import re
-
 from discord.ext import commands
 from encrypted_mysqldb.fields import StrField, IntField
 
@@ -10,9 +8,11 @@ from common.api.spreadsheet import (
     find_corresponding_cell_best_effort_from_range,
     find_corresponding_cells_best_effort_from_range,
     Cell,
-    from_letter_base,
+    CellColumn,
 )
 
+TEAM_TABLE_PLAYER_FIELDS = ("team", "discord", "discord_id", "rank", "bws_rank", "osu_id", "pp", "country")
+
 
 class PlayersSpreadsheet(BaseSpreadsheet):
     """Players spreadsheet class"""
@@ -33,6 +33,30 @@ class PlayersSpreadsheet(BaseSpreadsheet):
         super().__init__(session, *args, **kwargs)
         self._type = "players"
 
+    def get_team_table(self):
+        """Returns the TeamTable of the spreadsheet. It is built once per snapshot and shared by every command."""
+        key = (
+            "team_table",
+            self.sheet_name,
+            self.range_team_name,
+            self.max_range_for_teams,
+            *(getattr(self, "range_" + field) for field in TEAM_TABLE_PLAYER_FIELDS + ("timezone",)),
+        )
+        return self.spreadsheet.get_derived(key, lambda spreadsheet: TeamTable(self, spreadsheet))
+
+    def get_team_infos(self):
+        """Returns the TeamInfo of every team, like TeamInfo.from_team_name with the name of each team cell."""
+        team_table = self.get_team_table()
+        return [team_table.get_team_info(self.spreadsheet, index) for index in team_table.get_team_indexes()]
+
+    def find_team_info_of_player(self, name, discord_id, discord):
+        """Returns the TeamInfo of the first team where TeamInfo.find_player finds the player, or None."""
+        team_table = self.get_team_table()
+        index = team_table.find_team_of_player(name, discord_id, discord)
+        if index is None:
+            return None
+        return team_table.get_team_info(self.spreadsheet, index)
+
 
 class TeamNotFound(commands.CommandError):
     """Thrown when a match id is not found."""
@@ -289,11 +313,9 @@ class TeamInfo:
             range_to_use = players_spreadsheet.range_team
         cells = players_spreadsheet.spreadsheet.get_range(range_to_use)
         if not cells:
-            worksheet, range_to_use = players_spreadsheet.spreadsheet.get_worksheet_and_range(range_to_use)
-            splitted_range = range_to_use.split(":")[0]
-            column, row, _ = re.split(r"(\d+)", splitted_range)  # TODO: handle all kind of ranges
-            cells = [[Cell(from_letter_base(column), int(row) - 1, "")]]
-            worksheet.cells = cells
+            worksheet, range_spec = players_spreadsheet.spreadsheet.get_worksheet_and_range(range_to_use)
+            # TODO: handle all kind of ranges
+            cells = [[worksheet.get_cell(range_spec.first_column, max(range_spec.first_row, 0))]]
         used = False
         for row in cells:
             used = False
@@ -305,10 +327,94 @@ class TeamInfo:
                 break
         if used:
             worksheet, _ = players_spreadsheet.spreadsheet.get_worksheet_and_range(range_to_use)
-            cells = worksheet.cells
-            row = [Cell(row[0].x, row[0].y + 1, "")]
-            cells.append(row)
+            row = [worksheet.get_cell(row[0].x, row[0].y + 1)]
         if players_spreadsheet.range_team_name:
             return TeamInfo.from_team_name_cell(players_spreadsheet, row[0])
         else:
             return TeamInfo.from_player_cell(players_spreadsheet, row[0])
+
+
+class TeamTable:
+    """
+    Coordinates of the cells of every team of a players spreadsheet, with maps to find teams by team name, player
+    name, discord tag and discord id. Each range is read once for all the teams, instead of once per team by
+    TeamInfo.from_team_name. Teams are referred to by the index of their cell in the team name range (or in the team
+    range if there is no team name range). When a name appears several times, only its first team is used, as
+    with TeamInfo.from_team_name.
+    """
+
+    def __init__(self, players_spreadsheet, spreadsheet):
+        self.with_team_names = bool(players_spreadsheet.range_team_name)
+        range_name = players_spreadsheet.range_team_name or players_spreadsheet.range_team
+        worksheet, _ = spreadsheet.get_worksheet_and_range(range_name)
+        base_cells = spreadsheet.get_cells_with_value_in_range(range_name)
+        self._base_column = CellColumn(spreadsheet.worksheets.index(worksheet))
+        self._by_team_name = {}
+        self._team_indexes = []
+        for base_cell in base_cells:
+            self._base_column.append([base_cell])
+            self._team_indexes.append(self._by_team_name.setdefault(base_cell.casefold(), len(self._team_indexes)))
+        max_difference_with_base = players_spreadsheet.max_range_for_teams
+        self._columns = {}
+        for field in TEAM_TABLE_PLAYER_FIELDS + ("timezone",):
+            if field == "team" and not self.with_team_names:
+                continue
+            self._columns[field] = CellColumn.from_range(
+                spreadsheet,
+                getattr(players_spreadsheet, "range_" + field),
+                base_cells,
+                self.with_team_names,
+                max_difference_with_base,
+            )
+        self._by_player_name = {}
+        self._by_discord = {}
+        self._by_discord_id = {}
+        for index in set(self._team_indexes):
+            for player in self.get_team_info(spreadsheet, index).players:
+                self._by_player_name.setdefault(player.name.casefold(), set()).add(index)
+                self._by_discord.setdefault(player.discord.value, set()).add(index)
+                self._by_discord_id.setdefault(player.discord_id.value, set()).add(index)
+
+    def __len__(self):
+        return len(self._team_indexes)
+
+    def get_team_indexes(self):
+        """Returns the team of each cell of the team name range, in order."""
+        return self._team_indexes
+
+    def find_team(self, team_name):
+        return self._by_team_name.get(str(team_name).casefold())
+
+    def find_team_of_player(self, name, discord_id, discord):
+        """Returns the first team where TeamInfo.find_player finds the player, or None."""
+        indexes = set()
+        if discord_id:
+            indexes.update(self._by_discord_id.get(str(discord_id), ()))
+        if discord:
+            indexes.update(self._by_discord.get(discord, ()))
+        if name:
+            indexes.update(self._by_player_name.get(name.casefold(), ()))
+        return min(indexes, default=None)
+
+    def get_team_info(self, spreadsheet, index):
+        """Returns the TeamInfo of the team at index, with the cells of spreadsheet."""
+        base_cell = self._base_column.get_cells(spreadsheet, index)[0]
+        team_info = TeamInfo(base_cell)
+        if not self.with_team_names:
+            player_cells = [
+                self._columns[field].get_cells(spreadsheet, index)[0] for field in TEAM_TABLE_PLAYER_FIELDS[1:]
+            ]
+            team_info.set_timezone(self._columns["timezone"].get_cells(spreadsheet, index)[0])
+            team_info.add_player(TeamInfo.PlayerInfo(base_cell, *player_cells))
+            return team_info
+        players_data = [self._columns[field].get_cells(spreadsheet, index) for field in TEAM_TABLE_PLAYER_FIELDS]
+        timezone_cells = self._columns["timezone"].get_cells(spreadsheet, index)
+        if timezone_cells:
+            team_info.timezone = timezone_cells[0]
+        max_len = len(players_data[0])
+        for player_data in players_data:
+            while len(player_data) < max_len:
+                player_data.append(Cell(-1, -1, ""))
+        for name, discord, discord_id, rank, bws_rank, osu_id, pp, country in zip(*players_data):
+            team_info.add_player(TeamInfo.PlayerInfo(name, discord, discord_id, rank, bws_rank, osu_id, pp, country))
+        return team_info
@@ -47,7 +47,8 @@ class QualifiersResultInfo:
         spreadsheet = qualifiers_results_spreadsheet.spreadsheet
         result_info.set_score(
             find_corresponding_cell_best_effort(
-                spreadsheet.get_range(qualifiers_results_spreadsheet.range_score), osu_id_cell
+                spreadsheet.get_range_rows(qualifiers_results_spreadsheet.range_score, osu_id_cell.y_merge_range),
+                osu_id_cell,
             )
         )
         return result_info
@@ -1,7 +1,9 @@
 """Qualifiers spreadsheet table"""
 
 import math
+import bisect
 import datetime
+from array import array
 
 from discord.ext import commands
 from encrypted_mysqldb.fields import StrField, IntField
@@ -11,8 +13,12 @@ from common.api.spreadsheet import (
     find_corresponding_cell_best_effort,
     find_corresponding_qualifier_cells_best_effort,
     Cell,
+    CellColumn,
 )
 
+# Number of changes a LobbyTable keeps on top of the slots built from the spreadsheet before merging them
+MAX_LOBBY_TABLE_CHANGES = 256
+
 
 class QualifiersSpreadsheet(BaseSpreadsheet):
     """Qualifiers spreadsheet class"""
@@ -28,6 +34,25 @@ class QualifiersSpreadsheet(BaseSpreadsheet):
     range_time = StrField()
     max_teams_in_row = IntField(8)
 
+    def get_lobby_table(self):
+        """Returns the LobbyTable of the spreadsheet. It is built once per snapshot and shared by every command."""
+        return self.spreadsheet.get_derived(
+            self._get_lobby_table_key(), lambda spreadsheet: LobbyTable(self, spreadsheet)
+        )
+
+    def set_lobby_team(self, lobby_table, lobby_index, slot, team_name):
+        """
+        Sets the team of a slot of a lobby, and returns the LobbyTable updated accordingly, which is then kept as the
+        LobbyTable of the spreadsheet instead of being built again.
+        """
+        lobby_table = lobby_table.copy()
+        lobby_table.set_team(self.spreadsheet, lobby_index, slot, team_name)
+        self.spreadsheet.set_derived(self._get_lobby_table_key(), lobby_table)
+        return lobby_table
+
+    def _get_lobby_table_key(self):
+        return ("lobby_table", self.sheet_name, self.range_lobby_id, self.range_teams, self.max_teams_in_row)
+
 
 class LobbyIdNotFound(commands.CommandError):
     """Thrown when a match id is not found."""
@@ -101,8 +126,9 @@ class LobbyInfo:
 
     @staticmethod
     def from_id(qualifiers_spreadsheet, lobby_id, filled_only=True):
-        lobby_id_cells = qualifiers_spreadsheet.spreadsheet.get_range(qualifiers_spreadsheet.range_lobby_id)
-        corresponding_lobby_id_cells = qualifiers_spreadsheet.spreadsheet.find_cells(lobby_id_cells, lobby_id, False)
+        corresponding_lobby_id_cells = qualifiers_spreadsheet.spreadsheet.find_cells(
+            qualifiers_spreadsheet.range_lobby_id, lobby_id, False
+        )
         if not corresponding_lobby_id_cells:
             raise LobbyIdNotFound(lobby_id)
         if len(corresponding_lobby_id_cells) > 1:
@@ -117,7 +143,7 @@ class LobbyInfo:
         lobby_info.set_teams(
             find_corresponding_qualifier_cells_best_effort(
                 spreadsheet,
-                spreadsheet.get_range(qualifiers_spreadsheet.range_teams),
+                spreadsheet.get_range_rows(qualifiers_spreadsheet.range_teams, lobby_id_cell.y_merge_range),
                 lobby_id_cell,
                 qualifiers_spreadsheet.max_teams_in_row,
                 filled_only,
@@ -125,23 +151,126 @@ class LobbyInfo:
         )
         lobby_info.set_referee(
             find_corresponding_cell_best_effort(
-                spreadsheet.get_range(qualifiers_spreadsheet.range_referee),
+                spreadsheet.get_range_rows(qualifiers_spreadsheet.range_referee, lobby_id_cell.y_merge_range),
                 lobby_id_cell,
                 qualifiers_spreadsheet.max_teams_in_row,
             )
         )
         lobby_info.set_date(
             find_corresponding_cell_best_effort(
-                spreadsheet.get_range(qualifiers_spreadsheet.range_date),
+                spreadsheet.get_range_rows(qualifiers_spreadsheet.range_date, lobby_id_cell.y_merge_range),
                 lobby_id_cell,
                 qualifiers_spreadsheet.max_teams_in_row,
             )
         )
         lobby_info.set_time(
             find_corresponding_cell_best_effort(
-                spreadsheet.get_range(qualifiers_spreadsheet.range_time),
+                spreadsheet.get_range_rows(qualifiers_spreadsheet.range_time, lobby_id_cell.y_merge_range),
                 lobby_id_cell,
                 qualifiers_spreadsheet.max_teams_in_row,
             )
         )
         return lobby_info
+
+
+class LobbyTable:
+    """
+    Coordinates of the team cells of every lobby of a qualifiers spreadsheet, as found by
+    LobbyInfo.from_lobby_id_cell with filled_only unset, with the slots of each team and the number of free slots of
+    each lobby. Lobbies are referred to by the index of their cell in the lobby id range, and slots by the index of
+    the team cell in their lobby. set_team keeps the table up to date, so that registering a team does not read the
+    other lobbies.
+    The slots of the teams and the free slots built from the spreadsheet are shared by the copies of the table, each
+    copy keeping its own changes, so that copying the table does not copy every team.
+    """
+
+    def __init__(self, qualifiers_spreadsheet, spreadsheet):
+        lobby_id_cells = spreadsheet.get_cells_with_value_in_range(qualifiers_spreadsheet.range_lobby_id)
+        worksheet, range_spec = spreadsheet.get_worksheet_and_range(qualifiers_spreadsheet.range_teams)
+        ys = sorted({y for lobby_id_cell in lobby_id_cells for y in lobby_id_cell.y_merge_range})
+        rows_by_y = {row[0].y: row for row in worksheet.get_range_rows(range_spec, ys)}
+        self.lobby_ids = []
+        self._by_lobby_id = {}
+        self._team_column = CellColumn(spreadsheet.worksheets.index(worksheet))
+        self._n_free_slots = array("I")
+        self._slots_of_team = {}
+        for lobby_index, lobby_id_cell in enumerate(lobby_id_cells):
+            lobby_id_cell.value_type = str
+            self.lobby_ids.append(lobby_id_cell.casefold())
+            self._by_lobby_id.setdefault(lobby_id_cell.casefold(), []).append(lobby_index)
+            team_cells = find_corresponding_qualifier_cells_best_effort(
+                spreadsheet,
+                [rows_by_y[y] for y in lobby_id_cell.y_merge_range if y in rows_by_y],
+                lobby_id_cell,
+                qualifiers_spreadsheet.max_teams_in_row,
+                False,
+            )
+            self._team_column.append(team_cells)
+            n_free_slots = 0
+            for slot, team_cell in enumerate(team_cells):
+                team_cell.value_type = str
+                if team_cell:
+                    self._slots_of_team.setdefault(team_cell.casefold(), []).append((lobby_index, slot))
+                else:
+                    n_free_slots += 1
+            self._n_free_slots.append(n_free_slots)
+        self._changed_slots_of_team = {}
+        self._changed_n_free_slots = {}
+
+    def copy(self):
+        """
+        Returns a copy of the table that set_team can update without affecting this one. Only the changes are copied,
+        until there are MAX_LOBBY_TABLE_CHANGES of them, then they are merged in new shared slots and free slots.
+        """
+        lobby_table = LobbyTable.__new__(LobbyTable)
+        lobby_table.__dict__.update(self.__dict__)
+        if len(self._changed_slots_of_team) + len(self._changed_n_free_slots) < MAX_LOBBY_TABLE_CHANGES:
+            lobby_table._changed_slots_of_team = dict(self._changed_slots_of_team)
+            lobby_table._changed_n_free_slots = dict(self._changed_n_free_slots)
+            return lobby_table
+        lobby_table._slots_of_team = {**self._slots_of_team, **self._changed_slots_of_team}
+        lobby_table._n_free_slots = array("I", self._n_free_slots)
+        for lobby_index, n_free_slots in self._changed_n_free_slots.items():
+            lobby_table._n_free_slots[lobby_index] = n_free_slots
+        lobby_table._changed_slots_of_team = {}
+        lobby_table._changed_n_free_slots = {}
+        return lobby_table
+
+    def find_lobby(self, lobby_id):
+        """Returns the index of the lobby, or None if it is not found, like LobbyInfo.from_id."""
+        lobby_indexes = self._by_lobby_id.get(str(lobby_id).casefold(), ())
+        if len(lobby_indexes) > 1:
+            raise DuplicateLobbyId(lobby_id)
+        return lobby_indexes[0] if lobby_indexes else None
+
+    def get_team_slots(self, team_name):
+        """Returns the (lobby index, slot) of every team cell containing the team name, in order."""
+        team_name = team_name.casefold()
+        if team_name in self._changed_slots_of_team:
+            return self._changed_slots_of_team[team_name]
+        return self._slots_of_team.get(team_name, [])
+
+    def get_n_free_slots(self, lobby_index):
+        return self._changed_n_free_slots.get(lobby_index, self._n_free_slots[lobby_index])
+
+    def get_team_cells(self, spreadsheet, lobby_index):
+        team_cells = self._team_column.get_cells(spreadsheet, lobby_index)
+        for team_cell in team_cells:
+            team_cell.value_type = str
+        return team_cells
+
+    def set_team(self, spreadsheet, lobby_index, slot, team_name):
+        """Sets the team cell of a slot, and updates the slots of the teams and the free slots of the lobby."""
+        team_cell = self.get_team_cells(spreadsheet, lobby_index)[slot]
+        n_free_slots = self.get_n_free_slots(lobby_index)
+        if team_cell:
+            slots = self.get_team_slots(team_cell.get())
+            self._changed_slots_of_team[team_cell.casefold()] = [s for s in slots if s != (lobby_index, slot)]
+            n_free_slots += 1
+        team_cell.set(team_name)
+        if team_cell:
+            slots = list(self.get_team_slots(team_cell.get()))
+            bisect.insort(slots, (lobby_index, slot))
+            self._changed_slots_of_team[team_cell.casefold()] = slots
+            n_free_slots -= 1
+        self._changed_n_free_slots[lobby_index] = n_free_slots
@@ -1,5 +1,6 @@
 """Schedules spreadsheet table"""
 
+import bisect
 import math
 import datetime
 import dateparser
@@ -12,10 +13,15 @@ from common import exceptions
 from .base_spreadsheet import BaseSpreadsheet
 from common.api.spreadsheet import (
     Cell,
+    CellColumn,
     find_corresponding_cell_best_effort_from_range,
     find_corresponding_cells_best_effort_from_range,
 )
 
+MATCH_TABLE_FIELDS = ("team1", "team2", "score_team1", "score_team2", "date", "time")
+MATCH_TABLE_STAFF_FIELDS = ("referee", "streamer", "commentator", "mp_links")
+SCHEDULE_INDEX_STAFF_FIELDS = ("referee", "streamer", "commentator")
+
 
 class SchedulesSpreadsheet(BaseSpreadsheet):
     """Schedules spreadsheet class"""
@@ -41,6 +47,57 @@ class SchedulesSpreadsheet(BaseSpreadsheet):
         super().__init__(session, *args, **kwargs)
         self._type = "schedules"
 
+    def get_match_table(self):
+        """Returns the MatchTable of the spreadsheet. It is built once per snapshot and shared by every command."""
+        return self.spreadsheet.get_derived(
+            self._get_match_table_key("match_table"), lambda spreadsheet: MatchTable(self, spreadsheet)
+        )
+
+    def get_schedule_index(self):
+        """Returns the ScheduleIndex of the spreadsheet, built once per snapshot like its MatchTable."""
+        return self.spreadsheet.get_derived(
+            self._get_match_table_key("schedule_index"),
+            lambda spreadsheet: ScheduleIndex(self.get_match_table(), spreadsheet),
+        )
+
+    def _get_match_table_key(self, name):
+        return (
+            name,
+            self.sheet_name,
+            self.use_range,
+            self.range_match_id,
+            *(getattr(self, "range_" + field) for field in MATCH_TABLE_FIELDS + MATCH_TABLE_STAFF_FIELDS),
+        )
+
+    def get_match_infos(self, match_ids=None, match_ids_to_ignore=()):
+        """
+        Yields the MatchInfo of every match, in the order of the match id range, like MatchInfo.from_match_id_cell.
+        match_ids and match_ids_to_ignore are casefolded match ids.
+        """
+        return self.get_match_table().get_match_infos(self.spreadsheet, match_ids, match_ids_to_ignore)
+
+    def get_next_match_infos(self, tournament, now, match_ids_to_ignore=(), match_indexes=None):
+        """
+        Returns the MatchInfo and date of the matches not before now, in sheet order. If match_indexes is set, only
+        these matches are returned, without going through the others.
+        """
+        schedule_index = self.get_schedule_index()
+        dates, indexes, date_by_index = schedule_index.get_dated_matches(
+            self.spreadsheet, tournament, self.date_format or "%d %B", now
+        )
+        if match_indexes is None:
+            next_indexes = sorted(indexes[bisect.bisect_left(dates, now) :])
+        else:
+            next_indexes = sorted(
+                index for index in set(match_indexes) if index in date_by_index and date_by_index[index] >= now
+            )
+        match_table = schedule_index.match_table
+        return [
+            (match_table.get_match_info(self.spreadsheet, index), date_by_index[index])
+            for index in next_indexes
+            if match_table.match_ids[index] not in match_ids_to_ignore
+        ]
+
 
 class MatchIdNotFound(commands.CommandError):
     """Thrown when a match id is not found."""
@@ -173,8 +230,9 @@ class MatchInfo:
 
     @staticmethod
     def from_id(schedules_spreadsheet, match_id, filled_only=True):
-        match_id_cells = schedules_spreadsheet.spreadsheet.get_range(schedules_spreadsheet.range_match_id)
-        corresponding_match_id_cells = schedules_spreadsheet.spreadsheet.find_cells(match_id_cells, match_id, False)
+        corresponding_match_id_cells = schedules_spreadsheet.spreadsheet.find_cells(
+            schedules_spreadsheet.range_match_id, match_id, False
+        )
         if not corresponding_match_id_cells:
             raise MatchIdNotFound(match_id)
         if len(corresponding_match_id_cells) > 1:
@@ -299,3 +357,125 @@ class MatchInfo:
                 ]
             )
         return match_info
+
+
+class MatchTable:
+    """
+    Coordinates of the cells of every match of a schedules spreadsheet. Each range is read once for all the matches,
+    instead of once per match by MatchInfo.from_match_id_cell. The cells are only created when the MatchInfo of a
+    match is asked, so that the table can be shared by the views of a snapshot.
+    """
+
+    def __init__(self, schedules_spreadsheet, spreadsheet):
+        worksheet, _ = spreadsheet.get_worksheet_and_range(schedules_spreadsheet.range_match_id)
+        match_id_cells = spreadsheet.get_cells_with_value_in_range(schedules_spreadsheet.range_match_id)
+        self.match_ids = [match_id_cell.casefold() for match_id_cell in match_id_cells]
+        self._match_id_column = CellColumn(spreadsheet.worksheets.index(worksheet))
+        for match_id_cell in match_id_cells:
+            self._match_id_column.append([match_id_cell])
+        self._columns = {}
+        for field in MATCH_TABLE_FIELDS:
+            range_name = getattr(schedules_spreadsheet, "range_" + field)
+            self._columns[field] = CellColumn.from_range(spreadsheet, range_name, match_id_cells, False)
+        for field in MATCH_TABLE_STAFF_FIELDS:
+            range_name = getattr(schedules_spreadsheet, "range_" + field)
+            self._columns[field] = CellColumn.from_range(
+                spreadsheet, range_name, match_id_cells, schedules_spreadsheet.use_range
+            )
+
+    def __len__(self):
+        return len(self.match_ids)
+
+    def get_match_info(self, spreadsheet, index):
+        """Returns the MatchInfo of the match at index, with the cells of spreadsheet."""
+        match_info = MatchInfo(self._match_id_column.get_cells(spreadsheet, index)[0])
+        team1, team2, score_team1, score_team2, date, time, referees, streamers, commentators, mp_links = (
+            self.get_cells(spreadsheet, index, field) for field in MATCH_TABLE_FIELDS + MATCH_TABLE_STAFF_FIELDS
+        )
+        match_info.set_team1(team1[0])
+        match_info.set_team2(team2[0])
+        match_info.set_score_team1(score_team1[0])
+        match_info.set_score_team2(score_team2[0])
+        match_info.set_date(date[0])
+        match_info.set_time(time[0])
+        match_info.set_referees(referees)
+        match_info.set_streamers(streamers)
+        match_info.set_commentators(commentators)
+        match_info.set_mp_links(mp_links)
+        return match_info
+
+    def get_cells(self, spreadsheet, index, field):
+        """Returns the cells of a field (see MATCH_TABLE_FIELDS) of the match at index, from spreadsheet."""
+        return self._columns[field].get_cells(spreadsheet, index)
+
+    def get_match_infos(self, spreadsheet, match_ids=None, match_ids_to_ignore=()):
+        for index, match_id in enumerate(self.match_ids):
+            if match_id in match_ids_to_ignore or (match_ids is not None and match_id not in match_ids):
+                continue
+            yield self.get_match_info(spreadsheet, index)
+
+
+class ScheduleIndex:
+    """
+    Indexes of the matches of a MatchTable, by casefolded team name and staff name, and by date. Multi-value cells
+    like "name1/name2" are indexed under each of their values, so that a name is found in the same cells as with
+    Cell.has_value. Matches are referred to by their index in the MatchTable.
+    """
+
+    def __init__(self, match_table, spreadsheet):
+        self.match_table = match_table
+        self._by_team = {}
+        self._by_staff = {field: {} for field in SCHEDULE_INDEX_STAFF_FIELDS}
+        self._without_referee = []
+        self._dated_matches = {}
+        for index in range(len(match_table)):
+            for field in ("team1", "team2"):
+                _index_cells(self._by_team, match_table.get_cells(spreadsheet, index, field), index)
+            for field, matches_by_name in self._by_staff.items():
+                _index_cells(matches_by_name, match_table.get_cells(spreadsheet, index, field), index)
+            if not any(cell.value for cell in match_table.get_cells(spreadsheet, index, "referee")):
+                self._without_referee.append(index)
+
+    def get_matches_of_team(self, team_name):
+        return self._by_team.get(str(team_name).casefold(), [])
+
+    def get_matches_of_staff(self, field, staff_name):
+        """Returns the matches where staff_name is in the cells of field (referee, streamer or commentator)."""
+        return self._by_staff[field].get(str(staff_name).casefold(), [])
+
+    def get_matches_without_referee(self):
+        return self._without_referee
+
+    def get_dated_matches(self, spreadsheet, tournament, date_format, now):
+        """
+        Returns the dates of the matches with a valid date in ascending order, the corresponding matches, and a dict
+        from match to date. Dates are parsed relatively to now, once per snapshot, per day and per date settings of
+        the tournament, as dates without a year get the year of the day they are parsed.
+        """
+        key = (tournament.utc, tournament.date_format, date_format, now.date())
+        dated_matches = self._dated_matches.get(key)
+        if dated_matches is None:
+            date_by_index = {}
+            for index in range(len(self.match_table)):
+                match_info = self.match_table.get_match_info(spreadsheet, index)
+                match_date = tournament.parse_date(
+                    match_info.get_datetime(), date_formats=[date_format + " %H:%M"], relative_base=now
+                )
+                if match_date:
+                    date_by_index[index] = match_date
+            indexes = sorted(date_by_index, key=lambda index: date_by_index[index])
+            dated_matches = ([date_by_index[index] for index in indexes], indexes, date_by_index)
+            self._dated_matches[key] = dated_matches
+        return dated_matches
+
+
+def _index_cells(matches_by_value, cells, index):
+    """Adds index to the matches of every value of the cells, see Cell.has_value."""
+    values = set()
+    for cell in cells:
+        cell_value = cell.casefold()
+        values.add(cell_value)
+        if "/" in cell_value:
+            values.update(value.strip() for value in cell_value.split("/"))
+    for value in values:
+        matches_by_value.setdefault(value, []).append(index)
@@ -1,11 +1,18 @@
 """Tournament table"""
 
 import datetime
+import functools
 import dateparser
 
 from encrypted_mysqldb.table import Table
 from encrypted_mysqldb.fields import IdField, StrField, IntField, HashField, BoolField, DatetimeField
 
+# Formats of the strings built by MatchInfo.get_datetime and LobbyInfo.get_datetime from Sheets serial dates and times
+SERIAL_DATE_FORMATS = ["%d %B %H:%M", "%d %B"]
+PARSED_DATES_CACHE_SIZE = 65536
+
+_parsed_dates = {}
+
 
 class Tournament(Table):
     """Tournament class"""
@@ -73,41 +80,48 @@ class Tournament(Table):
         except KeyError:
             return None
 
-    def parse_date(
-        self,
-        date,
-        date_formats=[],
-        prefer_dates_from="current_period",
-        relative_base=datetime.datetime.now(),
-    ):
+    def parse_date(self, date, date_formats=None, prefer_dates_from="current_period", relative_base=None):
+        """
+        Parses a date of the tournament timezone. Dates matching one of the formats (or a Sheets serial date, when
+        prefer_dates_from is current_period) are parsed with strptime and memoized per day of relative_base. Other
+        dates go through dateparser, and are only memoized when date_formats is set, as they come from a spreadsheet
+        and are not relative like user input.
+        """
+        from_spreadsheet = bool(date_formats)
+        date_formats = list(date_formats or [])
         if self.date_format:
             date_formats.append(self.date_format)
         elif not date_formats:
             date_formats.append("%d %B")
-        if self.utc:
-            return dateparser.parse(
-                date,
-                date_formats=date_formats,
-                settings={
-                    "PREFER_DATES_FROM": prefer_dates_from,
-                    "RELATIVE_BASE": relative_base,
-                    "TIMEZONE": self.utc,
-                    "RETURN_AS_TIMEZONE_AWARE": True,
-                    "DATE_ORDER": "DMY",
-                },
-            )
-        else:
-            return dateparser.parse(
+        if relative_base is None:
+            relative_base = datetime.datetime.now()
+        utc = self.utc or "+00:00"
+        key = (date, tuple(date_formats), prefer_dates_from, utc, relative_base.date(), relative_base.tzinfo)
+        if key in _parsed_dates:
+            return _parsed_dates[key]
+        fast_date_formats = date_formats
+        if prefer_dates_from == "current_period":
+            # dateparser reads those dates like the formats would when no other format matches
+            fast_date_formats = date_formats + SERIAL_DATE_FORMATS
+        parsed_date = _parse_date_with_formats(date, fast_date_formats, utc, relative_base)
+        if parsed_date is None:
+            parsed_date = dateparser.parse(
                 date,
                 date_formats=date_formats,
                 settings={
                     "PREFER_DATES_FROM": prefer_dates_from,
                     "RELATIVE_BASE": relative_base,
-                    "TIMEZONE": "+00:00",
+                    "TIMEZONE": utc,
                     "RETURN_AS_TIMEZONE_AWARE": True,
                     "DATE_ORDER": "DMY",
                 },
             )
+            if not from_spreadsheet:
+                return parsed_date
+        if len(_parsed_dates) >= PARSED_DATES_CACHE_SIZE:
+            _parsed_dates.clear()
+        _parsed_dates[key] = parsed_date
+        return parsed_date
 
     def create_date_from_week_times(self, week_time_begin, week_time_end, date):
         if not week_time_begin or not week_time_end:
@@ -135,3 +149,35 @@ class Tournament(Table):
             "sunday",
         ]
         return days.index(day_name)
+
+
+def _parse_date_with_formats(date, date_formats, utc, relative_base):
+    """
+    Parses the date with the first matching format, like dateparser does before trying its own parsers. Returns None
+    when dateparser is needed: formats without a day, a month or a full year are completed from its settings.
+    """
+    for date_format in date_formats:
+        if "%d" not in date_format or not any(month in date_format for month in ("%m", "%b", "%B")):
+            return None
+        if "%y" in date_format and "%Y" not in date_format:
+            return None
+        try:
+            if "%Y" in date_format:
+                return datetime.datetime.strptime(date, date_format).replace(tzinfo=_get_timezone(utc))
+            # A leap year, so that February 29 is parsed like any other day
+            parsed_date = datetime.datetime.strptime(date + " 2000", date_format + " %Y")
+        except ValueError:
+            continue
+        try:
+            return parsed_date.replace(year=relative_base.year, tzinfo=_get_timezone(utc))
+        except ValueError:
+            return None
+    return None
+
+
+@functools.lru_cache()
+def _get_timezone(utc):
+    """Returns the tzinfo dateparser gives to the dates of the utc offset."""
+    return dateparser.parse(
+        "2000-01-01", date_formats=["%Y-%m-%d"], settings={"TIMEZONE": utc, "RETURN_AS_TIMEZONE_AWARE": True}
+    ).tzinfo
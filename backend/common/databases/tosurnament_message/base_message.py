@@ -2,7 +2,6 @@
 
 import functools
 from discord.ext import commands
-from common.api.spreadsheet import spreadsheet
 
 from encrypted_mysqldb.table import Table
 from encrypted_mysqldb.fields import HashField, BoolField, DatetimeField
@@ -91,7 +90,6 @@ def on_raw_reaction_with_context(reaction_type, valid_emojis=[]):
             ctx.command.cog_name = args[0].qualified_name
             ctx.command.name = func.__name__
             await func(args[0], ctx, payload.emoji)
-            spreadsheet.Spreadsheet.pickle_from_id.cache_clear()
 
         return commands.Cog.listener("on_raw_reaction_" + reaction_type)(wrapper)
 
@@ -0,0 +1,58 @@
+"""Groups bursts of calls into one"""
+
+import asyncio
+
+
+class DebouncedScheduler:
+    """
+    Calls the coroutine function flush(key) once per burst of schedule(key) calls: delay seconds after the last call
+    of the burst, but at most max_delay seconds after its first call. Calls made during a flush start a new burst.
+    """
+
+    def __init__(self, flush, delay, max_delay):
+        self.flush = flush
+        self.delay = delay
+        self.max_delay = max_delay
+        self._pending = {}
+        self._tasks = {}
+        self._wake_up = None
+
+    def __contains__(self, key):
+        return key in self._pending or key in self._tasks
+
+    def schedule(self, key):
+        now = asyncio.get_running_loop().time()
+        first_call, _ = self._pending.get(key, (now, now))
+        self._pending[key] = (first_call, now)
+        if not self._wake_up:
+            self._wake_up = asyncio.Event()
+        if key not in self._tasks:
+            self._tasks[key] = asyncio.ensure_future(self._run(key))
+
+    async def flush_all(self, timeout=None):
+        """Flushes every pending key without waiting for its delay. Flushes running after timeout are cancelled."""
+        if self._wake_up:
+            self._wake_up.set()
+        tasks = list(self._tasks.values())
+        if tasks:
+            _, not_done = await asyncio.wait(tasks, timeout=timeout)
+            for task in not_done:
+                task.cancel()
+        if self._wake_up:
+            self._wake_up.clear()
+
+    async def _run(self, key):
+        try:
+            while key in self._pending:
+                first_call, last_call = self._pending[key]
+                delay = min(last_call + self.delay, first_call + self.max_delay) - asyncio.get_running_loop().time()
+                if delay > 0 and not self._wake_up.is_set():
+                    try:
+                        await asyncio.wait_for(self._wake_up.wait(), delay)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                del self._pending[key]
+                await self.flush(key)
+        finally:
+            del self._tasks[key]
@@ -0,0 +1,33 @@
+"""Deduplicates concurrent calls of blocking functions"""
+
+import asyncio
+
+
+class SingleFlight:
+    """
+    Runs blocking functions in the default executor, or coroutine functions as tasks, making concurrent calls with the
+    same key share the same call and its result (or exception). Once the call is done, the next one with this key
+    starts a new call.
+    """
+
+    def __init__(self):
+        self._futures = {}
+
+    def __contains__(self, key):
+        return key in self._futures
+
+    async def run(self, key, func, *args):
+        future = self._futures.get(key)
+        if future is None:
+            if asyncio.iscoroutinefunction(func):
+                future = asyncio.ensure_future(func(*args))
+            else:
+                future = asyncio.get_running_loop().run_in_executor(None, func, *args)
+            self._futures[key] = future
+            future.add_done_callback(lambda _: self._forget(key, future))
+        # Shielded so that a cancelled caller does not cancel the call of the others
+        return await asyncio.shield(future)
+
+    def _forget(self, key, future):
+        if self._futures.get(key) is future:
+            del self._futures[key]
@@ -2,7 +2,15 @@
 All tests concerning the Tosurnament main module.
 """
 
+import asyncio
+import threading
+import pytest
+from unittest import mock
+
 from bot.modules.tosurnament import module as tosurnament
+from common.api import spreadsheet
+from common.api.spreadsheet.cache import SpreadsheetCache
+from common.utils.debounced_scheduler import DebouncedScheduler
 from common.databases.tosurnament.tournament import Tournament
 import test.resources.mock.tosurnament as tosurnament_mock
 
@@ -42,3 +50,62 @@ def test_is_staff():
     assert user_roles.referee
     assert user_roles.streamer
     assert user_roles.commentator
+
+
+@pytest.mark.asyncio
+async def test_update_spreadsheet_background_task_retries_on_any_error():
+    """Keeps retrying to send the journaled values of a spreadsheet when sending them fails, whatever the error."""
+    mock_bot = tosurnament_mock.BotMock()
+    cog = tosurnament.TosurnamentBaseModule(mock_bot)
+    update_from_journal = mock.Mock(
+        side_effect=[asyncio.TimeoutError(), OSError(), spreadsheet.HttpError(500, "", ""), True]
+    )
+    with mock.patch(MODULE_TO_TEST + ".module.Spreadsheet.update_from_journal", update_from_journal), mock.patch(
+        MODULE_TO_TEST + ".module.async_client.client", None
+    ), mock.patch(MODULE_TO_TEST + ".module.rate_limiter.get_backoff_delay", return_value=0):
+        await cog.update_spreadsheet_background_task("spreadsheet_id")
+    assert update_from_journal.call_count == 4
+    update_from_journal.assert_called_with("spreadsheet_id")
+
+
+@pytest.mark.asyncio
+async def test_add_update_spreadsheet_background_task_publishes_snapshot_once_per_update():
+    """Journals every write from the executor, and publishes one snapshot of the spreadsheet per update sent."""
+    mock_bot = tosurnament_mock.BotMock()
+    cog = tosurnament.TosurnamentBaseModule(mock_bot)
+    cog.spreadsheet_update_scheduler = DebouncedScheduler(cog.update_spreadsheet_background_task, 60, 60)
+    loop_thread = threading.get_ident()
+    journal_threads = []
+    published_snapshots = []
+
+    def journal_updates(self):
+        journal_threads.append(threading.get_ident())
+        for worksheet in self.worksheets:
+            worksheet.reset_updated_state()
+
+    def publish_snapshot(self):
+        published_snapshots.append((self.get_worksheet().get_cell(0, 0).get(), threading.get_ident()))
+
+    spreadsheet_cache = SpreadsheetCache(1024 * 1024, 600)
+    base_spreadsheet = spreadsheet.Spreadsheet("spreadsheet_id")
+    base_spreadsheet.worksheets.append(spreadsheet.Worksheet(0, "sheet1", [["value"]]))
+    with mock.patch.object(spreadsheet.Spreadsheet, "journal_updates", journal_updates), mock.patch.object(
+        spreadsheet.Spreadsheet, "publish_snapshot", publish_snapshot
+    ), mock.patch(MODULE_TO_TEST + ".module.Spreadsheet.update_from_journal", return_value=True), mock.patch(
+        MODULE_TO_TEST + ".module.async_client.client", None
+    ), mock.patch(
+        "common.api.spreadsheet.spreadsheet.spreadsheet_cache", spreadsheet_cache
+    ):
+        for value in ("value1", "value2"):
+            view = (spreadsheet_cache.get("spreadsheet_id") or base_spreadsheet).create_view()
+            view.get_worksheet().get_cell(0, 0).set(value)
+            await cog.add_update_spreadsheet_background_task(mock.Mock(spreadsheet=view))
+        assert not published_snapshots
+        assert spreadsheet_cache.get("spreadsheet_id").get_worksheet().get_cell(0, 0).get() == "value2"
+        await cog.flush_spreadsheet_updates()
+    assert len(journal_threads) == 2
+    assert loop_thread not in journal_threads
+    assert len(published_snapshots) == 1
+    assert published_snapshots[0][0] == "value2"
+    assert published_snapshots[0][1] != loop_thread
+    assert not cog.spreadsheets_to_publish
@@ -209,6 +209,63 @@ async def test_add_team_to_lobby(mocker):
     assert qualifiers_spreadsheet.spreadsheet.get_updated_values_with_ranges() == (["Tier 1!C2:C2"], [[["Team2"]]])
 
 
+def init_lobby_mocks():
+    cog = player_module.TosurnamentPlayerCog.__new__(player_module.TosurnamentPlayerCog)
+    qualifiers_spreadsheet = QualifiersSpreadsheetSingleMock()
+    spreadsheet = SpreadsheetMock.retrieve_spreadsheet(qualifiers_spreadsheet.spreadsheet_id)
+    qualifiers_spreadsheet._spreadsheet = spreadsheet.create_view()
+    return cog, qualifiers_spreadsheet
+
+
+def test_add_team_to_lobby_already_in_lobby_after_add():
+    """Adds the team to a lobby twice, through another view of the spreadsheet, and with another case."""
+    cog, qualifiers_spreadsheet = init_lobby_mocks()
+    assert cog.add_team_to_lobby(qualifiers_spreadsheet, "L1-1", "Team5")
+    qualifiers_spreadsheet._spreadsheet = qualifiers_spreadsheet.spreadsheet.create_view()
+    with pytest.raises(exceptions.AlreadyInLobby):
+        cog.add_team_to_lobby(qualifiers_spreadsheet, "l1-1", "TEAM5")
+    assert qualifiers_spreadsheet.spreadsheet.get_updated_values_with_ranges() == (["Tier 1!C2:C2"], [[["Team5"]]])
+
+
+def test_add_team_to_lobby_until_lobby_is_full():
+    """Adds teams to a lobby until it is full, each one in the first free slot."""
+    cog, qualifiers_spreadsheet = init_lobby_mocks()
+    lobby_table = qualifiers_spreadsheet.get_lobby_table()
+    for i in range(7):
+        assert lobby_table.get_n_free_slots(0) == 7 - i
+        assert cog.add_team_to_lobby(qualifiers_spreadsheet, "L1-1", "Team" + str(i + 5))
+        qualifiers_spreadsheet._spreadsheet = qualifiers_spreadsheet.spreadsheet.create_view()
+        lobby_table = qualifiers_spreadsheet.get_lobby_table()
+    assert lobby_table.get_n_free_slots(0) == 0
+    with pytest.raises(exceptions.LobbyIsFull):
+        cog.add_team_to_lobby(qualifiers_spreadsheet, "L1-1", "Team12")
+    assert qualifiers_spreadsheet.spreadsheet.get_worksheet().get_values()[1][:9] == [
+        "L1-1",
+        "Team1",
+        *("Team" + str(i + 5) for i in range(7)),
+    ]
+
+
+def test_add_team_to_lobby_then_clear_team_from_other_lobbies():
+    """Registers a team to lobbies one after the other, clearing it each time from the first other lobby it is in."""
+    cog, qualifiers_spreadsheet = init_lobby_mocks()
+    for lobby_id in ("L1-1", "L1-2"):
+        assert cog.add_team_to_lobby(qualifiers_spreadsheet, lobby_id, "Team2")
+        cog.clear_team_from_other_lobbies(qualifiers_spreadsheet, lobby_id, "team2")
+        qualifiers_spreadsheet._spreadsheet = qualifiers_spreadsheet.spreadsheet.create_view()
+    values = qualifiers_spreadsheet.spreadsheet.get_worksheet().get_values()
+    assert [row[:3] for row in values[1:6]] == [
+        ["L1-1", "Team1", ""],
+        ["L1-2", "Team1", "Team2"],
+        ["L1-3", "Team1", ""],
+        ["L1-4", "", ""],
+        ["L1-5", "Team2", ""],
+    ]
+    lobby_table = qualifiers_spreadsheet.get_lobby_table()
+    assert lobby_table.get_team_slots("Team2") == [(1, 1), (4, 0), (11, 1)]
+    assert [lobby_table.get_n_free_slots(i) for i in range(5)] == [7, 6, 7, 8, 7]
+
+
 @pytest.mark.asyncio
 async def test_register_to_lobby_lobby_not_found(mocker):
     """Registers to a lobby."""
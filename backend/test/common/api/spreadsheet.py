@@ -8,9 +8,16 @@ import hypothesis
 from hypothesis import strategies, given
 
 import httplib2
+import asyncio
+import json
 import socket
+import threading
+import tracemalloc
 import googleapiclient
+import aiohttp
+from aiohttp import test_utils, web
 from common.api import spreadsheet
+from common.api.spreadsheet import async_client, rate_limiter, response_parser, revision, snapshot_store
 
 MODULE_TO_TEST = "common.api.spreadsheet"
 
@@ -178,6 +185,36 @@ def test_spreadsheet_get_range(mock_spreadsheet_get):
     assert spreadsheet.worksheet._get_values_from_cells(range_cells) == [["data sheet3"]]
 
 
+def test_range_spec_compile():
+    """Compiles a range name once and reuses it."""
+    range_spec = spreadsheet.RangeSpec.compile("'sheet2'!B3:D,2,C2:4")
+    assert spreadsheet.RangeSpec.compile("'sheet2'!B3:D,2,C2:4") is range_spec
+    assert spreadsheet.RangeSpec.compile(range_spec) is range_spec
+    assert range_spec.worksheet_name == "'sheet2'"
+    assert str(range_spec) == "B3:D,2,C2:4"
+    assert range_spec.first_column == 1
+    assert range_spec.first_row == 2
+    assert len(range_spec.parts) == 3
+    assert not spreadsheet.RangeSpec.compile("")
+    assert spreadsheet.RangeSpec.compile("2:4").first_column == -1
+
+
+@mock.patch(MODULE_TO_TEST + ".spreadsheet._get_spreadsheet_with_values")
+def test_spreadsheet_get_range_with_range_spec(mock_spreadsheet_get):
+    """Gets the same cells from a RangeSpec as from the range name."""
+    mock_spreadsheet_get.return_value = [
+        {"name": "sheet1", "cells": values_to_cells([["A1", "B1", "C1"], ["A2", "B2", "C2"], ["A3", "B3", "C3"]])},
+        {"name": "sheet2", "cells": values_to_cells([["data sheet2"]])},
+    ]
+    sp = spreadsheet.Spreadsheet.retrieve_spreadsheet("spreadsheet_id")
+    for range_name in ["B2:C", "A1:A,C2:C", "2:3", "B1:3", "sheet2!A1"]:
+        range_spec = spreadsheet.RangeSpec.compile(range_name)
+        assert sp.get_range(range_spec) == sp.get_range(range_name)
+    worksheet, range_spec = sp.get_worksheet_and_range("sheet2!A1")
+    assert worksheet.name == "sheet2"
+    assert spreadsheet.worksheet._get_values_from_cells(worksheet.get_range(range_spec)) == [["data sheet2"]]
+
+
 @mock.patch(MODULE_TO_TEST + ".spreadsheet._get_spreadsheet_with_values")
 def test_spreadsheet_get_cells_with_value_in_range(mock_spreadsheet_get):
     """Gets a Spreadsheet from a spreadsheet id."""
@@ -233,6 +270,27 @@ def test_spreadsheet_find_cells(mock_spreadsheet_get):
     assert sp.find_cells(None, "D:E") == []
 
 
+@mock.patch(MODULE_TO_TEST + ".spreadsheet._get_spreadsheet_with_values")
+def test_spreadsheet_find_cells_after_set(mock_spreadsheet_get):
+    """Finds cells whose value changed after the range has been searched once."""
+    mock_spreadsheet_get.return_value = [
+        {"name": "sheet1", "cells": values_to_cells([["Match", "Team"], [1, "Team A"], [2, "TEAM B"], [3, "Team A"]])},
+    ]
+    sp = spreadsheet.Spreadsheet.retrieve_spreadsheet("spreadsheet_id")
+
+    assert [cell.y for cell in sp.find_cells("B2:B", "team a")] == [1, 3]
+    assert [cell.y for cell in sp.find_cells("A2:A", 2)] == [2]
+
+    sp.find_cells("B2:B", "team a")[0].set("Team C")
+    sp.get_worksheet().get_cell(1, 2).set("Team A")
+    assert [cell.y for cell in sp.find_cells("B2:B", "team a")] == [2, 3]
+    assert [cell.y for cell in sp.find_cells("B2:B", "Team C", True)] == [1]
+    assert sp.find_cells("B2:B", "team c", True) == []
+
+    sp.get_worksheet().get_cell(1, 4).set("Team A")
+    assert [cell.y for cell in sp.find_cells("B2:B", "Team A")] == [2, 3, 4]
+
+
 @mock.patch(MODULE_TO_TEST + ".spreadsheet._get_spreadsheet_with_values")
 def test_spreadsheet_change_value_in_range(mock_spreadsheet_get):
     """Gets a Spreadsheet from a spreadsheet id."""
@@ -278,6 +336,116 @@ def test_worksheet_get_cell(mock_spreadsheet_get):
     assert sp.get_worksheet(1).get_values() == [["A1"], ["", ""]]
 
 
+@mock.patch(MODULE_TO_TEST + ".spreadsheet._get_spreadsheet_with_values")
+def test_worksheet_get_cell_merge(mock_spreadsheet_get):
+    """Gets the merge containing a Cell, shared by all the cells of the merge."""
+    mock_spreadsheet_get.return_value = [
+        {
+            "name": "sheet1",
+            "cells": [["A1", "", "C1", ""], ["", "", "C2", "D2"], ["A3", "B3", "C3", "D3"]],
+            "merges": [(0, 2, 0, 2), (2, 4, 0, 1), (3, 4, 1, 3)],
+        },
+    ]
+    worksheet = spreadsheet.Spreadsheet.retrieve_spreadsheet("spreadsheet_id").get_worksheet()
+
+    top_left = worksheet.get_cell(0, 0)
+    assert top_left.x_merge_range == range(0, 2)
+    assert top_left.y_merge_range == range(0, 2)
+    assert worksheet.get_cell(1, 1).y_merge_range is top_left.y_merge_range
+    assert worksheet.get_cell(3, 0).x_merge_range == range(2, 4)
+    assert worksheet.get_cell(3, 2).y_merge_range == range(1, 3)
+    assert worksheet.get_cell(2, 1).x_merge_range == [2]
+    assert worksheet.get_cell(0, 2).y_merge_range == [2]
+
+
+def test_cell_value_type():
+    """Keeps the raw value and converts it through its string form when the value_type changes."""
+    cell = spreadsheet.Cell(0, 0, 12)
+    assert cell.get() == 12
+    assert cell.value == "12"
+    cell.value_type = str
+    assert cell.get() == "12"
+    cell.value_type = float
+    assert cell.get() == 12.0
+
+    cell = spreadsheet.Cell(0, 0, 1.5)
+    cell.value_type = int
+    assert cell.get() == "1.5"
+
+    cell = spreadsheet.Cell(0, 0, True)
+    assert cell.get() is True
+    assert cell == True  # noqa: E712
+    cell.set("Team/OTHER team")
+    assert cell._updated
+    assert cell.value_type == str
+    assert cell.has_value("other TEAM")
+    assert not cell.has_value("other TEAM", case_sensitive=True)
+
+
+def test_worksheet_typed_values():
+    """Keeps the type of every value stored in the grid, strings looking like numbers staying strings."""
+    values = [["text", 12, 1.5, True, False, 2**70, -(2**63), "12", "", "1.50", "True"]]
+    worksheet = spreadsheet.Worksheet(0, "sheet1", values)
+    assert worksheet.get_values() == values
+    assert [type(value) for value in worksheet.get_values()[0]] == [type(value) for value in values[0]]
+    cells = worksheet.get_range("A1:K1")[0]
+    assert [cell.get() for cell in cells] == values[0]
+    assert [type(cell.get()) for cell in cells] == [type(value) for value in values[0]]
+    assert [cell.value for cell in cells[:4]] == ["text", "12", "1.5", "True"]
+    assert worksheet.find_cells("A1:K1", 12)[0].x == 1
+    assert worksheet.find_cells("A1:K1", "1.50")[0].x == 9
+
+
+def test_worksheet_get_cell_out_of_range():
+    """Grows the grid with empty values when a cell out of the fetched values is accessed, without updating it."""
+    worksheet = spreadsheet.Worksheet(0, "sheet1", [["A1"], ["A2", "B2"]])
+    cell = worksheet.get_cell(3, 3)
+    assert cell.get() == ""
+    assert (cell.x, cell.y) == (3, 3)
+    assert worksheet.n_rows == 4
+    assert worksheet.get_values() == [["A1"], ["A2", "B2"], [], ["", "", "", ""]]
+    assert [[cell.get() for cell in row] for row in worksheet.get_range("A1:B2")] == [["A1", ""], ["A2", "B2"]]
+    assert worksheet.get_updated_values_with_ranges() == ([], [])
+
+
+def test_worksheet_merged_cells():
+    """Gives the merge ranges to every cell of a merge, only the top left cell having the value."""
+    worksheet = spreadsheet.Worksheet(0, "sheet1", [["A1", "", "C1"], ["", "", "C2"]], [(0, 2, 0, 2)])
+    cells = worksheet.get_range("A1:C2")
+    assert [[cell.get() for cell in row] for row in cells] == [["A1", "", "C1"], ["", "", "C2"]]
+    for cell in (cells[0][0], cells[0][1], cells[1][0], cells[1][1]):
+        assert list(cell.x_merge_range) == [0, 1]
+        assert list(cell.y_merge_range) == [0, 1]
+    assert list(cells[1][2].x_merge_range) == [2]
+    assert list(cells[1][2].y_merge_range) == [1]
+    cells[0][0].set("merged")
+    assert spreadsheet.Worksheet(0, "sheet1", worksheet.get_range("A1:C2")).get_cell(1, 1).x_merge_range == range(0, 2)
+
+
+def test_cell_set_writes_through_worksheet():
+    """Writes the values set on cells in the grid, and sends only the changed ones, as coalesced ranges."""
+    worksheet = spreadsheet.Worksheet(0, "sheet1", [["A1", 1], ["A2", "B2"]])
+    cell = worksheet.get_cell(0, 0)
+    assert worksheet.get_cell(0, 0) is cell
+    cell.set("new")
+    worksheet.get_cell(1, 0).set(True)
+    worksheet.get_cell(1, 1).set("B2")
+    worksheet.get_cell(3, 3).set(7)
+    assert cell.get() == "new"
+    assert worksheet.get_values() == [["new", True], ["A2", "B2"], [], ["", "", "", 7]]
+    del cell
+    assert worksheet.get_cell(0, 0).get() == "new"
+    assert worksheet.get_updated_values_with_ranges() == (
+        ["sheet1!A1:B1", "sheet1!D4:D4"],
+        [[["new", True]], [[7]]],
+    )
+    worksheet.get_cell(3, 3).set("")
+    assert worksheet.get_updated_values_with_ranges() == (["sheet1!A1:B1"], [[["new", True]]])
+    worksheet.reset_updated_state()
+    assert worksheet.get_updated_values_with_ranges() == ([], [])
+    assert worksheet.get_values()[0] == ["new", True]
+
+
 @mock.patch(MODULE_TO_TEST + ".spreadsheet._write_ranges")
 @mock.patch(MODULE_TO_TEST + ".spreadsheet._get_spreadsheet_with_values")
 def test_spreadsheet_update(mock_spreadsheet_get, mock_spreadsheet_write):
@@ -305,3 +473,681 @@ def test_spreadsheet_update(mock_spreadsheet_get, mock_spreadsheet_write):
     sp.get_worksheet("sheet2").get_range("A1")[0][0].set(new_cell_value)
     sp.update()
     mock_spreadsheet_write.assert_called_with("spreadsheet_id", ["sheet2!A1:A1"], [[[new_cell_value]]])
+
+
+@mock.patch(MODULE_TO_TEST + ".spreadsheet._get_spreadsheet_with_values")
+def test_find_corresponding_cells_best_effort_from_range(mock_spreadsheet_get):
+    """Finds the cells corresponding to a base cell by only looking at the rows of its merge."""
+    mock_spreadsheet_get.return_value = [
+        {
+            "name": "sheet1",
+            "cells": [
+                ["Match", "Team 1", "Team 2", "Referee"],
+                ["1", "A", "B", "Ref 1"],
+                ["", "", "", "Ref 2"],
+                ["2", "C", "", ""],
+            ],
+            "merges": [(0, 1, 1, 3), (1, 2, 1, 3), (2, 3, 1, 3)],
+        },
+    ]
+    sp = spreadsheet.Spreadsheet.retrieve_spreadsheet("spreadsheet_id")
+    first_match = sp.get_worksheet().get_cell(0, 1)
+    second_match = sp.get_worksheet().get_cell(0, 3)
+
+    assert spreadsheet.find_corresponding_cell_best_effort_from_range(sp, "B2:B", first_match) == "A"
+    assert spreadsheet.find_corresponding_cells_best_effort_from_range(sp, "D2:D", first_match) == ["Ref 1", "Ref 2"]
+    assert spreadsheet.find_corresponding_cell_best_effort(
+        sp.get_range_rows("B2:B", first_match.y_merge_range), first_match
+    ) == spreadsheet.find_corresponding_cell_best_effort(sp.get_range("B2:B"), first_match)
+
+    team2_cell = spreadsheet.find_corresponding_cell_best_effort_from_range(sp, "C2:C", second_match)
+    assert (team2_cell.x, team2_cell.y) == (2, 3)
+    referee_cells = spreadsheet.find_corresponding_cells_best_effort_from_range(sp, "D2:D", second_match)
+    assert [(cell.x, cell.y) for cell in referee_cells] == [(3, 3)]
+    assert sp.get_range_rows("E:E", [0]) == [[""]]
+    assert sp.get_range_rows("B2:C", [0, 1, 9]) == [["A", "B"]]
+
+
+def test_cell_column_from_range():
+    """Finds the cells corresponding to every base cell at once, as the lookups of each base cell would."""
+    sp = spreadsheet.Spreadsheet("spreadsheet_id")
+    sp.worksheets.append(
+        spreadsheet.Worksheet(
+            0,
+            "sheet1",
+            [["Match", "Team 1", "Referee"], ["1", "A", "Ref 1"], ["", "", "Ref 2"], ["2", "", ""]],
+            merges=[(0, 1, 1, 3), (1, 2, 1, 3)],
+        )
+    )
+    match_cells = sp.get_cells_with_value_in_range("A2:A")
+    teams = spreadsheet.CellColumn.from_range(sp, "B2:B", match_cells, False)
+    referees = spreadsheet.CellColumn.from_range(sp, "C2:C", match_cells, True)
+    view = sp.create_view()
+    for index, match_cell in enumerate(match_cells):
+        team_cell = spreadsheet.find_corresponding_cell_best_effort_from_range(sp, "B2:B", match_cell)
+        referee_cells = spreadsheet.find_corresponding_cells_best_effort_from_range(sp, "C2:C", match_cell)
+        assert [(cell.x, cell.y) for cell in teams.get_cells(view, index)] == [(team_cell.x, team_cell.y)]
+        assert referees.get_cells(view, index) == referee_cells
+    assert referees.get_cells(view, 0)[0].get() == "Ref 1"
+
+
+@mock.patch(MODULE_TO_TEST + ".spreadsheet._write_ranges")
+@mock.patch(MODULE_TO_TEST + ".spreadsheet._get_spreadsheet_with_values")
+def test_spreadsheet_update_coalesces_ranges(mock_spreadsheet_get, mock_spreadsheet_write):
+    """Sends updated cells as rectangles, filling small gaps with unchanged values."""
+    TEST_VALUES = [
+        ["A1", "B1", "C1", "D1", "E1" * 50, "F1"],
+        ["A2", "B2", "C2", "D2", "E2", "F2"],
+        ["A3", "B3", "C3", "D3", "E3", "F3"],
+    ]
+    mock_spreadsheet_get.return_value = [{"name": "sheet1", "cells": values_to_cells(TEST_VALUES)}]
+    sp = spreadsheet.Spreadsheet.retrieve_spreadsheet("spreadsheet_id")
+    worksheet = sp.get_worksheet()
+    for x, y in [(0, 0), (1, 0), (0, 1), (1, 1), (5, 0), (3, 2), (5, 2)]:
+        worksheet.get_cell(x, y).set("new")
+    sp.update()
+    mock_spreadsheet_write.assert_called_once_with(
+        "spreadsheet_id",
+        ["sheet1!A1:B2", "sheet1!F1:F1", "sheet1!D3:F3"],
+        [[["new", "new"], ["new", "new"]], [["new"]], [["new", "E3", "new"]]],
+    )
+    assert worksheet.get_updated_values_with_ranges() == ([], [])
+
+
+@mock.patch(MODULE_TO_TEST + ".spreadsheet._write_ranges")
+@mock.patch(MODULE_TO_TEST + ".spreadsheet._get_spreadsheet_with_values")
+def test_spreadsheet_update_skips_unchanged_values(mock_spreadsheet_get, mock_spreadsheet_write):
+    """Does not send cells set to the value they already had."""
+    mock_spreadsheet_get.return_value = [{"name": "sheet1", "cells": values_to_cells([["A1", 1, True, "B"]])}]
+    sp = spreadsheet.Spreadsheet.retrieve_spreadsheet("spreadsheet_id")
+    worksheet = sp.get_worksheet()
+    worksheet.get_cell(0, 0).set("A1")
+    worksheet.get_cell(1, 0).set(1.0)
+    worksheet.get_cell(2, 0).set(True)
+    worksheet.get_cell(3, 0).set("C")
+    worksheet.get_cell(3, 0).set("B")
+    assert sp.change_value_in_range("A1:A1", "A1", "A1")
+    sp.update()
+    mock_spreadsheet_write.assert_not_called()
+
+    worksheet.get_cell(1, 0).set("1")
+    worksheet.get_cell(2, 0).set(1)
+    sp.update()
+    mock_spreadsheet_write.assert_called_once_with("spreadsheet_id", ["sheet1!B1:C1"], [[["1", 1]]])
+
+
+def test_spreadsheet_retrieve_spreadsheet_with_ranges():
+    """Gets only the given ranges of a Spreadsheet, with the merges of its sheets."""
+    service = mock.Mock()
+    service.spreadsheets().get().execute.return_value = {
+        "sheets": [
+            {"properties": {"title": "Main"}},
+            {"properties": {"title": "Team's sheet"}, "merges": [_merge(0, 1, 1, 3)]},
+        ]
+    }
+    service.spreadsheets().values().batchGet().execute.return_value = {
+        "valueRanges": [
+            {"range": "'Team''s sheet'!B2:C1000", "values": [[" Team A ", 10], [], ["=B2", True]]},
+            {"range": "Main!A1:A5", "values": [["Match"], [1]]},
+        ]
+    }
+    with mock.patch(MODULE_TO_TEST + ".spreadsheet.service", service):
+        sp = spreadsheet.Spreadsheet.retrieve_spreadsheet("spreadsheet_id", ["'Team''s sheet'!B2:C", "A1:A5"])
+    assert service.spreadsheets().values().batchGet.call_args.kwargs["ranges"] == [
+        "'Team''s sheet'!B2:C",
+        "'Main'!A1:A5",
+    ]
+    assert sp.ranges == ("'Team''s sheet'!B2:C", "A1:A5")
+    assert sp.get_worksheet("Main").get_values() == [["Match"], [1]]
+    worksheet = sp.get_worksheet("Team's sheet")
+    assert worksheet.get_values() == [[], ["", "Team A", 10], [], ["", "=B2", True]]
+    assert worksheet.get_cell(0, 2).y_merge_range == range(1, 3)
+    assert worksheet.is_partial and worksheet._is_loaded(2, 999) and not worksheet._is_loaded(0, 1)
+
+    with mock.patch("builtins.open") as mock_open:
+        sp.update_snapshot()
+    mock_open.assert_not_called()
+
+
+def _merge(start_column, end_column, start_row, end_row):
+    return {
+        "startColumnIndex": start_column,
+        "endColumnIndex": end_column,
+        "startRowIndex": start_row,
+        "endRowIndex": end_row,
+    }
+
+
+def test_get_spreadsheet_with_values_parses_response_incrementally():
+    """Parses the raw response of spreadsheets().get into sheets of values."""
+    response = {
+        "sheets": [
+            {
+                "properties": {"title": "sheet1", "gridProperties": {"rowCount": 1000}},
+                "data": [
+                    {
+                        "rowData": [
+                            {
+                                "values": [
+                                    {"userEnteredValue": {"stringValue": " A1 "}},
+                                    {},
+                                    {"userEnteredValue": {"numberValue": 1.5}, "effectiveValue": {"numberValue": 1.5}},
+                                ]
+                            },
+                            {},
+                            {"values": [{"userEnteredValue": {"formulaValue": "=A1"}}]},
+                        ]
+                    }
+                ],
+                "merges": [_merge(0, 2, 0, 1)],
+            },
+            {"properties": {"title": "empty sheet"}, "data": [{}]},
+        ]
+    }
+    service = mock.Mock()
+    service.spreadsheets().get().execute.return_value = json.dumps(response, indent=2).encode("utf-8")
+    with mock.patch(MODULE_TO_TEST + ".spreadsheet.service", service):
+        sheets = spreadsheet.spreadsheet._get_spreadsheet_with_values("spreadsheet_id")
+    assert sheets == [
+        {"name": "sheet1", "cells": [["A1", "", 1.5], [], ["=A1"]], "merges": [(0, 2, 0, 1)]},
+        {"name": "empty sheet", "cells": [], "merges": []},
+    ]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 7, 4096])
+def test_parse_spreadsheet_response_by_chunks(chunk_size):
+    """Parses the response the same whatever the chunks, with values and characters cut between two chunks."""
+    response = {
+        "sheets": [
+            {
+                "properties": {"title": "feuille été 日本"},
+                "data": [
+                    {
+                        "rowData": [
+                            {
+                                "values": [
+                                    {"userEnteredValue": {"stringValue": "équipe 日本 %i" % i}} for i in range(20)
+                                ]
+                            },
+                            {"values": [{"userEnteredValue": {"numberValue": 123456789 + i}} for i in range(20)]},
+                            {"values": [{"userEnteredValue": {"boolValue": True}}, {}, {"userEnteredValue": {}}]},
+                        ]
+                    },
+                    {"rowData": [{"values": [{"userEnteredValue": {"stringValue": "skipped"}}]}]},
+                ],
+                "merges": [_merge(0, 2, 0, 1)],
+            },
+        ]
+    }
+    content = json.dumps(response, ensure_ascii=False).encode("utf-8")
+    with mock.patch.object(response_parser, "JSON_CHUNK_SIZE", chunk_size):
+        sheets = response_parser.parse_spreadsheet_response(content, response_parser.get_cell_value)
+    assert sheets == [
+        {
+            "name": "feuille été 日本",
+            "cells": [
+                ["équipe 日本 %i" % i for i in range(20)],
+                [123456789 + i for i in range(20)],
+                [True, "", ""],
+            ],
+            "merges": [(0, 2, 0, 1)],
+        }
+    ]
+    with pytest.raises(ValueError):
+        with mock.patch.object(response_parser, "JSON_CHUNK_SIZE", chunk_size):
+            response_parser.parse_spreadsheet_response(content[:-3], response_parser.get_cell_value)
+
+
+def test_parse_spreadsheet_response_peak_memory():
+    """Parses a large response with a fraction of the memory used to decode it with json.loads."""
+    rows = [
+        {
+            "values": [{"userEnteredValue": {"stringValue": "Team %i-%i" % (y, x)}} for x in range(8)]
+            + [{"userEnteredValue": {"numberValue": y}}, {}]
+        }
+        for y in range(5000)
+    ]
+    content = json.dumps({"sheets": [{"properties": {"title": "sheet1"}, "data": [{"rowData": rows}]}]}).encode()
+    del rows
+
+    def get_peak_memory(function):
+        tracemalloc.start()
+        try:
+            function()
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    parser_peak_memory = get_peak_memory(
+        lambda: response_parser.parse_spreadsheet_response(content, response_parser.get_cell_value)
+    )
+    json_peak_memory = get_peak_memory(lambda: json.loads(content))
+    assert parser_peak_memory * 4 < json_peak_memory
+    # The values parsed, but not a decoded copy of the response on top of them
+    assert parser_peak_memory < 2 * len(content)
+
+
+def test_spreadsheet_snapshot_round_trip(tmp_path, monkeypatch):
+    """Writes a Spreadsheet in a snapshot and reads it back, ignoring snapshots of another format version."""
+    monkeypatch.chdir(tmp_path)
+    cells = values_to_cells([["Team", "Score", ""], ["été", 2**70, 1.5], ["", True, -3]])
+    cells[1][0].set_merge_range(range(0, 2), range(1, 2))
+    sp = spreadsheet.Spreadsheet("spreadsheet_id")
+    sp.worksheets.append(spreadsheet.Worksheet(0, "sheet1", cells))
+    sp.worksheets.append(spreadsheet.Worksheet(1, "sheet2", [], loaded_ranges=[(0, 2, 0, 10)]))
+    sp.worksheets[0].get_cell(1, 0).set("Points")
+    sp.update_snapshot()
+
+    spreadsheet.spreadsheet.spreadsheet_cache.clear()
+    loaded_sp = spreadsheet.Spreadsheet.snapshot_from_id("spreadsheet_id")
+    worksheet = loaded_sp.get_worksheet("sheet1")
+    assert worksheet.get_values() == [["Team", "Points", ""], ["été", 2**70, 1.5], ["", True, -3]]
+    assert worksheet.get_cell(1, 1).x_merge_range == range(0, 2)
+    assert worksheet.get_updated_values_with_ranges() == (["sheet1!B1:B1"], [[["Points"]]])
+    assert worksheet.find_cells("A:A", "ÉTÉ")[0].y == 1
+    assert loaded_sp.get_worksheet("sheet2").is_partial
+
+    with open(spreadsheet.spreadsheet.snapshot_store._get_path("spreadsheet_id"), "r+b") as snapshot_file:
+        snapshot_file.seek(4)
+        snapshot_file.write(b"\xff\xff")
+    spreadsheet.spreadsheet.spreadsheet_cache.clear()
+    assert spreadsheet.Spreadsheet.snapshot_from_id("spreadsheet_id") is None
+
+
+class FakeRevisionChecker(revision.RevisionChecker):
+    """Revision checker returning the revisions set in a dict instead of asking Google."""
+
+    def __init__(self):
+        self.revisions = {}
+        self.n_requests = 0
+
+    def get_revision(self, spreadsheet_id):
+        self.n_requests += 1
+        return self.revisions.get(spreadsheet_id)
+
+
+@mock.patch(MODULE_TO_TEST + ".spreadsheet._get_spreadsheet_with_values")
+def test_spreadsheet_revision(mock_spreadsheet_get, tmp_path, monkeypatch):
+    """Stores the revision of a spreadsheet with its snapshot, to know if it has been modified without retrieving it."""
+    monkeypatch.chdir(tmp_path)
+    checker = FakeRevisionChecker()
+    monkeypatch.setattr(spreadsheet.spreadsheet, "revision_checker", checker)
+    mock_spreadsheet_get.return_value = [{"name": "sheet1", "cells": [["A1"]]}]
+    checker.revisions["spreadsheet_id"] = "1"
+    spreadsheet.Spreadsheet.retrieve_spreadsheet_and_update_snapshot("spreadsheet_id")
+
+    spreadsheet.spreadsheet.spreadsheet_cache.clear()
+    sp = spreadsheet.Spreadsheet.snapshot_from_id("spreadsheet_id")
+    assert sp.revision == "1"
+    assert sp.create_view().revision == "1"
+    assert spreadsheet.Spreadsheet.snapshot_from_id("spreadsheet_id", "1") is sp
+    assert spreadsheet.Spreadsheet.snapshot_from_id("spreadsheet_id", "2") is None
+    assert checker.n_requests == 1
+    assert mock_spreadsheet_get.call_count == 1
+
+
+def test_drive_revision_checker():
+    """Gets the version of the spreadsheet file, or None if it cannot be got, whatever the error."""
+    checker = revision.DriveRevisionChecker.__new__(revision.DriveRevisionChecker)
+    checker.service = mock.Mock()
+    checker.service.files().get().execute.return_value = {"version": "12", "modifiedTime": "2020-01-01T00:00:00Z"}
+    assert checker.get_revision("spreadsheet_id") == "12"
+    for error in (httplib2.ServerNotFoundError(), OSError(), socket.timeout()):
+        checker.service.files().get().execute.side_effect = error
+        assert checker.get_revision("spreadsheet_id") is None
+
+
+class FakeKeyValueService:
+    """Stand-in for a key-value service like Redis."""
+
+    def __init__(self):
+        self.values = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def set(self, key, value):
+        self.values[key] = value
+
+
+def test_spreadsheet_shared_snapshot_store(monkeypatch):
+    """Reuses the snapshot published by another process in a shared store, only if it is of the expected revision."""
+    store = snapshot_store.KeyValueSnapshotStore(FakeKeyValueService())
+    monkeypatch.setattr(spreadsheet.spreadsheet, "snapshot_store", store)
+    sp = spreadsheet.Spreadsheet("spreadsheet_id")
+    sp.worksheets.append(spreadsheet.Worksheet(0, "sheet1", [["Team", "Score"], ["A", 1]]))
+    sp.revision = "1"
+    sp.update_snapshot()
+
+    spreadsheet.spreadsheet.spreadsheet_cache.clear()
+    assert spreadsheet.Spreadsheet.snapshot_from_id("spreadsheet_id", "2") is None
+    loaded_sp = spreadsheet.Spreadsheet.snapshot_from_id("spreadsheet_id", "1")
+    assert loaded_sp.get_worksheet().get_values() == [["Team", "Score"], ["A", 1]]
+    assert spreadsheet.Spreadsheet.snapshot_from_id("other_id") is None
+
+
+class FailingKeyValueService:
+    """Stand-in for a key-value service that is down."""
+
+    def get(self, key):
+        raise ConnectionError("Connection refused")
+
+    def set(self, key, value):
+        raise ConnectionError("Connection refused")
+
+
+@mock.patch(MODULE_TO_TEST + ".spreadsheet._get_spreadsheet_with_values")
+def test_spreadsheet_shared_snapshot_store_unavailable(mock_spreadsheet_get, monkeypatch):
+    """Retrieves the spreadsheets as if there were no snapshot while the shared store is unavailable."""
+    monkeypatch.setattr(
+        spreadsheet.spreadsheet, "snapshot_store", snapshot_store.KeyValueSnapshotStore(FailingKeyValueService())
+    )
+    spreadsheet.spreadsheet.spreadsheet_cache.clear()
+    assert spreadsheet.Spreadsheet.snapshot_from_id("spreadsheet_id") is None
+    mock_spreadsheet_get.return_value = [{"name": "sheet1", "cells": [["A1"]]}]
+    sp = spreadsheet.Spreadsheet.retrieve_spreadsheet_and_update_snapshot("spreadsheet_id")
+    assert sp.get_worksheet().get_values() == [["A1"]]
+
+
+def test_spreadsheet_cache():
+    """Caches spreadsheets within a size budget, until they expire or are written."""
+    sp1, sp2 = spreadsheet.Spreadsheet("id1"), spreadsheet.Spreadsheet("id2")
+    sp1.worksheets.append(spreadsheet.Worksheet(0, "sheet1", [["a"] * 10] * 10))
+    sp2.worksheets.append(spreadsheet.Worksheet(0, "sheet1", [["b"] * 10] * 10))
+    now = [0]
+    cache = spreadsheet.spreadsheet.SpreadsheetCache(sp1.get_size() + 1, 60, clock=lambda: now[0])
+    cache.put("id1", sp1)
+    assert cache.get("id1") is sp1
+    cache.put("id2", sp2)
+    assert cache.get("id1") is None
+    assert cache.get("id2") is sp2
+    sp2.worksheets[0].get_cell(0, 0).set("")
+    assert cache.get("id2") is None
+    cache.put("id2", sp2)
+    now[0] = 30
+    assert cache.get_age("id2") == 30
+    now[0] = 60
+    assert cache.get("id2") is None
+    assert cache.get_stats()["hits"] == 2
+    assert cache.get_stats()["misses"] == 3
+    assert cache.get_stats()["evictions"] == 1
+    assert len(cache) == 0 and cache.size == 0
+
+
+def test_spreadsheet_create_view():
+    """Modifies views of a Spreadsheet without affecting the spreadsheet or the other views."""
+    sp = spreadsheet.Spreadsheet("spreadsheet_id")
+    sp.worksheets.append(spreadsheet.Worksheet(0, "sheet1", [["Team", "Score"], ["A", 1]]))
+    view1, view2 = sp.create_view(), sp.create_view()
+    view1.worksheets[0].get_cell(1, 1).set("2")
+    view1.worksheets[0].get_cell(3, 2).set("new")
+    view2.worksheets[0].get_cell(0, 1).set("B")
+    sp.worksheets[0].get_cell(0, 0).set("Player")
+    assert view1.worksheets[0].get_values() == [["Team", "Score"], ["A", "2"], ["", "", "", "new"]]
+    assert view2.worksheets[0].get_values() == [["Team", "Score"], ["B", 1]]
+    assert sp.worksheets[0].get_values() == [["Player", "Score"], ["A", 1]]
+    assert view2.worksheets[0]._tags[1] is sp.worksheets[0]._tags[1]
+    assert view1.worksheets[0].find_cells("A:A", "a")[0].y == 1
+    assert view2.worksheets[0].find_cells("A:A", "a") == []
+    assert view2.worksheets[0].get_updated_values_with_ranges() == (["sheet1!A2:A2"], [[["B"]]])
+
+
+def test_spreadsheet_create_view_shares_value_indexes():
+    """Reuses the value indexes of a worksheet in its views, until a view writes in the range of one of them."""
+    sp = spreadsheet.Spreadsheet("spreadsheet_id")
+    sp.worksheets.append(spreadsheet.Worksheet(0, "sheet1", [["Team", "Score"], ["A", 1], ["B", 2], ["a", 3]]))
+    assert [cell.y for cell in sp.find_cells("A2:A", "a")] == [1, 3]
+    view1, view2 = sp.create_view(), sp.create_view()
+    with mock.patch(MODULE_TO_TEST + ".worksheet.ValueIndex", side_effect=AssertionError("index built again")):
+        assert [cell.y for cell in view1.find_cells("A2:A", "a")] == [1, 3]
+        assert [cell.y for cell in view2.find_cells("A2:A", "a")] == [1, 3]
+        view2.get_worksheet().get_cell(1, 1).set(4)
+        assert [cell.y for cell in view2.find_cells("A2:A", "a")] == [1, 3]
+    view1.get_worksheet().get_cell(0, 1).set("B")
+    assert [cell.y for cell in view1.find_cells("A2:A", "a")] == [3]
+    assert [cell.y for cell in view1.find_cells("A2:A", "b")] == [1, 2]
+    view3 = sp.create_view()
+    assert [cell.y for cell in view3.find_cells("B2:B", 2)] == [2]
+    with mock.patch(MODULE_TO_TEST + ".worksheet.ValueIndex", side_effect=AssertionError("index built again")):
+        assert [cell.y for cell in view2.find_cells("A2:A", "a")] == [1, 3]
+        assert [cell.y for cell in sp.find_cells("A2:A", "a")] == [1, 3]
+        assert [cell.y for cell in sp.create_view().find_cells("B2:B", 2)] == [2]
+    assert [cell.y for cell in view2.find_cells("B2:B", 1)] == []
+    assert [cell.y for cell in view2.find_cells("B2:B", 4)] == [1]
+    sp.get_worksheet().get_cell(0, 3).set("C")
+    assert [cell.y for cell in sp.find_cells("A2:A", "a")] == [1]
+    assert [cell.y for cell in view2.find_cells("A2:A", "a")] == [1, 3]
+    assert [cell.y for cell in view3.find_cells("A2:A", "a")] == [1, 3]
+
+
+def test_spreadsheet_get_derived():
+    """Shares derived values between the views of a spreadsheet with the same values, until they are written."""
+    sp = spreadsheet.Spreadsheet("spreadsheet_id")
+    sp.worksheets.append(spreadsheet.Worksheet(0, "sheet1", [["Team"], ["A"]]))
+    build = mock.Mock(side_effect=lambda sp: sp.get_worksheet().get_values())
+    view1, view2 = sp.create_view(), sp.create_view()
+    assert view1.get_derived("values", build) is view2.get_derived("values", build)
+    assert build.call_count == 1
+    view1.worksheets[0].get_cell(0, 1).set("B")
+    assert view1.get_derived("values", build) == [["Team"], ["B"]]
+    assert view1.create_view().get_derived("values", build) == [["Team"], ["B"]]
+    assert view2.get_derived("values", build) == [["Team"], ["A"]]
+    assert build.call_count == 2
+    view1.worksheets[0].get_cell(0, 1).set("C")
+    view1.set_derived("values", [["Team"], ["C"]])
+    assert view1.create_view().get_derived("values", build) == [["Team"], ["C"]]
+    assert sp.get_derived("values", build) == [["Team"], ["A"]]
+    assert build.call_count == 2
+
+
+@mock.patch(MODULE_TO_TEST + ".spreadsheet._write_ranges")
+def test_spreadsheet_update_from_journal(mock_spreadsheet_write, tmp_path):
+    """Journals the updated values of a Spreadsheet and sends only them, until they have been sent successfully."""
+    journal = spreadsheet.spreadsheet.UpdateJournal(str(tmp_path / "journals"))
+    sp = spreadsheet.Spreadsheet("spreadsheet_id")
+    sp.worksheets.append(
+        spreadsheet.Worksheet(0, "sheet1", values_to_cells([["a", "b", "c", "d"], ["e", "f", "", "h"]]))
+    )
+    sp.worksheets[0].get_cell(0, 0).set("A")
+    sp.worksheets[0].get_cell(3, 0).set("D")
+    sp.worksheets[0].get_cell(3, 1).set("")
+    with mock.patch(MODULE_TO_TEST + ".spreadsheet.update_journal", journal):
+        sp.journal_updates()
+        assert not sp.worksheets[0].get_updates()
+        assert journal.get_spreadsheet_ids() == {"spreadsheet_id"}
+
+        mock_spreadsheet_write.side_effect = socket.timeout()
+        with pytest.raises(spreadsheet.HttpError):
+            spreadsheet.Spreadsheet.update_from_journal("spreadsheet_id")
+        with open(journal._get_path("spreadsheet_id"), "a") as journal_file:
+            journal_file.write('["sheet1", 0, 0, "A2"]\n["sheet1", 1, 1')
+
+        mock_spreadsheet_write.side_effect = None
+        mock_spreadsheet_write.reset_mock()
+        assert spreadsheet.Spreadsheet.update_from_journal("spreadsheet_id")
+        mock_spreadsheet_write.assert_called_once_with(
+            "spreadsheet_id", ["sheet1!A1:A1", "sheet1!D1:D2"], [[["A2"]], [["D"], [""]]]
+        )
+        assert journal.get_spreadsheet_ids() == set()
+        assert not spreadsheet.Spreadsheet.update_from_journal("spreadsheet_id")
+
+
+@mock.patch(MODULE_TO_TEST + ".spreadsheet._write_ranges")
+def test_spreadsheet_update_from_journal_after_partial_line(mock_spreadsheet_write, tmp_path):
+    """Does not lose the values journaled after a line partially written during a crash."""
+    journal = spreadsheet.spreadsheet.UpdateJournal(str(tmp_path / "journals"))
+    journal.append("spreadsheet_id", [("sheet1", 0, 0, "A")])
+    with open(journal._get_path("spreadsheet_id"), "a") as journal_file:
+        journal_file.write('["sheet1", 1, 0, "B')
+    journal.append("spreadsheet_id", [("sheet1", 2, 0, "ACKED")])
+    assert journal.read("spreadsheet_id")[0] == {("sheet1", 0, 0): "A", ("sheet1", 2, 0): "ACKED"}
+    with mock.patch(MODULE_TO_TEST + ".spreadsheet.update_journal", journal):
+        assert spreadsheet.Spreadsheet.update_from_journal("spreadsheet_id")
+    mock_spreadsheet_write.assert_called_once_with(
+        "spreadsheet_id", ["sheet1!A1:A1", "sheet1!C1:C1"], [[["A"]], [["ACKED"]]]
+    )
+    assert journal.get_spreadsheet_ids() == set()
+
+    with open(journal._get_path("spreadsheet_id"), "w") as journal_file:
+        journal_file.write('{"spreadsheet_id": "spread')
+    journal.append("spreadsheet_id", [("sheet1", 0, 0, "A")])
+    assert journal.get_spreadsheet_ids() == {"spreadsheet_id"}
+    assert journal.read("spreadsheet_id")[0] == {("sheet1", 0, 0): "A"}
+
+
+class FakeSheetsServer:
+    """Local server answering like the Google Sheets API, for the async client."""
+
+    def __init__(self, spreadsheet_response, value_ranges):
+        self.spreadsheet_response = spreadsheet_response
+        self.value_ranges = value_ranges
+        self.requests = []
+        self.written_data = []
+        app = web.Application()
+        app.router.add_get("/{spreadsheet_id}", self.get_spreadsheet)
+        app.router.add_get("/{spreadsheet_id}/values:batchGet", self.batch_get)
+        app.router.add_post("/{spreadsheet_id}/values:batchUpdate", self.batch_update)
+        self.server = test_utils.TestServer(app)
+
+    def _check_request(self, request):
+        self.requests.append(request)
+        if request.match_info["spreadsheet_id"] != "spreadsheet_id":
+            raise web.HTTPNotFound()
+        if request.headers.get("Authorization") != "Bearer token1":
+            raise web.HTTPForbidden()
+
+    async def get_spreadsheet(self, request):
+        self._check_request(request)
+        response = self.spreadsheet_response
+        if request.query["fields"] == spreadsheet.spreadsheet.METADATA_FIELDS:
+            response = {"sheets": [{"properties": sheet["properties"]} for sheet in response["sheets"]]}
+        return web.json_response(response)
+
+    async def batch_get(self, request):
+        self._check_request(request)
+        value_ranges = [self.value_ranges[range_name] for range_name in request.query.getall("ranges")]
+        return web.json_response({"valueRanges": value_ranges})
+
+    async def batch_update(self, request):
+        self._check_request(request)
+        self.written_data.append(await request.json())
+        return web.json_response({})
+
+
+class FakeCredentials:
+    def __init__(self):
+        self.token = None
+        self.valid = False
+
+    def refresh(self, request):
+        self.token = "token1" if self.token is None else "token2"
+        self.valid = True
+
+
+@pytest.mark.asyncio
+async def test_async_sheets_client(tmp_path):
+    """Retrieves and updates a Spreadsheet through the async client, against a local fake server."""
+    sheets_response = {
+        "sheets": [
+            {
+                "properties": {"title": "sheet1"},
+                "data": [{"rowData": [{"values": [{"userEnteredValue": {"stringValue": "A1"}}, {}]}]}],
+                "merges": [_merge(0, 2, 0, 1)],
+            }
+        ]
+    }
+    value_ranges = {"'sheet1'!B1:B2": {"range": "sheet1!B1:B2", "values": [["B1"], [2]]}}
+    fake_server = FakeSheetsServer(sheets_response, value_ranges)
+    await fake_server.server.start_server()
+    client = async_client.AsyncSheetsClient(FakeCredentials(), str(fake_server.server.make_url("/")))
+    threads = []
+    parse_spreadsheet_response = async_client.parse_spreadsheet_response
+
+    def parse_spreadsheet_response_in_thread(*args):
+        threads.append(threading.current_thread())
+        return parse_spreadsheet_response(*args)
+
+    try:
+        with mock.patch.object(async_client, "parse_spreadsheet_response", parse_spreadsheet_response_in_thread):
+            sp = await spreadsheet.Spreadsheet.retrieve_spreadsheet_async("spreadsheet_id", client)
+        assert threads and threading.current_thread() not in threads
+        assert sp.get_worksheet().get_values() == [["A1", ""]]
+        assert sp.get_worksheet().get_cell(1, 0).x_merge_range == range(0, 2)
+
+        sp = await spreadsheet.Spreadsheet.retrieve_spreadsheet_async("spreadsheet_id", client, ["B1:B2"])
+        assert sp.get_worksheet().get_values() == [["", "B1"], ["", 2]]
+        sp.get_worksheet().get_cell(1, 1).set(3)
+        await sp.update_async(client)
+        assert fake_server.written_data == [
+            {"valueInputOption": "USER_ENTERED", "data": [{"range": "sheet1!B2:B2", "values": [[3]]}]}
+        ]
+        assert not sp.get_worksheet().get_updates()
+
+        journal = spreadsheet.spreadsheet.UpdateJournal(str(tmp_path / "journals"))
+        journal.append("spreadsheet_id", [("sheet1", 1, 0, "C")])
+        with mock.patch(MODULE_TO_TEST + ".spreadsheet.update_journal", journal):
+            assert await spreadsheet.Spreadsheet.update_from_journal_async("spreadsheet_id", client)
+        assert fake_server.written_data[-1]["data"] == [{"range": "sheet1!B1:B1", "values": [["C"]]}]
+        assert journal.get_spreadsheet_ids() == set()
+
+        with pytest.raises(spreadsheet.HttpError) as exc_info:
+            await spreadsheet.Spreadsheet.retrieve_spreadsheet_async("unknown_id", client)
+        assert exc_info.value.code == 404
+        assert len({request.transport for request in fake_server.requests}) == 1
+        assert client.credentials.token == "token1"
+    finally:
+        await client.close()
+        await fake_server.server.close()
+
+
+@pytest.mark.asyncio
+async def test_async_sheets_client_truncated_response():
+    """Raises an HttpError 499 when the response is cut, like when the connection fails."""
+
+    async def get_truncated_spreadsheet(request):
+        response = web.StreamResponse(headers={"Content-Length": "1000"})
+        await response.prepare(request)
+        await response.write(b'{"sheets": [')
+        request.transport.close()
+        return response
+
+    app = web.Application()
+    app.router.add_get("/{spreadsheet_id}", get_truncated_spreadsheet)
+    server = test_utils.TestServer(app)
+    await server.start_server()
+    client = async_client.AsyncSheetsClient(FakeCredentials(), str(server.make_url("/")))
+    try:
+        with pytest.raises(spreadsheet.HttpError) as exc_info:
+            await client.get_spreadsheet_with_values("spreadsheet_id")
+        assert exc_info.value.code == 499
+        assert isinstance(exc_info.value.error, aiohttp.ClientPayloadError)
+    finally:
+        await client.close()
+        await server.close()
+
+
+@pytest.mark.asyncio
+async def test_sheets_request_scheduler():
+    """Lets requests go within the quota, interactive ones first, and measures their waits."""
+    scheduler = rate_limiter.SheetsRequestScheduler(read_rate=1200, write_rate=60)
+    for _ in range(300):
+        await scheduler.acquire(rate_limiter.READ)
+    assert scheduler.get_metrics()["read"]["max_wait_time"] < 0.05
+
+    order = []
+
+    async def acquire(name, priority):
+        await scheduler.acquire(rate_limiter.READ, priority)
+        order.append(name)
+
+    tasks = [asyncio.ensure_future(acquire("background", rate_limiter.BACKGROUND))]
+    tasks.append(asyncio.ensure_future(acquire("interactive", rate_limiter.INTERACTIVE)))
+    await asyncio.sleep(0)
+    assert scheduler.get_metrics()["read"]["queue_depth"] == 2
+    await asyncio.gather(*tasks)
+    assert order == ["interactive", "background"]
+    metrics = scheduler.get_metrics()["read"]
+    assert metrics["queue_depth"] == 0 and metrics["requests"] == 302 and metrics["max_wait_time"] > 0.04
+
+    for n_retry in range(10):
+        assert 0 <= rate_limiter.get_backoff_delay(n_retry) <= min(64, 2**n_retry)
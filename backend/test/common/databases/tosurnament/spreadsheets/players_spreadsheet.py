@@ -0,0 +1,150 @@
+"""
+All tests concerning the team table of the players spreadsheet.
+"""
+
+import pytest
+
+from common.api.spreadsheet import Spreadsheet, Worksheet
+from common.databases.tosurnament.spreadsheets.players_spreadsheet import TeamInfo
+from test.resources.mock.spreadsheet import SpreadsheetMock, PlayersSpreadsheetSingleMock, PlayersSpreadsheetTeamsMock
+
+HEADER = ["Team", "Player 1", "Player 2", "Discord 1", "Discord 2", "Discord id 1", "Discord id 2", "Timezone"]
+# team1 is a duplicate of Team1, and Team2-1 also plays in TeamE
+TEAMS_VALUES = [
+    HEADER,
+    ["Team1", "Team1-1", "Team1-2", "Team1-1#0001", "Team1-2#0001", 111, "112", "UTC+1"],
+    ["Team2", "Team2-1", "", "Team2-1#0001", "", 221, "", "UTC+2"],
+    ["TeamE", "TeamE-1", "team2-1", "TeamE-1#0001", "Team2-1#0001", 331, 221, ""],
+    ["team1", "Dup-1", "Dup-2", "Dup-1#0001", "Dup-2#0001", 441, 442, "UTC+4"],
+    ["", "NoTeam-1", "", "NoTeam-1#0001", "", 551, "", ""],
+]
+# player1 is a duplicate of Player1, and Player3 has the discord id of Player1 and the discord tag of Player2
+SINGLE_VALUES = [
+    ["Player", "Discord", "Discord id", "Timezone"],
+    ["Player1", "Player1#0001", 111, "UTC+1"],
+    ["Player2", "Player2#0001", "222", "UTC+2"],
+    ["player1", "Other#0001", 333, ""],
+    ["Player3", "Player2#0001", 111, ""],
+]
+
+
+def create_players_spreadsheet(spreadsheet_id):
+    if spreadsheet_id == "teams":
+        players_spreadsheet = PlayersSpreadsheetTeamsMock()
+        players_spreadsheet.range_discord_id = "F2:G"
+        players_spreadsheet.range_timezone = "H2:H"
+        values = TEAMS_VALUES
+    elif spreadsheet_id == "single":
+        players_spreadsheet = PlayersSpreadsheetSingleMock()
+        players_spreadsheet.range_discord = "B2:B"
+        players_spreadsheet.range_discord_id = "C2:C"
+        players_spreadsheet.range_rank = ""
+        players_spreadsheet.range_osu_id = ""
+        players_spreadsheet.range_pp = ""
+        players_spreadsheet.range_country = ""
+        players_spreadsheet.range_timezone = "D2:D"
+        values = SINGLE_VALUES
+    else:
+        players_spreadsheet = (
+            PlayersSpreadsheetTeamsMock() if spreadsheet_id == "players/teams" else PlayersSpreadsheetSingleMock()
+        )
+        players_spreadsheet._spreadsheet = SpreadsheetMock.retrieve_spreadsheet(spreadsheet_id).create_view()
+        return players_spreadsheet
+    spreadsheet = Spreadsheet("players")
+    spreadsheet.worksheets.append(Worksheet(0, "Players", values))
+    players_spreadsheet._spreadsheet = spreadsheet.create_view()
+    return players_spreadsheet
+
+
+def get_legacy_team_infos(players_spreadsheet):
+    """Returns the TeamInfo of every team cell, like the bot did before the TeamTable."""
+    team_cells = players_spreadsheet.spreadsheet.get_cells_with_value_in_range(
+        players_spreadsheet.range_team_name or players_spreadsheet.range_team
+    )
+    return [TeamInfo.from_team_name(players_spreadsheet, str(team_cell)) for team_cell in team_cells]
+
+
+def find_legacy_team_info_of_player(players_spreadsheet, name, discord_id, discord):
+    for team_info in get_legacy_team_infos(players_spreadsheet):
+        if team_info.find_player(name, discord_id, discord):
+            return team_info
+    return None
+
+
+def dump_team_info(team_info):
+    if team_info is None:
+        return None
+
+    def dump_cell(cell):
+        return (cell.x, cell.y, cell.get(), cell.value_type)
+
+    players = [
+        (
+            player.is_captain,
+            *(dump_cell(getattr(player, field)) for field in ("name", "discord", "discord_id", "rank", "bws_rank")),
+            *(dump_cell(getattr(player, field)) for field in ("osu_id", "pp", "country")),
+        )
+        for player in team_info.players
+    ]
+    return dump_cell(team_info.team_name), dump_cell(team_info.timezone), players
+
+
+@pytest.mark.parametrize("spreadsheet_id", ["teams", "single", "players/teams", "players/single"])
+def test_get_team_infos(spreadsheet_id):
+    """Builds the same TeamInfo as TeamInfo.from_team_name with the name of each team cell."""
+    players_spreadsheet = create_players_spreadsheet(spreadsheet_id)
+    expected_team_infos = [dump_team_info(team_info) for team_info in get_legacy_team_infos(players_spreadsheet)]
+    players_spreadsheet._spreadsheet = players_spreadsheet.spreadsheet.create_view()
+    team_infos = [dump_team_info(team_info) for team_info in players_spreadsheet.get_team_infos()]
+    assert team_infos == expected_team_infos
+    if spreadsheet_id == "teams":
+        # The duplicated team name is the first team, like with TeamInfo.from_team_name
+        assert [team_info[0][2] for team_info in team_infos] == ["Team1", "Team2", "TeamE", "Team1"]
+        assert len(team_infos[0][2]) == 2
+
+
+@pytest.mark.parametrize("spreadsheet_id", ["teams", "single", "players/teams", "players/single"])
+def test_find_team_info_of_player(spreadsheet_id):
+    """Finds the same team as TeamInfo.find_player on each team in order, by name, discord id and discord tag."""
+    players_spreadsheet = create_players_spreadsheet(spreadsheet_id)
+    players = [player for team_info in get_legacy_team_infos(players_spreadsheet) for player in team_info.players]
+    names = [None, "Unknown"] + [name for player in players for name in (str(player.name), str(player.name).upper())]
+    discord_ids = [None, 999] + [player.discord_id.get() for player in players]
+    discord_ids += [str(discord_id) for discord_id in discord_ids if discord_id]
+    discords = [None, "Unknown#0001"] + [str(player.discord) for player in players]
+    lookups = [(name, None, None) for name in names]
+    lookups += [(None, discord_id, None) for discord_id in discord_ids]
+    lookups += [(None, None, discord) for discord in discords]
+    lookups += [
+        (name, discord_id, discord) for name, discord_id, discord in zip(names, discord_ids, reversed(discords))
+    ]
+    for name, discord_id, discord in lookups:
+        expected_team_info = find_legacy_team_info_of_player(players_spreadsheet, name, discord_id, discord)
+        team_info = players_spreadsheet.find_team_info_of_player(name, discord_id, discord)
+        assert dump_team_info(team_info) == dump_team_info(expected_team_info), (name, discord_id, discord)
+
+
+@pytest.mark.parametrize(
+    "spreadsheet_id, name, discord_id, discord, expected_team_name",
+    [
+        ("teams", "TEAM2-1", None, None, "Team2"),
+        ("teams", None, 221, None, "Team2"),
+        ("teams", None, None, "Team2-1#0001", "Team2"),
+        ("teams", "Dup-2", None, None, None),
+        ("teams", None, "112", None, "Team1"),
+        ("teams", "NoTeam-1", 551, "NoTeam-1#0001", None),
+        ("single", "PLAYER1", None, None, "Player1"),
+        ("single", None, None, "Other#0001", None),
+        ("single", None, "111", "Player2#0001", "Player1"),
+        ("single", None, 222, None, "Player2"),
+        ("single", "Player3", None, None, "Player3"),
+    ],
+)
+def test_find_team_info_of_player_first_team(spreadsheet_id, name, discord_id, discord, expected_team_name):
+    """
+    Finds the first team of a player listed in several teams. The players of a duplicated team name are not found, as
+    the name refers to its first team.
+    """
+    players_spreadsheet = create_players_spreadsheet(spreadsheet_id)
+    team_info = players_spreadsheet.find_team_info_of_player(name, discord_id, discord)
+    assert (team_info.team_name.get() if team_info else None) == expected_team_name
@@ -0,0 +1,86 @@
+"""
+All tests concerning the lobby table of the qualifiers spreadsheet.
+"""
+
+from unittest import mock
+
+import pytest
+
+from common.databases.tosurnament.spreadsheets import qualifiers_spreadsheet as qualifiers_spreadsheet_module
+from common.databases.tosurnament.spreadsheets.qualifiers_spreadsheet import LobbyInfo, LobbyTable
+from test.resources.mock.spreadsheet import SpreadsheetMock, QualifiersSpreadsheetSingleMock
+
+TEAM_NAMES = ["Team1", "team2", "TEAM3", "TeamD", "PlayerReferee", "Team5", ""]
+
+
+def create_qualifiers_spreadsheet(max_teams_in_row=8):
+    qualifiers_spreadsheet = QualifiersSpreadsheetSingleMock()
+    qualifiers_spreadsheet.max_teams_in_row = max_teams_in_row
+    spreadsheet = SpreadsheetMock.retrieve_spreadsheet(qualifiers_spreadsheet.spreadsheet_id)
+    qualifiers_spreadsheet._spreadsheet = spreadsheet.create_view()
+    return qualifiers_spreadsheet
+
+
+def assert_lobby_table_matches_spreadsheet(qualifiers_spreadsheet, lobby_table):
+    """Checks the lobby table against the LobbyInfo of every lobby."""
+    spreadsheet = qualifiers_spreadsheet.spreadsheet
+    lobby_infos = [
+        LobbyInfo.from_lobby_id_cell(qualifiers_spreadsheet, lobby_id_cell, filled_only=False)
+        for lobby_id_cell in spreadsheet.get_cells_with_value_in_range(qualifiers_spreadsheet.range_lobby_id)
+    ]
+    assert lobby_table.lobby_ids == [lobby_info.lobby_id.casefold() for lobby_info in lobby_infos]
+    for lobby_index, lobby_info in enumerate(lobby_infos):
+        assert lobby_table.get_n_free_slots(lobby_index) == sum(1 for team in lobby_info.teams if not team)
+        team_cells = lobby_table.get_team_cells(spreadsheet, lobby_index)
+        assert [(cell.x, cell.y, cell.get()) for cell in team_cells] == [
+            (cell.x, cell.y, cell.get()) for cell in lobby_info.teams
+        ]
+    for team_name in TEAM_NAMES[:-1]:
+        assert lobby_table.get_team_slots(team_name) == [
+            (lobby_index, slot)
+            for lobby_index, lobby_info in enumerate(lobby_infos)
+            for slot, team in enumerate(lobby_info.teams)
+            if team.casefold() == team_name.casefold()
+        ], team_name
+
+
+@pytest.mark.parametrize("max_teams_in_row", [8, 3, 1])
+def test_lobby_table(max_teams_in_row):
+    """Finds the same team cells, free slots and slots of the teams as LobbyInfo.from_lobby_id_cell."""
+    qualifiers_spreadsheet = create_qualifiers_spreadsheet(max_teams_in_row)
+    lobby_table = qualifiers_spreadsheet.get_lobby_table()
+    assert_lobby_table_matches_spreadsheet(qualifiers_spreadsheet, lobby_table)
+    assert lobby_table.find_lobby("l1-12") == 11
+    assert lobby_table.find_lobby("L1-13") is None
+    if max_teams_in_row == 8:
+        assert [lobby_table.get_n_free_slots(i) for i in range(len(lobby_table.lobby_ids))] == [7] * 11 + [0]
+        assert lobby_table.get_team_slots("team2") == [(3, 0), (4, 0), (11, 1)]
+
+
+@pytest.mark.parametrize("max_lobby_table_changes", [256, 1, 0])
+def test_set_lobby_team(max_lobby_table_changes):
+    """Keeps the lobby table up to date through the views of the spreadsheet, without changing its previous copies."""
+    qualifiers_spreadsheet = create_qualifiers_spreadsheet()
+    first_lobby_table = qualifiers_spreadsheet.get_lobby_table()
+    changes = [(0, 1, "Team2"), (0, 2, "team5"), (3, 0, ""), (0, 1, "Team5"), (11, 7, "Team1"), (3, 0, "TEAM5")]
+    lobby_tables = [first_lobby_table]
+    with mock.patch.object(qualifiers_spreadsheet_module, "MAX_LOBBY_TABLE_CHANGES", max_lobby_table_changes):
+        for lobby_index, slot, team_name in changes:
+            lobby_table = qualifiers_spreadsheet.set_lobby_team(
+                qualifiers_spreadsheet.get_lobby_table(), lobby_index, slot, team_name
+            )
+            lobby_tables.append(lobby_table)
+            qualifiers_spreadsheet._spreadsheet = qualifiers_spreadsheet.spreadsheet.create_view()
+            with mock.patch.object(LobbyTable, "__init__", side_effect=AssertionError("LobbyTable built again")):
+                assert qualifiers_spreadsheet.get_lobby_table() is lobby_table
+            assert_lobby_table_matches_spreadsheet(qualifiers_spreadsheet, lobby_table)
+    assert lobby_tables[-1].get_n_free_slots(0) == 5
+    assert lobby_tables[-1].get_team_slots("team5") == [(0, 1), (0, 2), (3, 0)]
+    assert lobby_tables[-1].get_team_slots("team2") == [(4, 0), (11, 1)]
+    assert lobby_tables[-1].get_team_slots("team1") == [(0, 0), (1, 0), (2, 0), (11, 7)]
+    assert first_lobby_table.get_n_free_slots(0) == 7
+    assert first_lobby_table.get_n_free_slots(3) == 7
+    assert first_lobby_table.get_team_slots("team5") == []
+    assert first_lobby_table.get_team_slots("team2") == [(3, 0), (4, 0), (11, 1)]
+    assert lobby_tables[1].get_team_slots("team2") == [(0, 1), (3, 0), (4, 0), (11, 1)]
+    assert lobby_tables[1].get_n_free_slots(0) == 6
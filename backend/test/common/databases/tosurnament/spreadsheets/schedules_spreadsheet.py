@@ -0,0 +1,171 @@
+"""
+All tests concerning the schedules spreadsheet table.
+"""
+
+import datetime
+from unittest import mock
+
+import pytest
+
+from common.api.spreadsheet import Spreadsheet, Worksheet
+from common.databases.tosurnament.spreadsheets.schedules_spreadsheet import MatchInfo
+from common.databases.tosurnament.tournament import Tournament
+from test.resources.mock.spreadsheet import SpreadsheetMock, SchedulesSpreadsheetSingleMock
+
+SCHEDULES_VALUES = [
+    ["Match", "Team 1", "Score 1", "Score 2", "Team 2", "Date", "Time", "Referee", "Streamer", "Commentator", "MP"],
+    ["M1", "Team A", "", "", "team b", "1 March", "12:00", "Ref1", "", "Com1 / Com2", ""],
+    ["", "", "", "", "", "", "", "Ref2", "Str1", "", ""],
+    ["m2", "Team B / Team C", 1, 2, "Team A", "2 March", "14:00", "", "", "", "link"],
+    ["M3", "Team D", "", "", "TEAM A", "1 March", "10:00", "ref1", "Str1", "", ""],
+    ["M4", "Team E", "", "", "Team F", "", "", "", "", "", ""],
+]
+# The match id of M1 is merged over 2 rows, each row having its referee
+SCHEDULES_MERGES = [(0, 1, 1, 3)]
+
+
+def create_schedules_spreadsheet(use_range=False):
+    schedules_spreadsheet = SchedulesSpreadsheetSingleMock()
+    schedules_spreadsheet.use_range = use_range
+    spreadsheet = Spreadsheet("schedules")
+    spreadsheet.worksheets.append(Worksheet(0, "sheet1", SCHEDULES_VALUES, SCHEDULES_MERGES))
+    schedules_spreadsheet._spreadsheet = spreadsheet.create_view()
+    return schedules_spreadsheet
+
+
+def dump_match_info(match_info):
+    def dump_cell(cell):
+        return (cell.x, cell.y, cell.get(), cell.value_type)
+
+    return [
+        *(dump_cell(cell) for cell in (match_info.match_id, match_info.team1, match_info.team2)),
+        *(dump_cell(cell) for cell in (match_info.score_team1, match_info.score_team2)),
+        *(dump_cell(cell) for cell in (match_info.date, match_info.time)),
+        *([dump_cell(cell) for cell in cells] for cells in (match_info.referees, match_info.streamers)),
+        *([dump_cell(cell) for cell in cells] for cells in (match_info.commentators, match_info.mp_links)),
+    ]
+
+
+@pytest.mark.parametrize("use_range", [False, True])
+@pytest.mark.parametrize("empty_ranges", [False, True])
+@pytest.mark.parametrize("spreadsheet_id", [None, "schedules/single", "schedules/teams"])
+def test_match_table_get_match_infos(spreadsheet_id, empty_ranges, use_range):
+    """Builds the same MatchInfo of every match as MatchInfo.from_match_id_cell."""
+    schedules_spreadsheet = create_schedules_spreadsheet(use_range)
+    if spreadsheet_id:
+        schedules_spreadsheet._spreadsheet = SpreadsheetMock.retrieve_spreadsheet(spreadsheet_id).create_view()
+    if empty_ranges:
+        schedules_spreadsheet.range_streamer = ""
+        schedules_spreadsheet.range_mp_links = ""
+    spreadsheet = schedules_spreadsheet.spreadsheet
+    expected_match_infos = [
+        dump_match_info(MatchInfo.from_match_id_cell(schedules_spreadsheet, match_id_cell))
+        for match_id_cell in spreadsheet.get_cells_with_value_in_range(schedules_spreadsheet.range_match_id)
+    ]
+    schedules_spreadsheet._spreadsheet = spreadsheet.create_view()
+    match_infos = [dump_match_info(match_info) for match_info in schedules_spreadsheet.get_match_infos()]
+    assert match_infos == expected_match_infos
+    if not spreadsheet_id:
+        assert len(match_infos) == 4
+        assert [referee[2] for referee in match_infos[0][7]] == (["Ref1", "Ref2"] if use_range else ["Ref1"])
+
+
+def test_match_table_get_match_infos_with_match_ids():
+    """Builds only the MatchInfo of the given match ids, without the ignored ones."""
+    schedules_spreadsheet = create_schedules_spreadsheet()
+    match_infos = schedules_spreadsheet.get_match_infos(match_ids=["m1", "m2", "m3"], match_ids_to_ignore=["m3"])
+    assert [match_info.match_id.get() for match_info in match_infos] == ["M1", "m2"]
+
+
+@pytest.mark.parametrize("use_range", [False, True])
+def test_schedule_index_matches_of_team_and_staff(use_range):
+    """Finds the same matches as Cell.has_value, with multi-value cells and any case."""
+    schedules_spreadsheet = create_schedules_spreadsheet(use_range)
+    match_infos = list(schedules_spreadsheet.get_match_infos())
+    schedule_index = schedules_spreadsheet.get_schedule_index()
+    team_names = ["Team A", "team a", "TEAM B", "team c", "Team B / Team C", "Team D", "Team Z", "", "/"]
+    for team_name in team_names:
+        expected_matches = [
+            index
+            for index, match_info in enumerate(match_infos)
+            if match_info.team1.has_value(team_name) or match_info.team2.has_value(team_name)
+        ]
+        assert schedule_index.get_matches_of_team(team_name) == expected_matches, team_name
+    staff_names = ["Ref1", "REF1", "ref2", "Str1", "com2", "Com1 / Com2", "Com1", "Nobody"]
+    for field, cells_name in (("referee", "referees"), ("streamer", "streamers"), ("commentator", "commentators")):
+        for staff_name in staff_names:
+            expected_matches = [
+                index
+                for index, match_info in enumerate(match_infos)
+                if any(cell.has_value(staff_name) for cell in getattr(match_info, cells_name))
+            ]
+            assert schedule_index.get_matches_of_staff(field, staff_name) == expected_matches, (field, staff_name)
+    assert schedule_index.get_matches_of_team("team a") == [0, 1, 2]
+    assert schedule_index.get_matches_of_staff("referee", "ref2") == ([0] if use_range else [])
+
+
+def test_schedule_index_matches_without_referee():
+    """Returns the matches without any referee."""
+    schedules_spreadsheet = create_schedules_spreadsheet()
+    schedule_index = schedules_spreadsheet.get_schedule_index()
+    expected_matches = [
+        index
+        for index, match_info in enumerate(schedules_spreadsheet.get_match_infos())
+        if not any(referee.value for referee in match_info.referees)
+    ]
+    assert schedule_index.get_matches_without_referee() == expected_matches == [1, 3]
+
+
+@pytest.mark.parametrize(
+    "match_ids_to_ignore, match_indexes, expected_match_ids",
+    [
+        ((), None, ["M1", "m2"]),
+        (("m1",), None, ["m2"]),
+        ((), [3, 2, 1, 0], ["M1", "m2"]),
+        ((), [2, 1], ["m2"]),
+        (("m2",), [1], []),
+        ((), [], []),
+    ],
+)
+def test_get_next_match_infos(match_ids_to_ignore, match_indexes, expected_match_ids):
+    """Returns the matches not before now in sheet order, only among match_indexes if set, without the ignored ones."""
+    schedules_spreadsheet = create_schedules_spreadsheet()
+    tournament = Tournament(utc="", date_format="")
+    now = datetime.datetime(2026, 3, 1, 11, 0, tzinfo=datetime.timezone.utc)
+    next_match_infos = schedules_spreadsheet.get_next_match_infos(tournament, now, match_ids_to_ignore, match_indexes)
+    assert [match_info.match_id.get() for match_info, _ in next_match_infos] == expected_match_ids
+    expected_dates = {
+        "M1": datetime.datetime(2026, 3, 1, 12, 0, tzinfo=datetime.timezone.utc),
+        "m2": datetime.datetime(2026, 3, 2, 14, 0, tzinfo=datetime.timezone.utc),
+    }
+    assert [match_date for _, match_date in next_match_infos] == [
+        expected_dates[match_id] for match_id in expected_match_ids
+    ]
+
+
+@pytest.mark.parametrize("match_indexes", [None, [2, 1, 0, 2]])
+def test_get_next_match_infos_sheet_order(match_indexes):
+    """Returns the matches in the order of the sheet like before the ScheduleIndex, not in date order."""
+    schedules_spreadsheet = create_schedules_spreadsheet()
+    tournament = Tournament(utc="", date_format="")
+    now = datetime.datetime(2026, 3, 1, 9, 0, tzinfo=datetime.timezone.utc)
+    next_match_infos = schedules_spreadsheet.get_next_match_infos(tournament, now, (), match_indexes)
+    assert [match_info.match_id.get() for match_info, _ in next_match_infos] == ["M1", "m2", "M3"]
+    assert [match_date.hour for _, match_date in next_match_infos] == [12, 14, 10]
+
+
+def test_get_next_match_infos_parses_dates_once_per_day():
+    """Parses the dates of the matches again only when the day changes, as dates without a year depend on it."""
+    schedules_spreadsheet = create_schedules_spreadsheet()
+    tournament = Tournament(utc="", date_format="")
+    now = datetime.datetime(2026, 3, 1, 11, 0, tzinfo=datetime.timezone.utc)
+    with mock.patch.object(tournament, "parse_date", wraps=tournament.parse_date) as parse_date:
+        schedules_spreadsheet.get_next_match_infos(tournament, now)
+        assert parse_date.call_count == 4
+        schedules_spreadsheet.get_next_match_infos(tournament, now + datetime.timedelta(hours=1))
+        assert parse_date.call_count == 4
+        next_match_infos = schedules_spreadsheet.get_next_match_infos(
+            tournament, datetime.datetime(2027, 1, 1, tzinfo=datetime.timezone.utc)
+        )
+        assert parse_date.call_count == 8
+    assert [match_date.year for _, match_date in next_match_infos] == [2027, 2027, 2027]
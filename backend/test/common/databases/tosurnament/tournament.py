@@ -0,0 +1,146 @@
+"""
+All tests concerning the date parsing of the tournament.
+"""
+
+import datetime
+from unittest import mock
+
+import dateparser
+import pytest
+
+from common.databases.tosurnament import tournament as tournament_module
+from common.databases.tosurnament.tournament import Tournament
+
+DATES = [
+    "05 March 14:00",
+    "29 February 10:00",
+    "18 October 14:60",
+    "12/03 14:00",
+    "12/03/2027 14:00",
+    "12/03/27 14:00",
+    "March 12 14:00",
+    "12 march",
+    "2027-03-12 14:00",
+    "tomorrow",
+    "Saturday 14:00",
+    "",
+]
+DATE_FORMATS = [
+    None,
+    ["%d %B %H:%M"],
+    ["%d/%m %H:%M"],
+    ["%d/%m/%Y %H:%M"],
+    ["%d/%m/%y %H:%M"],
+    ["%B %d %H:%M"],
+]
+RELATIVE_BASES = [
+    datetime.datetime(2026, 10, 18, 12),
+    datetime.datetime(2028, 2, 1, 12),
+    datetime.datetime(2026, 10, 18, 12, tzinfo=datetime.timezone.utc),
+]
+
+
+@pytest.fixture(autouse=True)
+def clear_parsed_dates():
+    tournament_module._parsed_dates.clear()
+    yield
+    tournament_module._parsed_dates.clear()
+
+
+def parse_date_with_dateparser(tournament, date, date_formats, prefer_dates_from, relative_base):
+    date_formats = list(date_formats or [])
+    if tournament.date_format:
+        date_formats.append(tournament.date_format)
+    elif not date_formats:
+        date_formats.append("%d %B")
+    return dateparser.parse(
+        date,
+        date_formats=date_formats,
+        settings={
+            "PREFER_DATES_FROM": prefer_dates_from,
+            "RELATIVE_BASE": relative_base,
+            "TIMEZONE": tournament.utc or "+00:00",
+            "RETURN_AS_TIMEZONE_AWARE": True,
+            "DATE_ORDER": "DMY",
+        },
+    )
+
+
+@pytest.mark.parametrize("prefer_dates_from", ["current_period", "future"])
+@pytest.mark.parametrize("tournament_date_format", ["", "%d/%m %H:%M"])
+@pytest.mark.parametrize("utc", ["", "+02:00", "-05:30"])
+def test_parse_date(utc, tournament_date_format, prefer_dates_from):
+    """Parses dates like dateparser, whether they match a format or not, and fails like it."""
+    tournament = Tournament(utc=utc, date_format=tournament_date_format)
+    for date in DATES:
+        for date_formats in DATE_FORMATS:
+            for relative_base in RELATIVE_BASES:
+                try:
+                    expected_date = parse_date_with_dateparser(
+                        tournament, date, date_formats, prefer_dates_from, relative_base
+                    )
+                except Exception as e:
+                    with pytest.raises(type(e)):
+                        tournament.parse_date(date, date_formats, prefer_dates_from, relative_base)
+                    continue
+                parsed_date = tournament.parse_date(date, date_formats, prefer_dates_from, relative_base)
+                assert parsed_date == expected_date, (date, date_formats, relative_base)
+                if expected_date:
+                    assert parsed_date.utcoffset() == expected_date.utcoffset()
+
+
+def test_parse_date_serial_date():
+    """Parses the dates built from Sheets serial dates with strptime, in the tournament timezone."""
+    tournament = Tournament(utc="+02:00", date_format="")
+    relative_base = datetime.datetime(2026, 10, 18, 12)
+    with mock.patch.object(tournament_module.dateparser, "parse") as parse:
+        parsed_date = tournament.parse_date("05 March 14:00", ["%d/%m %H:%M"], relative_base=relative_base)
+        assert tournament.parse_date("05 March", relative_base=relative_base) == parsed_date.replace(hour=0)
+    parse.assert_not_called()
+    assert parsed_date == datetime.datetime(2026, 3, 5, 14, tzinfo=datetime.timezone(datetime.timedelta(hours=2)))
+
+
+def test_parse_date_leap_day():
+    """Parses 29 February in the year of the base if it is a leap year, else like dateparser."""
+    tournament = Tournament(utc="", date_format="")
+    assert tournament.parse_date(
+        "29 February 10:00", ["%d %B %H:%M"], relative_base=datetime.datetime(2028, 2, 1)
+    ) == datetime.datetime(2028, 2, 29, 10, tzinfo=datetime.timezone.utc)
+    relative_base = datetime.datetime(2026, 2, 1)
+    parsed_date = tournament.parse_date("29 February 10:00", ["%d %B %H:%M"], relative_base=relative_base)
+    assert parsed_date == parse_date_with_dateparser(
+        tournament, "29 February 10:00", ["%d %B %H:%M"], "current_period", relative_base
+    )
+    assert parsed_date.year != 2026
+
+
+def test_parse_date_memoized_by_day():
+    """Memoizes the dates from a spreadsheet per day of the base, as dates without a year get its year."""
+    tournament = Tournament(utc="", date_format="")
+    relative_base = datetime.datetime(2026, 12, 31, 10)
+    with mock.patch.object(tournament_module.dateparser, "parse", wraps=dateparser.parse) as parse:
+        for date in ("5 March 14:00", "March 5th 14:00"):
+            assert tournament.parse_date(date, ["%d %B %H:%M"], relative_base=relative_base).year == 2026
+            assert tournament.parse_date(date, ["%d %B %H:%M"], relative_base=relative_base.replace(hour=23)).year == (
+                2026
+            )
+        assert parse.call_count == 1
+        assert len(tournament_module._parsed_dates) == 2
+        for date in ("5 March 14:00", "March 5th 14:00"):
+            next_day = relative_base + datetime.timedelta(days=1)
+            assert tournament.parse_date(date, ["%d %B %H:%M"], relative_base=next_day).year == 2027
+        assert parse.call_count == 2
+        assert len(tournament_module._parsed_dates) == 4
+
+
+def test_parse_date_user_input_not_memoized():
+    """Does not memoize dates without date_formats that do not match a format, as they are relative."""
+    tournament = Tournament(utc="", date_format="")
+    relative_base = datetime.datetime(2026, 10, 18, 12)
+    with mock.patch.object(tournament_module.dateparser, "parse", wraps=dateparser.parse) as parse:
+        for _ in range(2):
+            assert tournament.parse_date("tomorrow", relative_base=relative_base).date() == datetime.date(2026, 10, 19)
+        assert parse.call_count == 2
+    assert not tournament_module._parsed_dates
+    assert tournament.parse_date("19 October", relative_base=relative_base)
+    assert len(tournament_module._parsed_dates) == 1
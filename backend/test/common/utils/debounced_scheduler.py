@@ -0,0 +1,49 @@
+"""All tests concerning the debounced_scheduler module"""
+
+import asyncio
+
+import pytest
+
+from common.utils.debounced_scheduler import DebouncedScheduler
+
+
+@pytest.mark.asyncio
+async def test_debounced_scheduler_groups_bursts():
+    """Flushes once per burst of calls, and no later than max_delay after the first call of a burst"""
+    flushes = []
+
+    async def flush(key):
+        flushes.append((key, asyncio.get_running_loop().time()))
+
+    scheduler = DebouncedScheduler(flush, 0.05, 0.2)
+    start = asyncio.get_running_loop().time()
+    for _ in range(3):
+        scheduler.schedule("a")
+        scheduler.schedule("b")
+        await asyncio.sleep(0.02)
+    await asyncio.sleep(0.1)
+    assert sorted(key for key, _ in flushes) == ["a", "b"]
+    assert "a" not in scheduler
+
+    flushes.clear()
+    for _ in range(15):
+        scheduler.schedule("a")
+        await asyncio.sleep(0.02)
+    assert len(flushes) == 1 and flushes[0][1] - start < 0.5
+    await asyncio.sleep(0.1)
+    assert len(flushes) == 2
+
+
+@pytest.mark.asyncio
+async def test_debounced_scheduler_flush_all():
+    """Flushes the pending keys immediately"""
+    flushes = []
+
+    async def flush(key):
+        flushes.append(key)
+
+    scheduler = DebouncedScheduler(flush, 60, 60)
+    scheduler.schedule("a")
+    await scheduler.flush_all(timeout=1)
+    assert flushes == ["a"]
+    assert "a" not in scheduler
@@ -0,0 +1,67 @@
+"""All tests concerning the single_flight module"""
+
+import asyncio
+import threading
+
+import pytest
+
+from common.utils.single_flight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_single_flight_shares_concurrent_calls():
+    """Concurrent calls with the same key share one call, other keys and later calls get their own"""
+    single_flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def load(key):
+        calls.append(key)
+        release.wait(5)
+        return [key]
+
+    loads = [asyncio.ensure_future(single_flight.run(key, load, key)) for key in ("a", "a", "b", "a")]
+    await asyncio.sleep(0.05)
+    assert "a" in single_flight
+    release.set()
+    results = await asyncio.gather(*loads)
+    assert sorted(calls) == ["a", "b"]
+    assert results[0] is results[1] is results[3]
+    assert "a" not in single_flight
+    assert await single_flight.run("a", load, "a") == ["a"]
+    assert calls.count("a") == 2
+
+
+@pytest.mark.asyncio
+async def test_single_flight_shares_exceptions():
+    """An exception is raised to every caller, and a cancelled caller does not cancel the call"""
+    single_flight = SingleFlight()
+    release = threading.Event()
+
+    def load():
+        release.wait(5)
+        raise ValueError("error")
+
+    cancelled_load = asyncio.ensure_future(single_flight.run("a", load))
+    other_load = asyncio.ensure_future(single_flight.run("a", load))
+    await asyncio.sleep(0.05)
+    cancelled_load.cancel()
+    release.set()
+    with pytest.raises(ValueError):
+        await other_load
+
+
+@pytest.mark.asyncio
+async def test_single_flight_shares_coroutines():
+    """Coroutine functions are run as one task shared by the concurrent calls"""
+    single_flight = SingleFlight()
+    calls = []
+
+    async def load(key):
+        calls.append(key)
+        await asyncio.sleep(0.01)
+        return [key]
+
+    results = await asyncio.gather(*(single_flight.run("a", load, "a") for _ in range(3)))
+    assert calls == ["a"]
+    assert results[0] is results[1] is results[2]
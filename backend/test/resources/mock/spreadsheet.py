@@ -24,7 +24,7 @@ class SpreadsheetMock(Spreadsheet):
         return spreadsheet
 
     @staticmethod
-    def retrieve_spreadsheet_and_update_pickle(spreadsheet_id):
+    def retrieve_spreadsheet_and_update_snapshot(spreadsheet_id):
         return SpreadsheetMock.retrieve_spreadsheet(spreadsheet_id)
 
     @staticmethod
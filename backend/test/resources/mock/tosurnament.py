@@ -464,7 +464,7 @@ def load_spreadsheet(path):
         worksheets.append(create_worksheet(i, worksheet_data["name"], worksheet_data["cells"]))
     spreadsheet.worksheets = worksheets
     # TODO mock pickles
-    spreadsheet.update_pickle()
+    spreadsheet.update_snapshot()
 
 
 def setup_spreadsheets():